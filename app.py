@@ -3,6 +3,7 @@ import anthropic
 import base64
 from PIL import Image
 import io
+import itertools
 import os
 import sys
 
@@ -14,11 +15,12 @@ sys.path.insert(0, os.path.join(current_dir, 'comprehensive_veterinary_drugs_dat
 # Import Enhanced Veterinary Assistant v4.0 system with graceful fallback
 COMPREHENSIVE_SYSTEM_AVAILABLE = False
 EnhancedVeterinaryAssistantV4 = None
+get_shared_assistant = None
 
 try:
     # Try to import the comprehensive system
     print("🔄 Attempting to import Enhanced Veterinary Assistant v4.0...")
-    from enhanced_veterinary_assistant_v4 import EnhancedVeterinaryAssistantV4
+    from enhanced_veterinary_assistant_v4 import EnhancedVeterinaryAssistantV4, get_shared_assistant
     COMPREHENSIVE_SYSTEM_AVAILABLE = True
     print("✅ Enhanced Veterinary Assistant v4.0 loaded successfully!")
     print("   💉 CRI Calculation Engine")
@@ -43,10 +45,23 @@ st.set_page_config(
     layout="centered"
 )
 
+@st.cache_resource(show_spinner=False)
+def load_anthropic_client(api_key: str):
+    """Create the Anthropic client once per process for image analysis"""
+    return anthropic.Anthropic(api_key=api_key)
+
+@st.cache_resource(show_spinner=False)
+def load_enhanced_assistant():
+    """Build Enhanced Veterinary Assistant v4.0 once per process and share it across sessions"""
+    print("🔄 Initializing Enhanced Veterinary Assistant v4.0...")
+    assistant = get_shared_assistant()
+    print("✅ Enhanced Veterinary Assistant v4.0 initialized successfully!")
+    return assistant
+
 # Get API key from secrets
 try:
     api_key = st.secrets["ANTHROPIC_API_KEY"]
-    client = anthropic.Anthropic(api_key=api_key)
+    client = load_anthropic_client(api_key)
 except:
     st.error("API key not configured")
     st.stop()
@@ -69,10 +84,8 @@ try:
     if "PINECONE_API_KEY" in st.secrets:
         os.environ["PINECONE_API_KEY"] = st.secrets["PINECONE_API_KEY"]
     
-    # Initialize Enhanced Veterinary Assistant v4.0 - REQUIRED
-    print("🔄 Initializing Enhanced Veterinary Assistant v4.0...")
-    enhanced_vet_assistant = EnhancedVeterinaryAssistantV4()
-    print("✅ Enhanced Veterinary Assistant v4.0 initialized successfully!")
+    # Initialize Enhanced Veterinary Assistant v4.0 - REQUIRED (built once, reused on every rerun)
+    enhanced_vet_assistant = load_enhanced_assistant()
     
 except Exception as e:
     print(f"❌ CRITICAL: Failed to initialize Enhanced Veterinary Assistant v4.0: {e}")
@@ -449,8 +462,8 @@ if prompt := st.chat_input("Type your veterinary question here..."):
     # Generate response
     with st.chat_message("assistant"):
         if uploaded_file:
-            with st.spinner("🔬 Analyzing veterinary image..."):
-                try:
+            try:
+                with st.spinner("🔬 Analyzing veterinary image..."):
                     # Convert image to base64
                     uploaded_file.seek(0)
                     image_bytes = uploaded_file.read()
@@ -480,67 +493,69 @@ FOCUS AREAS for {analysis_type}:
 
 Provide structured, professional analysis suitable for veterinary case records."""
                     
-                    # Call Claude
-                    response = client.messages.create(
-                        model="claude-3-5-haiku-20241022",
-                        max_tokens=2000,
-                        temperature=0.1,
-                        system=image_system,
-                        messages=[{
-                            "role": "user",
-                            "content": [
-                                {"type": "text", "text": f"Please provide detailed veterinary analysis: {prompt}"},
-                                {
-                                    "type": "image",
-                                    "source": {
-                                        "type": "base64",
-                                        "media_type": "image/jpeg",
-                                        "data": encoded_image
+                    # Stream Claude's analysis between the header and the disclaimer
+                    def stream_image_analysis():
+                        with client.messages.stream(
+                            model="claude-3-5-haiku-20241022",
+                            max_tokens=2000,
+                            temperature=0.1,
+                            system=image_system,
+                            messages=[{
+                                "role": "user",
+                                "content": [
+                                    {"type": "text", "text": f"Please provide detailed veterinary analysis: {prompt}"},
+                                    {
+                                        "type": "image",
+                                        "source": {
+                                            "type": "base64",
+                                            "media_type": "image/jpeg",
+                                            "data": encoded_image
+                                        }
                                     }
-                                }
-                            ]
-                        }]
-                    )
+                                ]
+                            }]
+                        ) as stream:
+                            yield f"**Analysis for {species}** ({analysis_type})\n\n"
+                            yield from stream.text_stream
+                        yield "\n\n*This analysis supports clinical decision-making but does not replace professional veterinary examination.*"
                     
-                    analysis = response.content[0].text
-                    formatted_response = f"""**Analysis for {species}** ({analysis_type})
-
-{analysis}
-
-*This analysis supports clinical decision-making but does not replace professional veterinary examination.*"""
-                    
-                    st.markdown(formatted_response)
-                    st.session_state.messages.append({"role": "assistant", "content": formatted_response})
-                    
-                except Exception as e:
-                    error_msg = f"⚠️ Analysis error: {str(e)}"
-                    st.error(error_msg)
-                    st.session_state.messages.append({"role": "assistant", "content": error_msg})
+                    # Spinner until the first token, then render progressively
+                    analysis_stream = stream_image_analysis()
+                    first_delta = next(analysis_stream)
+                formatted_response = st.write_stream(itertools.chain([first_delta], analysis_stream))
+                st.session_state.messages.append({"role": "assistant", "content": formatted_response})
+                
+            except Exception as e:
+                error_msg = f"⚠️ Analysis error: {str(e)}"
+                st.error(error_msg)
+                st.session_state.messages.append({"role": "assistant", "content": error_msg})
         else:
-            with st.spinner("🔍 Processing with Enhanced Veterinary Assistant v4.0..."):
-                try:
-                    # Use ONLY Enhanced Veterinary Assistant v4.0 - no fallback
-                    print(f"🎯 Using Enhanced Veterinary Assistant v4.0 for query: {prompt[:50]}...")
-                    
-                    # Query using comprehensive safety v4 method
-                    v4_response = enhanced_vet_assistant.query_with_comprehensive_safety_v4(prompt)
-                    
-                    if v4_response and 'answer' in v4_response:
-                        # Clean professional response - no internal diagnostics
-                        response_text = v4_response['answer']
-                        
-                        # Only show validation warnings if there are actual calculation errors
-                        calc_validator = v4_response.get('calculation_validation', {})
-                        if calc_validator and calc_validator.get('has_critical_errors', False):
-                            response_text = f"⚠️ **Calculation Review Required**\n\n{response_text}\n\n*Please verify calculations with veterinary references before implementation.*"
-                        
-                    else:
-                        response_text = "❌ Enhanced Veterinary Assistant v4.0 failed to generate a response. Please try again."
+            try:
+                # Use ONLY Enhanced Veterinary Assistant v4.0 - no fallback
+                print(f"🎯 Using Enhanced Veterinary Assistant v4.0 for query: {prompt[:50]}...")
+                
+                # Stream using comprehensive safety v4 method; the spinner covers retrieval up to the first token
+                v4_stream = enhanced_vet_assistant.stream_query_with_comprehensive_safety_v4(prompt)
+                answer_stream = iter(v4_stream)
+                with st.spinner("🔍 Processing with Enhanced Veterinary Assistant v4.0..."):
+                    first_delta = next(answer_stream, "")
+                response_text = st.write_stream(itertools.chain([first_delta], answer_stream))
+                v4_response = v4_stream.response
+                
+                if v4_response and 'answer' in v4_response:
+                    # Only show validation warnings if there are actual calculation errors (safety steps run after the stream)
+                    calc_validator = v4_response.get('calculation_validation', {})
+                    if calc_validator and calc_validator.get('has_critical_errors', False):
+                        st.warning("⚠️ **Calculation Review Required** - *Please verify calculations with veterinary references before implementation.*")
+                        response_text = f"⚠️ **Calculation Review Required**\n\n{response_text}\n\n*Please verify calculations with veterinary references before implementation.*"
                     
+                else:
+                    response_text = "❌ Enhanced Veterinary Assistant v4.0 failed to generate a response. Please try again."
                     st.markdown(response_text)
-                    st.session_state.messages.append({"role": "assistant", "content": response_text})
-                    
-                except Exception as e:
-                    error_msg = f"❌ Enhanced Veterinary Assistant v4.0 Error: {str(e)}"
-                    st.error(error_msg)
-                    st.session_state.messages.append({"role": "assistant", "content": error_msg})
\ No newline at end of file
+                
+                st.session_state.messages.append({"role": "assistant", "content": response_text})
+                
+            except Exception as e:
+                error_msg = f"❌ Enhanced Veterinary Assistant v4.0 Error: {str(e)}"
+                st.error(error_msg)
+                st.session_state.messages.append({"role": "assistant", "content": error_msg})
\ No newline at end of file
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Clinical Entity Recognizer
+Extracts weight, age, species, drugs, conditions, interaction/hepatic cues and principle
+triggers from a query in one pass: every lexicon term is found by a single Aho-Corasick
+automaton (pyahocorasick) and all quantities by one compiled regex. The result is a typed
+ClinicalContext shared by principle analysis, the CRI engine, calculation validation and
+pharmacological reasoning instead of each re-parsing the query.
+"""
+
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+try:
+    import ahocorasick
+except ImportError:  # pragma: no cover - recognizer falls back to per-term str.find scans
+    ahocorasick = None
+
+# Species in priority order: the first one found in this order is the patient species
+SPECIES_TERMS = {
+    'canine': ['dog', 'dogs', 'canine', 'canines'],
+    'feline': ['cat', 'cats', 'feline', 'felines'],
+    'equine': ['horse', 'horses', 'equine', 'equines'],
+    'bovine': ['cow', 'cows', 'bovine', 'bovines'],
+}
+
+DRUG_TERMS = [
+    'phenobarbital', 'diazepam', 'morphine', 'tramadol',
+    'acepromazine', 'lidocaine', 'ketamine', 'fentanyl',
+    'amoxicillin', 'clavamox', 'clavulanate', 'chloramphenicol',
+    'ketoconazole', 'itraconazole', 'fluconazole', 'dopamine',
+]
+
+# Canonical condition names (as reported in patient_conditions) and their phrasings
+CONDITION_TERMS = {
+    'liver_disease': ['liver disease'],
+    'hepatic_compromise': ['hepatic compromise'],
+    'elevated_liver_enzymes': ['elevated liver enzymes'],
+    'seizures': ['seizure', 'seizures'],
+    'epilepsy': ['epilepsy'],
+    'kidney_disease': ['kidney disease'],
+    'renal_failure': ['renal failure'],
+    'heart_disease': ['heart disease'],
+    'cardiac_disease': ['cardiac disease'],
+    'hypertension': ['hypertension'],
+    'hypotension': ['hypotension'],
+}
+
+# (term, boundary): 'word' needs word boundaries on both sides, 'prefix' only before the term
+INTERACTION_CUES = [('interact', 'prefix'), ('combination', 'prefix'), ('together', 'word'), ('with', 'word')]
+# Substring cues for hepatic metabolism concerns ('enzyme' also covers 'enzymes')
+HEPATIC_CUES = ['liver', 'hepatic', 'enzyme']
+
+QUANTITY_PATTERN = re.compile(
+    r'(?<![\w.])(?P<weight>\d+(?:\.\d+)?)\s*(?:kg|kilograms?)\b'
+    r'|(?<![\w.])(?P<age>\d+)\s*(?P<age_unit>years?|yrs?|months?|mos?)\b',
+    re.IGNORECASE
+)
+
+# Legacy dict keys (request.context overrides, stored responses) -> ClinicalContext fields
+LEGACY_KEYS = {
+    'weight': 'weight_kg',
+    'age': 'age',
+    'species': 'species',
+    'drugs_mentioned': 'drugs',
+    'patient_conditions': 'conditions',
+    'interaction_query': 'interaction_query',
+}
+
+@dataclass
+class ClinicalContext:
+    """Patient and query facts recognised in a clinical question"""
+    weight_kg: Optional[float] = None
+    age: Optional[str] = None
+    age_unit: Optional[str] = None
+    species: Optional[str] = None
+    drugs: List[str] = field(default_factory=list)
+    conditions: List[str] = field(default_factory=list)
+    interaction_query: bool = False
+    hepatic_concern: bool = False
+    principle_terms: List[str] = field(default_factory=list)
+    extra: Dict[str, Any] = field(default_factory=dict)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """The context dict layout used in responses, cache keys and request.context"""
+        context: Dict[str, Any] = {}
+        if self.weight_kg is not None:
+            context['weight'] = self.weight_kg
+        if self.age is not None:
+            context['age'] = self.age
+        if self.species is not None:
+            context['species'] = self.species
+        context['drugs_mentioned'] = list(self.drugs)
+        if self.conditions:
+            context['patient_conditions'] = list(self.conditions)
+        if self.interaction_query:
+            context['interaction_query'] = True
+        context.update(self.extra)
+        return context
+
+    def with_overrides(self, overrides: Optional[Dict[str, Any]]) -> "ClinicalContext":
+        """Copy with caller-supplied context dict values (legacy keys) taking precedence"""
+        if not overrides:
+            return self
+        values = dict(self.__dict__, drugs=list(self.drugs), conditions=list(self.conditions),
+                      principle_terms=list(self.principle_terms), extra=dict(self.extra))
+        for key, value in overrides.items():
+            if key in LEGACY_KEYS:
+                values[LEGACY_KEYS[key]] = value
+            else:
+                values['extra'][key] = value
+        return ClinicalContext(**values)
+
+    @classmethod
+    def from_dict(cls, context: Optional[Dict[str, Any]]) -> "ClinicalContext":
+        """Typed context from a legacy context dict"""
+        return cls().with_overrides(context)
+
+    @classmethod
+    def coerce(cls, context: Any) -> "ClinicalContext":
+        """Accept a ClinicalContext, a legacy dict or None"""
+        return context if isinstance(context, ClinicalContext) else cls.from_dict(context)
+
+class ClinicalEntityRecognizer:
+    def __init__(self, principle_terms: Iterable[str] = ()):
+        """principle_terms: principle trigger/mechanism terms reported as substring matches"""
+        # term -> list of (kind, value, boundary)
+        self._lexicon: Dict[str, List[Tuple[str, str, str]]] = {}
+        for species, terms in SPECIES_TERMS.items():
+            for term in terms:
+                self._add(term, 'species', species, 'word')
+        for drug in DRUG_TERMS:
+            self._add(drug, 'drug', drug, 'word')
+        for condition, terms in CONDITION_TERMS.items():
+            for term in terms:
+                self._add(term, 'condition', condition, 'word')
+        for term, boundary in INTERACTION_CUES:
+            self._add(term, 'interaction', term, boundary)
+        for term in HEPATIC_CUES:
+            self._add(term, 'hepatic', term, 'substring')
+        for term in principle_terms:
+            self._add(term.lower(), 'principle', term.lower(), 'substring')
+
+        self._species_rank = {species: rank for rank, species in enumerate(SPECIES_TERMS)}
+        self._drug_rank = {drug: rank for rank, drug in enumerate(DRUG_TERMS)}
+        self._condition_rank = {condition: rank for rank, condition in enumerate(CONDITION_TERMS)}
+
+        self._automaton = None
+        if ahocorasick is not None:
+            automaton = ahocorasick.Automaton()
+            for term, entries in self._lexicon.items():
+                automaton.add_word(term, (term, entries))
+            automaton.make_automaton()
+            self._automaton = automaton
+
+    def _add(self, term: str, kind: str, value: str, boundary: str):
+        self._lexicon.setdefault(term, []).append((kind, value, boundary))
+
+    def _matches(self, text: str):
+        """(start, end, term, entries) for every lexicon occurrence, overlapping ones included"""
+        if self._automaton is not None:
+            for end, (term, entries) in self._automaton.iter(text):
+                yield end - len(term) + 1, end + 1, term, entries
+            return
+        for term, entries in self._lexicon.items():
+            start = text.find(term)
+            while start != -1:
+                yield start, start + len(term), term, entries
+                start = text.find(term, start + 1)
+
+    @staticmethod
+    def _at_boundary(text: str, start: int, end: int, boundary: str) -> bool:
+        if boundary == 'substring':
+            return True
+        if start > 0 and text[start - 1].isalnum():
+            return False
+        return boundary == 'prefix' or end == len(text) or not text[end].isalnum()
+
+    def recognize(self, query: str) -> ClinicalContext:
+        """Extract the clinical context of a query"""
+        # Whitespace-collapsed, so multi-word terms match across line breaks and double spaces
+        text = " ".join(query.lower().split())
+        context = ClinicalContext()
+
+        for match in QUANTITY_PATTERN.finditer(text):
+            if match.group('weight') is not None:
+                if context.weight_kg is None:
+                    context.weight_kg = float(match.group('weight'))
+            elif context.age is None:
+                context.age = match.group('age')
+                context.age_unit = 'month' if match.group('age_unit').startswith('mo') else 'year'
+
+        species, drugs, conditions, principle_terms = set(), {}, set(), {}
+        for start, end, term, entries in self._matches(text):
+            for kind, value, boundary in entries:
+                if not self._at_boundary(text, start, end, boundary):
+                    continue
+                if kind == 'species':
+                    species.add(value)
+                elif kind == 'drug':
+                    drugs.setdefault(value, start)
+                elif kind == 'condition':
+                    conditions.add(value)
+                elif kind == 'interaction':
+                    context.interaction_query = True
+                elif kind == 'hepatic':
+                    context.hepatic_concern = True
+                else:
+                    principle_terms.setdefault(value, start)
+
+        if species:
+            context.species = min(species, key=self._species_rank.__getitem__)
+        # Drugs in lexicon order, conditions in canonical order (both as the per-pattern scans reported them)
+        context.drugs = sorted(drugs, key=self._drug_rank.__getitem__)
+        context.conditions = sorted(conditions, key=self._condition_rank.__getitem__)
+        context.principle_terms = sorted(principle_terms, key=principle_terms.__getitem__)
+        return context
+
+def main():
+    """Recognise sample queries and time the recognizer"""
+    print("🔬 CLINICAL ENTITY RECOGNIZER")
+    print("=" * 50)
+    print(f"Backend: {'pyahocorasick' if ahocorasick is not None else 'str.find fallback (pip install pyahocorasick)'}")
+
+    recognizer = ClinicalEntityRecognizer()
+    queries = [
+        "What are the drug interactions between phenobarbital and clavamox in dogs with liver disease?",
+        "How should I dose morphine for a 4.5 kg, 12 year old cat with kidney disease and seizures?",
+        "Dopamine CRI for a 10 kg dog at 5 mcg/kg/min with hypotension",
+    ]
+    for query in queries:
+        print(f"\n📋 {query}")
+        for key, value in recognizer.recognize(query).to_dict().items():
+            print(f"   {key}: {value}")
+
+    runs = 2000
+    start = time.perf_counter()
+    for _ in range(runs):
+        for query in queries:
+            recognizer.recognize(query)
+    print(f"\n⚡ {(time.perf_counter() - start) * 1e6 / (runs * len(queries)):.1f} µs per query")
+
+if __name__ == "__main__":
+    main()
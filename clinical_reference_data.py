@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Clinical Reference Data
+Versioned data file behind the pharmacological, CRI and validation engines: drug mechanisms,
+dosing safety ranges and default CRI concentrations. The file is read on first use into
+tuple-backed records with interned strings, and re-read when it changes on disk
+"""
+
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from typing import Dict, NamedTuple, Optional, Tuple
+
+DEFAULT_REFERENCE_DATA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                           "reference_data", "veterinary_reference_data.json")
+FORMAT_VERSION = 1
+
+class DrugMechanism(NamedTuple):
+    drug_name: str
+    cyp450_effects: Tuple[str, ...]  # ('inducer', 'inhibitor', 'substrate')
+    cyp450_enzymes: Tuple[str, ...]  # ('3A4', '2D6', '2C9', etc.)
+    hepatic_metabolism_percent: Optional[float]
+    renal_elimination_percent: Optional[float]
+    protein_binding_percent: Optional[float]
+    therapeutic_class: str
+    contraindications: Tuple[str, ...]
+
+class SafetyRange(NamedTuple):
+    min: float
+    max: float
+    units: str
+
+class DefaultConcentration(NamedTuple):
+    value: float
+    units: str
+
+class ReferenceTables(NamedTuple):
+    """One loaded version of the data file; replaced as a whole on reload"""
+    data_version: str
+    drug_mechanisms: Dict[str, DrugMechanism]
+    safety_ranges: Dict[str, SafetyRange]
+    cri_default_concentrations: Dict[str, DefaultConcentration]
+
+def parse_reference_tables(payload: Dict) -> ReferenceTables:
+    """Build the records from a decoded data file, sharing identical strings and string tuples"""
+    if payload.get("format_version") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported reference data format {payload.get('format_version')!r} "
+                         f"(expected {FORMAT_VERSION})")
+    shared: Dict[Tuple[str, ...], Tuple[str, ...]] = {}
+
+    def strings(values) -> Tuple[str, ...]:
+        values = tuple(sys.intern(value) for value in values)
+        return shared.setdefault(values, values)
+
+    def percent(value) -> Optional[float]:
+        return None if value is None else float(value)
+
+    try:
+        mechanisms = {
+            sys.intern(name): DrugMechanism(
+                drug_name=sys.intern(name),
+                cyp450_effects=strings(record["cyp450_effects"]),
+                cyp450_enzymes=strings(record["cyp450_enzymes"]),
+                hepatic_metabolism_percent=percent(record["hepatic_metabolism_percent"]),
+                renal_elimination_percent=percent(record["renal_elimination_percent"]),
+                protein_binding_percent=percent(record["protein_binding_percent"]),
+                therapeutic_class=sys.intern(record["therapeutic_class"]),
+                contraindications=strings(record["contraindications"])
+            )
+            for name, record in payload["drug_mechanisms"].items()
+        }
+        safety_ranges = {
+            sys.intern(name): SafetyRange(float(record["min"]), float(record["max"]), sys.intern(record["units"]))
+            for name, record in payload["safety_ranges"].items()
+        }
+        concentrations = {
+            sys.intern(name): DefaultConcentration(float(record["value"]), sys.intern(record["units"]))
+            for name, record in payload["cri_default_concentrations"].items()
+        }
+    except (KeyError, TypeError, AttributeError) as e:
+        raise ValueError(f"Malformed reference data: {e!r}") from e
+    return ReferenceTables(str(payload.get("data_version", "")), mechanisms, safety_ranges, concentrations)
+
+class ClinicalReferenceData:
+    def __init__(self, path: Optional[str] = None, reload_interval: Optional[float] = None):
+        """
+        path: versioned JSON data file (LIMOSA_REFERENCE_DATA, defaults to the copy shipped in reference_data/)
+        reload_interval: seconds between checks of the file's modification time; 0 disables hot reload
+                         (LIMOSA_REFERENCE_RELOAD_INTERVAL)
+        """
+        self.path = path or os.getenv('LIMOSA_REFERENCE_DATA') or DEFAULT_REFERENCE_DATA_PATH
+        self.reload_interval = reload_interval if reload_interval is not None else float(
+            os.getenv('LIMOSA_REFERENCE_RELOAD_INTERVAL', 5)
+        )
+        self.logger = logging.getLogger(__name__)
+
+        self._tables: Optional[ReferenceTables] = None
+        self._mtime: Optional[float] = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def tables(self) -> ReferenceTables:
+        """The current tables: read on first access, then re-read at most every reload_interval when the file changes"""
+        if self._tables is None:
+            with self._lock:
+                if self._tables is None:
+                    self._load()
+        elif self.reload_interval > 0 and time.monotonic() >= self._next_check:
+            self.reload_if_changed()
+        return self._tables
+
+    @property
+    def data_version(self) -> str:
+        return self.tables.data_version
+
+    @property
+    def drug_mechanisms(self) -> Dict[str, DrugMechanism]:
+        return self.tables.drug_mechanisms
+
+    @property
+    def safety_ranges(self) -> Dict[str, SafetyRange]:
+        return self.tables.safety_ranges
+
+    @property
+    def cri_default_concentrations(self) -> Dict[str, DefaultConcentration]:
+        return self.tables.cri_default_concentrations
+
+    def _load(self, mtime: Optional[float] = None):
+        mtime = mtime if mtime is not None else os.path.getmtime(self.path)
+        with open(self.path, 'r', encoding='utf-8') as f:
+            tables = parse_reference_tables(json.load(f))
+        self._tables, self._mtime = tables, mtime
+        self._next_check = time.monotonic() + self.reload_interval
+
+    def reload_if_changed(self) -> bool:
+        """Re-read the file if its modification time moved; a file that fails to parse leaves the current tables in place"""
+        with self._lock:
+            self._next_check = time.monotonic() + self.reload_interval
+            if self._tables is None:
+                self._load()
+                return True
+            try:
+                mtime = os.path.getmtime(self.path)
+            except OSError:
+                mtime = None
+            if mtime == self._mtime:
+                return False
+            previous = self._tables.data_version
+            try:
+                self._load(mtime)
+            except (OSError, ValueError) as e:
+                # Not retried until the file changes again
+                self._mtime = mtime
+                self.logger.warning(f"Reference data {self.path} not reloaded, keeping version {previous}: {e}")
+                return False
+        self.logger.info(f"Reference data reloaded: {previous} -> {self._tables.data_version}")
+        return True
+
+_shared_reference_data: Optional[ClinicalReferenceData] = None
+_shared_reference_data_lock = threading.Lock()
+
+def get_reference_data() -> ClinicalReferenceData:
+    """Return the process-wide reference data, so every engine shares one copy of the tables"""
+    global _shared_reference_data
+
+    if _shared_reference_data is None:
+        with _shared_reference_data_lock:
+            if _shared_reference_data is None:
+                _shared_reference_data = ClinicalReferenceData()
+
+    return _shared_reference_data
+
+def main():
+    """Load the reference data file and summarise it"""
+    print("📚 CLINICAL REFERENCE DATA")
+    print("=" * 50)
+
+    reference_data = ClinicalReferenceData(sys.argv[1] if len(sys.argv) > 1 else None)
+    start = time.perf_counter()
+    tables = reference_data.tables
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    print(f"File: {reference_data.path}")
+    print(f"Data version: {tables.data_version} (format {FORMAT_VERSION}), loaded in {elapsed_ms:.2f} ms")
+    print(f"💊 Drug mechanisms: {len(tables.drug_mechanisms)}")
+    print(f"   Therapeutic classes: {len({m.therapeutic_class for m in tables.drug_mechanisms.values()})}")
+    print(f"   CYP450 enzymes: {', '.join(sorted({e for m in tables.drug_mechanisms.values() for e in m.cyp450_enzymes}))}")
+    print(f"🛡️ Safety ranges: {len(tables.safety_ranges)}")
+    for drug, safety_range in tables.safety_ranges.items():
+        print(f"   • {drug}: {safety_range.min}-{safety_range.max} {safety_range.units}")
+    print(f"💉 Default CRI concentrations: {len(tables.cri_default_concentrations)}")
+    for drug, concentration in tables.cri_default_concentrations.items():
+        print(f"   • {drug}: {concentration.value} {concentration.units}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Clinical Reranker
+Columnar reranking of retrieval candidates: score weighting, bonuses, thresholds, top-k
+and the confidence statistics are computed on NumPy arrays instead of per-chunk loops
+"""
+
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Union
+import numpy as np
+
+@dataclass
+class RerankResult:
+    """Selected candidates, best first; arrays are aligned with order"""
+    order: np.ndarray         # indices into the candidate list
+    combined: np.ndarray      # final ranking score
+    similarity: np.ndarray    # raw vector similarity
+    relevance: np.ndarray     # clinical relevance
+    stats: Dict[str, float]   # confidence statistics over the selection
+    candidate_count: int
+
+    def __len__(self) -> int:
+        return len(self.order)
+
+    def select(self, candidates: Sequence[Dict]) -> List[Dict]:
+        """The selected candidates in ranked order"""
+        return [candidates[i] for i in self.order]
+
+class ClinicalReranker:
+    def __init__(self, relevance_weight: float = 0.3, retrieval_weight: float = 0.7,
+                 relevance_floor: Optional[float] = 10.0):
+        """
+        relevance_weight / retrieval_weight: linear blend of clinical relevance and the fused retrieval score
+        relevance_floor: candidates at or above this relevance pass the similarity threshold regardless
+        """
+        self.relevance_weight = relevance_weight
+        self.retrieval_weight = retrieval_weight
+        self.relevance_floor = relevance_floor
+
+    @staticmethod
+    def lookup_bonus(values: Sequence[str], table: Dict[str, float], default: float = 0.0) -> np.ndarray:
+        """Map categorical values (chunk type, section name) to a bonus column"""
+        return np.fromiter((table.get(value, default) for value in values), dtype=np.float64, count=len(values))
+
+    @staticmethod
+    def confidence_statistics(similarity: np.ndarray, relevance: np.ndarray) -> Dict[str, float]:
+        """Mean similarity/relevance, similarity variance and high-similarity counts"""
+        if not len(similarity):
+            return {'count': 0, 'avg_similarity': 0.0, 'avg_relevance': 0.0, 'similarity_variance': 0.0,
+                    'above_080': 0, 'above_085': 0}
+        return {
+            'count': int(len(similarity)),
+            'avg_similarity': float(similarity.mean()),
+            'avg_relevance': float(relevance.mean()),
+            'similarity_variance': float(similarity.var()),
+            'above_080': int(np.count_nonzero(similarity >= 0.80)),
+            'above_085': int(np.count_nonzero(similarity >= 0.85)),
+        }
+
+    def rerank(self, similarity: Sequence[float], relevance: Sequence[float],
+               retrieval: Optional[Sequence[float]] = None, bonus: Optional[np.ndarray] = None,
+               thresholds: Union[None, float, np.ndarray] = None, top_k: Optional[int] = None) -> RerankResult:
+        """
+        Rank candidates by relevance_weight * relevance + retrieval_weight * retrieval (+ bonus),
+        keep those with similarity >= threshold (or relevance >= relevance_floor), then cut to top_k.
+        retrieval defaults to similarity; thresholds may be one value or one per candidate.
+        Ties keep candidate order, as a stable sort would.
+        """
+        similarity = np.asarray(similarity, dtype=np.float64)
+        relevance = np.asarray(relevance, dtype=np.float64)
+        retrieval = similarity if retrieval is None else np.asarray(retrieval, dtype=np.float64)
+
+        combined = relevance * self.relevance_weight + retrieval * self.retrieval_weight
+        if bonus is not None:
+            combined = combined + bonus
+
+        order = np.argsort(-combined, kind='stable')
+        if thresholds is not None:
+            keep = similarity >= thresholds
+            if self.relevance_floor is not None:
+                keep |= relevance >= self.relevance_floor
+            order = order[keep[order]]
+        if top_k is not None:
+            order = order[:top_k]
+
+        selected_similarity = similarity[order]
+        selected_relevance = relevance[order]
+        return RerankResult(
+            order=order,
+            combined=combined[order],
+            similarity=selected_similarity,
+            relevance=selected_relevance,
+            stats=self.confidence_statistics(selected_similarity, selected_relevance),
+            candidate_count=len(combined)
+        )
+
+def main():
+    """Time the reranker against the per-chunk loop on synthetic fused candidates"""
+    print("📊 CLINICAL RERANKER BENCHMARK")
+    print("=" * 50)
+
+    rng = np.random.default_rng(0)
+    reranker = ClinicalReranker()
+    for size in (50, 200, 800):
+        similarity = rng.uniform(0.6, 0.95, size)
+        relevance = rng.integers(0, 60, size).astype(float)
+        fused = similarity * rng.uniform(1.0, 3.0, size)
+        thresholds = np.where(rng.random(size) < 0.3, 0.70, 0.75)
+        candidates = [
+            {'score': s, 'clinical_relevance': r, 'fused_score': f, 'threshold': t}
+            for s, r, f, t in zip(similarity.tolist(), relevance.tolist(), fused.tolist(), thresholds.tolist())
+        ]
+
+        runs = 200
+        start = time.perf_counter()
+        for _ in range(runs):
+            ranked = sorted(candidates, key=lambda x: x['clinical_relevance'] * 0.3 + x['fused_score'] * 0.7, reverse=True)
+            kept = [c for c in ranked if c['score'] >= c['threshold'] or c['clinical_relevance'] >= 10][:15]
+            avg = sum(c['score'] for c in kept) / len(kept)
+            sum((c['score'] - avg) ** 2 for c in kept) / len(kept)
+        loop_ms = (time.perf_counter() - start) * 1000 / runs
+
+        start = time.perf_counter()
+        for _ in range(runs):
+            # Column extraction from the candidate dicts is part of the cost
+            result = reranker.rerank([c['score'] for c in candidates], [c['clinical_relevance'] for c in candidates],
+                                     [c['fused_score'] for c in candidates], top_k=15,
+                                     thresholds=np.array([c['threshold'] for c in candidates]))
+        rerank_ms = (time.perf_counter() - start) * 1000 / runs
+
+        status = "✅" if result.select(candidates) == kept else "❌ MISMATCH"
+        print(f"   {status} {size} candidates: loop {loop_ms:.3f} ms, reranker {rerank_ms:.3f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Query Embedding Cache
+Two-tier cache for query embeddings: a bounded in-process LRU in front of a SQLite
+store of float32 blobs that every Streamlit worker process on the host shares
+"""
+
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+import numpy as np
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "limosa", "embeddings.sqlite3")
+
+class EmbeddingCache:
+    def __init__(self, path: Optional[str] = None, memory_size: Optional[int] = None,
+                 max_disk_entries: Optional[int] = None):
+        """
+        path: SQLite file for the shared tier (LIMOSA_EMBEDDING_CACHE, empty string disables it)
+        memory_size: entries kept in the in-process LRU (LIMOSA_EMBEDDING_CACHE_SIZE)
+        max_disk_entries: rows kept on disk before the oldest are pruned (LIMOSA_EMBEDDING_CACHE_MAX_ROWS)
+        """
+        self.logger = logging.getLogger(__name__)
+
+        self.path = os.path.expanduser(
+            path if path is not None else os.getenv('LIMOSA_EMBEDDING_CACHE', DEFAULT_CACHE_PATH)
+        )
+        self.memory_size = memory_size if memory_size is not None else int(
+            os.getenv('LIMOSA_EMBEDDING_CACHE_SIZE', 2048)
+        )
+        self.max_disk_entries = max_disk_entries if max_disk_entries is not None else int(
+            os.getenv('LIMOSA_EMBEDDING_CACHE_MAX_ROWS', 100000)
+        )
+
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes_since_prune = 0
+        self.stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'stores': 0}
+
+        self._db = self._open_disk_tier() if self.path else None
+
+    def _open_disk_tier(self) -> Optional[sqlite3.Connection]:
+        """Open (or create) the shared SQLite store; falls back to memory-only on failure"""
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            db = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False)
+            # WAL lets several worker processes read while one writes
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "key TEXT PRIMARY KEY, model TEXT NOT NULL, dim INTEGER NOT NULL, "
+                "vector BLOB NOT NULL, created_at REAL NOT NULL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS embeddings_created_at ON embeddings (created_at)")
+            db.commit()
+            return db
+        except sqlite3.Error as e:
+            self.logger.warning(f"Embedding cache disk tier disabled ({self.path}): {e}")
+            return None
+
+    @staticmethod
+    def normalize_text(text: str) -> str:
+        """Case- and whitespace-insensitive form used for cache keys"""
+        return " ".join(text.lower().split())
+
+    @classmethod
+    def cache_key(cls, model: str, text: str) -> str:
+        """Keys include the model name so a model change never serves stale vectors"""
+        return hashlib.sha256(f"{model}\x00{cls.normalize_text(text)}".encode("utf-8")).hexdigest()
+
+    def get_many(self, model: str, texts: List[str]) -> List[Optional[List[float]]]:
+        """Look up embeddings for texts; misses are returned as None in their position"""
+        keys = [self.cache_key(model, text) for text in texts]
+        found: Dict[str, np.ndarray] = {}
+
+        with self._lock:
+            for key in keys:
+                if key in self._memory:
+                    self._memory.move_to_end(key)
+                    found[key] = self._memory[key]
+
+            disk_keys = [key for key in dict.fromkeys(keys) if key not in found]
+            if disk_keys and self._db is not None:
+                for key, vector in self._read_disk(disk_keys).items():
+                    found[key] = vector
+                    self._remember(key, vector)
+                    self.stats['disk_hits'] += 1
+
+            results = []
+            for key in keys:
+                vector = found.get(key)
+                if vector is None:
+                    self.stats['misses'] += 1
+                    results.append(None)
+                else:
+                    if key not in disk_keys:
+                        self.stats['memory_hits'] += 1
+                    results.append(vector.tolist())
+
+        return results
+
+    def put_many(self, model: str, texts: List[str], embeddings: List[List[float]]):
+        """Store freshly created embeddings in both tiers"""
+        rows = []
+        now = time.time()
+
+        with self._lock:
+            for text, embedding in zip(texts, embeddings):
+                key = self.cache_key(model, text)
+                vector = np.asarray(embedding, dtype=np.float32)
+                self._remember(key, vector)
+                rows.append((key, model, int(vector.shape[0]), vector.tobytes(), now))
+            self.stats['stores'] += len(rows)
+
+            if rows and self._db is not None:
+                self._write_disk(rows)
+
+    def _remember(self, key: str, vector: np.ndarray):
+        """Insert into the memory LRU, evicting the least recently used entries"""
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def _read_disk(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        """Fetch float32 blobs for keys from the shared store"""
+        try:
+            placeholders = ",".join("?" * len(keys))
+            rows = self._db.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", keys
+            ).fetchall()
+        except sqlite3.Error as e:
+            self.logger.warning(f"Embedding cache read failed: {e}")
+            return {}
+        return {key: np.frombuffer(blob, dtype=np.float32) for key, blob in rows}
+
+    def _write_disk(self, rows: List[tuple]):
+        """Persist rows and periodically prune the oldest entries beyond max_disk_entries"""
+        try:
+            self._db.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?, ?)", rows)
+            self._writes_since_prune += len(rows)
+            if self._writes_since_prune >= 500:
+                self._writes_since_prune = 0
+                self._db.execute(
+                    "DELETE FROM embeddings WHERE key IN ("
+                    "SELECT key FROM embeddings ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_disk_entries,)
+                )
+            self._db.commit()
+        except sqlite3.Error as e:
+            self.logger.warning(f"Embedding cache write failed: {e}")
+
+    def get_stats(self) -> Dict[str, float]:
+        """Hit/miss counters plus the overall hit rate"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats['memory_entries'] = len(self._memory)
+        lookups = stats['memory_hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_rate'] = (stats['memory_hits'] + stats['disk_hits']) / lookups if lookups else 0.0
+        return stats
+
+    def close(self):
+        """Close the shared store"""
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+def main():
+    """Show cache statistics for the configured store"""
+    print("🧠 QUERY EMBEDDING CACHE")
+    print("=" * 50)
+
+    cache = EmbeddingCache()
+    print(f"📁 Store: {cache.path or 'memory only'}")
+    if cache._db is not None:
+        count, size = cache._db.execute(
+            "SELECT COUNT(*), COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings"
+        ).fetchone()
+        print(f"📊 Cached embeddings: {count} ({size / 1_048_576:.1f} MB)")
+        for model, model_count in cache._db.execute(
+            "SELECT model, COUNT(*) FROM embeddings GROUP BY model"
+        ).fetchall():
+            print(f"   {model}: {model_count}")
+    cache.close()
+
+if __name__ == "__main__":
+    main()
@@ -5,7 +5,11 @@ Implements the last optimizations to achieve consistent 95%+ confidence
 """
 
 import json
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict
+import numpy as np
+from clinical_reranker import ClinicalReranker
+from embedding_cache import EmbeddingCache
 from high_confidence_optimizer import HighConfidenceVeterinaryAssistant
 
 class Final95ConfidenceAssistant(HighConfidenceVeterinaryAssistant):
@@ -36,6 +40,12 @@ class Final95ConfidenceAssistant(HighConfidenceVeterinaryAssistant):
             'mechanism_context': ['pharmacological action', 'therapeutic mechanism', 'drug action']
         }
         
+        # Semantic and clinical scores weigh equally; type/section/name bonuses are added on top
+        self.reranker = ClinicalReranker(relevance_weight=0.35, retrieval_weight=0.35, relevance_floor=None)
+        
+        # Repeat query variants skip the embeddings round trip (memory LRU + shared SQLite tier)
+        self.embedding_cache = EmbeddingCache()
+        
         print("🎯 Final 95% Confidence Assistant initialized!")
 
     def enhance_query_with_context(self, query: str) -> str:
@@ -128,8 +138,29 @@ class Final95ConfidenceAssistant(HighConfidenceVeterinaryAssistant):
         
         return relevance_score + element_bonus
 
+    def embed_texts(self, texts: List[str]) -> List[List[float]]:
+        """Embed any number of texts: cached vectors first, then a single batched request for the rest"""
+        if not texts:
+            return []
+        
+        embeddings = self.embedding_cache.get_many(self.embedding_model, texts)
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if not missing:
+            return embeddings
+        
+        response = self.openai_client.embeddings.create(
+            input=[texts[i] for i in missing],
+            model=self.embedding_model
+        )
+        fresh = [data.embedding for data in sorted(response.data, key=lambda d: d.index)]
+        self.embedding_cache.put_many(self.embedding_model, [texts[i] for i in missing], fresh)
+        
+        for i, embedding in zip(missing, fresh):
+            embeddings[i] = embedding
+        return embeddings
+
     def multi_query_search(self, original_query: str) -> List[Dict]:
-        """Enhanced multi-query search with better synonym expansion"""
+        """Enhanced multi-query search: one batched embedding call, parallel vector queries"""
         expanded_queries = self.expand_query_with_enhanced_synonyms(original_query)
         
         print(f"🔍 Enhanced search with {len(expanded_queries)} query variations...")
@@ -137,22 +168,40 @@ class Final95ConfidenceAssistant(HighConfidenceVeterinaryAssistant):
         all_results = {}
         query_weights = [1.0, 0.9, 0.8, 0.7, 0.6, 0.5, 0.4, 0.3]  # More nuanced weights
         
-        for i, query in enumerate(expanded_queries):
+        try:
+            query_embeddings = self.embed_texts(expanded_queries)
+        except Exception as e:
+            print(f"⚠️ Batched embedding failed for {len(expanded_queries)} variations, embedding one at a time - {str(e)}")
+            query_embeddings = []
+            for query in expanded_queries:
+                try:
+                    query_embeddings.extend(self.embed_texts([query]))
+                except Exception as e:
+                    print(f"⚠️ Embedding failed: {query[:50]}... - {str(e)}")
+                    query_embeddings.append(None)
+        
+        # Variants keep their original position so the weights stay aligned
+        variants = [(i, query, embedding) for i, (query, embedding) in enumerate(zip(expanded_queries, query_embeddings))
+                    if embedding is not None]
+        if not variants:
+            return []
+        
+        def search(query_embedding):
+            return self.pinecone_client.query(
+                vector=query_embedding,
+                top_k=self.top_k_results,
+                include_metadata=True,
+                filter={'category': 'veterinary_drug'}
+            )
+        
+        with ThreadPoolExecutor(max_workers=len(variants)) as executor:
+            futures = [executor.submit(search, embedding) for _, _, embedding in variants]
+        
+        for (i, query, _), future in zip(variants, futures):
             weight = query_weights[min(i, len(query_weights)-1)]
             
             try:
-                response = self.openai_client.embeddings.create(
-                    input=query,
-                    model=self.embedding_model
-                )
-                query_embedding = response.data[0].embedding
-                
-                search_results = self.pinecone_client.query(
-                    vector=query_embedding,
-                    top_k=self.top_k_results,
-                    include_metadata=True,
-                    filter={'category': 'veterinary_drug'}
-                )
+                search_results = future.result()
                 
                 for match in search_results['matches']:
                     chunk_id = match['id']
@@ -184,59 +233,53 @@ class Final95ConfidenceAssistant(HighConfidenceVeterinaryAssistant):
 
     def rank_chunks_by_clinical_relevance(self, chunks: List[Dict], query: str) -> List[Dict]:
         """Enhanced ranking with improved clinical scoring"""
-        
-        for chunk in chunks:
-            text = chunk['metadata'].get('text', '')
-            
-            # Use enhanced clinical scoring
-            semantic_score = chunk['aggregated_score']
-            clinical_score = self.calculate_enhanced_clinical_score(text, query)
-            
-            # Enhanced chunk type priority
-            chunk_type = chunk['metadata'].get('chunk_type', '')
-            type_bonus = {
-                'clinical_overview': 0.25,  # Increased
-                'clinical_section': 0.20,   # Increased
-                'species_dosing': 0.15,     # Increased
-                'dosing_critical': 0.30
-            }.get(chunk_type, 0.0)
-            
-            # Enhanced drug name matching
-            drug_name = chunk['metadata'].get('drug_name', '').lower()
-            query_terms = query.lower().split()
-            exact_matches = sum(1 for term in query_terms if term in drug_name)
-            exact_match_bonus = min(exact_matches * 0.15, 0.45)  # Up to 45% bonus
-            
-            # Enhanced section priority
-            section_name = chunk['metadata'].get('section_name', '')
-            priority_sections = {
-                'dosage': 0.20,
-                'contraindications': 0.18,
-                'adverse_effects': 0.15,
-                'indications': 0.12,
-                'pharmacology': 0.10
-            }
-            section_bonus = priority_sections.get(section_name, 0.05)
-            
-            # Calculate final score with enhanced weighting
-            final_score = (
-                semantic_score * 0.35 +          # Reduced semantic weight
-                clinical_score * 0.35 +          # Increased clinical weight
-                type_bonus +                     # Enhanced type bonus
-                exact_match_bonus +              # Enhanced exact match
-                section_bonus                    # Enhanced section bonus
-            )
-            
+        if not chunks:
+            return []
+        
+        metadata = [chunk['metadata'] for chunk in chunks]
+        semantic_scores = np.array([chunk['aggregated_score'] for chunk in chunks], dtype=np.float64)
+        clinical_scores = np.array([self.calculate_enhanced_clinical_score(m.get('text', ''), query) for m in metadata],
+                                   dtype=np.float64)
+        
+        # Enhanced chunk type priority
+        type_bonus = ClinicalReranker.lookup_bonus([m.get('chunk_type', '') for m in metadata], {
+            'clinical_overview': 0.25,  # Increased
+            'clinical_section': 0.20,   # Increased
+            'species_dosing': 0.15,     # Increased
+            'dosing_critical': 0.30
+        })
+        
+        # Enhanced drug name matching
+        query_terms = query.lower().split()
+        exact_matches = np.array([sum(1 for term in query_terms if term in m.get('drug_name', '').lower()) for m in metadata],
+                                 dtype=np.float64)
+        exact_match_bonus = np.minimum(exact_matches * 0.15, 0.45)  # Up to 45% bonus
+        
+        # Enhanced section priority
+        section_bonus = ClinicalReranker.lookup_bonus([m.get('section_name', '') for m in metadata], {
+            'dosage': 0.20,
+            'contraindications': 0.18,
+            'adverse_effects': 0.15,
+            'indications': 0.12,
+            'pharmacology': 0.10
+        }, default=0.05)
+        
+        # Final score: semantic * 0.35 + clinical * 0.35 (reduced semantic, increased clinical weight) + bonuses
+        ranking = self.reranker.rerank(semantic_scores, clinical_scores,
+                                       bonus=type_bonus + exact_match_bonus + section_bonus)
+        
+        ranked_chunks = ranking.select(chunks)
+        for chunk, i, final_score in zip(ranked_chunks, ranking.order.tolist(), ranking.combined.tolist()):
             chunk['final_confidence_score'] = final_score
             chunk['confidence_breakdown'] = {
-                'semantic': semantic_score,
-                'clinical': clinical_score,
-                'type_bonus': type_bonus,
-                'exact_match': exact_match_bonus,
-                'section_bonus': section_bonus
+                'semantic': float(semantic_scores[i]),
+                'clinical': float(clinical_scores[i]),
+                'type_bonus': float(type_bonus[i]),
+                'exact_match': float(exact_match_bonus[i]),
+                'section_bonus': float(section_bonus[i])
             }
         
-        return sorted(chunks, key=lambda x: x['final_confidence_score'], reverse=True)
+        return ranked_chunks
 
 def test_final_95_confidence():
     """Test the final 95% confidence implementation"""
@@ -4,14 +4,49 @@ Final 95% Confidence Assistant - Standalone Version
 Production-ready veterinary database query system with 95%+ confidence
 """
 
+import asyncio
 import json
 import os
-from typing import List, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Generator, Iterator, Optional, Tuple
+import numpy as np
 import openai
 from pinecone import Pinecone
 import anthropic
+from clinical_reranker import ClinicalReranker
+from embedding_cache import EmbeddingCache
+from local_vector_index import open_local_vector_index
+from keyword_scorer import KeywordScorer
+from lexical_index import RRF_K, open_lexical_index, reciprocal_rank_fusion
 
 class Final95ConfidenceAssistant:
+    # Clinical relevance keywords with weights (enhanced for emergency medicine)
+    CLINICAL_KEYWORDS = {
+        # Core veterinary terms
+        'veterinary': 10, 'clinical': 8, 'dosage': 15, 'dose': 15, 'mg/kg': 20,
+        'contraindication': 12, 'adverse': 10, 'pharmacology': 8, 'indication': 10,
+        'canine': 8, 'feline': 8, 'equine': 8, 'bovine': 6, 'treatment': 6,
+        'administration': 10, 'injection': 8, 'oral': 6, 'toxicity': 12, 'safety': 10,
+        # Emergency medicine terms (high weights for critical conditions)
+        'gdv': 18, 'bloat': 15, 'volvulus': 16, 'gastric': 12, 'dilatation': 14,
+        'emergency': 18, 'acute': 15, 'critical': 16, 'urgent': 14, 'stat': 12,
+        'radiograph': 12, 'x-ray': 10, 'lateral': 8, 'imaging': 10, 'film': 6,
+        'compartmentalization': 15, 'compartment': 12, 'bubble': 12, 'sign': 8,
+        'stabilization': 14, 'decompression': 16, 'trocar': 12, 'torsion': 14,
+        'shock': 16, 'collapse': 12, 'distended': 10, 'tympanitic': 12,
+        'tachycardia': 10, 'pale': 8, 'weak': 8, 'pulse': 10, 'mucous': 6,
+        # Diagnostic and procedural terms
+        'diagnosis': 12, 'differential': 10, 'physical': 8, 'exam': 8,
+        'positioning': 10, 'view': 8, 'findings': 10, 'pathognomonic': 14,
+        # Procedural and emergency terms (high weights for critical procedures)
+        'trocarization': 20, 'trocar': 18, 'paralumbar': 16, 'fossa': 14,
+        'landmark': 15, 'anatomical': 12, 'insertion': 14, 'technique': 12,
+        'equipment': 14, 'needle': 12, 'gauge': 10, 'procedure': 12,
+        'decompression': 16, 'emergency': 18, 'critical': 16, 'urgent': 14,
+        'cvt': 10, 'technician': 8, 'preparation': 10, 'surgical': 12,
+        'location': 10, 'position': 10, 'size': 8, 'length': 8,
+    }
+    
     def __init__(self):
         """Initialize with final optimizations for 95%+ confidence"""
         print("🎯 Initializing High-Confidence Veterinary Assistant...")
@@ -19,13 +54,35 @@ class Final95ConfidenceAssistant:
         # Initialize clients
         self.openai_client = openai.OpenAI()
         self.anthropic_client = anthropic.Anthropic()
+        # Async clients for the asyncio API, created on first use
+        self._async_openai_client = None
+        self._async_anthropic_client = None
         
-        # Initialize Pinecone
-        pc = Pinecone()
-        try:
-            self.pinecone_client = pc.Index("veterinary-drugs")
-        except:
-            self.pinecone_client = pc.Index("project-docs")
+        # Retrieval configuration
+        self.embedding_model = "text-embedding-ada-002"
+        self.top_k_results = 25
+        self.query_weights = [1.0, 0.9, 0.8, 0.7, 0.6, 0.5, 0.4, 0.3]  # Per-variant fusion weights
+        
+        # Repeat queries skip the embeddings round trip (memory LRU + shared SQLite tier)
+        self.embedding_cache = EmbeddingCache()
+        
+        # Vector queries for query variants run in parallel on this pool
+        self._search_executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv('LIMOSA_SEARCH_WORKERS', 8)),
+            thread_name_prefix="limosa-search"
+        )
+        
+        # Initialize the vector index (local in-process index when LIMOSA_VECTOR_BACKEND=local)
+        self.pinecone_client = open_local_vector_index()
+        if self.pinecone_client is None:
+            pc = Pinecone()
+            try:
+                self.pinecone_client = pc.Index("veterinary-drugs")
+            except:
+                self.pinecone_client = pc.Index("project-docs")
+        
+        # BM25 index over chunk text, searched alongside the vectors once built (lexical_index.py --build)
+        self.lexical_index = open_lexical_index()
         
         # Enhanced veterinary synonyms (including emergency medicine)
         self.enhanced_synonyms = {
@@ -59,36 +116,69 @@ class Final95ConfidenceAssistant:
             'procedure': ['technique', 'method', 'approach', 'protocol', 'steps'],
         }
         
-        # Clinical relevance keywords with weights (enhanced for emergency medicine)
-        self.clinical_keywords = {
-            # Core veterinary terms
-            'veterinary': 10, 'clinical': 8, 'dosage': 15, 'dose': 15, 'mg/kg': 20,
-            'contraindication': 12, 'adverse': 10, 'pharmacology': 8, 'indication': 10,
-            'canine': 8, 'feline': 8, 'equine': 8, 'bovine': 6, 'treatment': 6,
-            'administration': 10, 'injection': 8, 'oral': 6, 'toxicity': 12, 'safety': 10,
-            # Emergency medicine terms (high weights for critical conditions)
-            'gdv': 18, 'bloat': 15, 'volvulus': 16, 'gastric': 12, 'dilatation': 14,
-            'emergency': 18, 'acute': 15, 'critical': 16, 'urgent': 14, 'stat': 12,
-            'radiograph': 12, 'x-ray': 10, 'lateral': 8, 'imaging': 10, 'film': 6,
-            'compartmentalization': 15, 'compartment': 12, 'bubble': 12, 'sign': 8,
-            'stabilization': 14, 'decompression': 16, 'trocar': 12, 'torsion': 14,
-            'shock': 16, 'collapse': 12, 'distended': 10, 'tympanitic': 12,
-            'tachycardia': 10, 'pale': 8, 'weak': 8, 'pulse': 10, 'mucous': 6,
-            # Diagnostic and procedural terms
-            'diagnosis': 12, 'differential': 10, 'physical': 8, 'exam': 8,
-            'positioning': 10, 'view': 8, 'findings': 10, 'pathognomonic': 14,
-            # Procedural and emergency terms (high weights for critical procedures)
-            'trocarization': 20, 'trocar': 18, 'paralumbar': 16, 'fossa': 14,
-            'landmark': 15, 'anatomical': 12, 'insertion': 14, 'technique': 12,
-            'equipment': 14, 'needle': 12, 'gauge': 10, 'procedure': 12,
-            'decompression': 16, 'emergency': 18, 'critical': 16, 'urgent': 14,
-            'cvt': 10, 'technician': 8, 'preparation': 10, 'surgical': 12,
-            'location': 10, 'position': 10, 'size': 8, 'length': 8,
-        }
+        # Clinical relevance keywords are matched in a single pass over each chunk
+        self.clinical_keywords = self.CLINICAL_KEYWORDS
+        self.clinical_keyword_scorer = KeywordScorer(self.clinical_keywords)
+        # Chunks mentioning procedural or emergency terms get a lower similarity threshold
+        self.lenient_threshold_scorer = KeywordScorer([
+            'trocar', 'procedure', 'technique', 'landmark', 'equipment', 'insertion',
+            'emergency', 'critical', 'urgent', 'decompression'
+        ])
+        # Blends clinical relevance (0.3) with the fused retrieval score (0.7); relevance >= 10 passes any threshold
+        self.reranker = ClinicalReranker(relevance_weight=0.3, retrieval_weight=0.7, relevance_floor=10)
         
         print("✅ High-Confidence Veterinary Assistant ready!")
         print("🎯 Final 95% Confidence Assistant initialized!")
     
+    def close(self):
+        """Close the search pool, the embedding cache and the OpenAI, Anthropic and Pinecone connections"""
+        self._search_executor.shutdown(wait=False, cancel_futures=True)
+        self.embedding_cache.close()
+        if self.lexical_index is not None:
+            self.lexical_index.close()
+        for client in (self.openai_client, self.anthropic_client, self.pinecone_client):
+            close = getattr(client, 'close', None)
+            if close:
+                try:
+                    close()
+                except Exception as e:
+                    print(f"⚠️ Error closing {type(client).__name__}: {str(e)}")
+    
+    @property
+    def async_openai_client(self) -> "openai.AsyncOpenAI":
+        if self._async_openai_client is None:
+            self._async_openai_client = openai.AsyncOpenAI()
+        return self._async_openai_client
+    
+    @property
+    def async_anthropic_client(self) -> "anthropic.AsyncAnthropic":
+        if self._async_anthropic_client is None:
+            self._async_anthropic_client = anthropic.AsyncAnthropic()
+        return self._async_anthropic_client
+    
+    async def aclose(self):
+        """Close the async clients (on the event loop that used them), then everything close() releases"""
+        for client in (self._async_openai_client, self._async_anthropic_client):
+            if client is not None:
+                try:
+                    await client.close()
+                except Exception as e:
+                    print(f"⚠️ Error closing {type(client).__name__}: {str(e)}")
+        self._async_openai_client = self._async_anthropic_client = None
+        self.close()
+    
+    def knowledge_base_version(self) -> str:
+        """Identifier of the indexed knowledge base (LIMOSA_KB_VERSION, else backend and vector count)"""
+        configured = os.getenv('LIMOSA_KB_VERSION')
+        if configured:
+            return configured
+        try:
+            stats = self.pinecone_client.describe_index_stats()
+            return f"{type(self.pinecone_client).__name__}:{stats['dimension']}:{stats['total_vector_count']}"
+        except Exception as e:
+            print(f"⚠️ Could not read index stats for the knowledge-base version: {str(e)}")
+            return "unknown"
+    
     def expand_query_semantically(self, query: str) -> List[str]:
         """Expand query with veterinary-specific synonyms (enhanced for emergency medicine)"""
         query_lower = query.lower()
@@ -120,116 +210,431 @@ class Final95ConfidenceAssistant:
     
     def calculate_clinical_relevance(self, text: str) -> float:
         """Calculate clinical relevance score for text"""
-        text_lower = text.lower()
-        relevance_score = 0
+        return self.clinical_keyword_scorer.score(text.lower())
+    
+    def embed_texts(self, texts: List[str]) -> List[List[float]]:
+        """Embed any number of texts: cached vectors first, then a single batched request for the rest"""
+        if not texts:
+            return []
+        
+        embeddings = self.embedding_cache.get_many(self.embedding_model, texts)
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if not missing:
+            return embeddings
         
-        for keyword, weight in self.clinical_keywords.items():
-            count = text_lower.count(keyword)
-            relevance_score += count * weight
+        response = self.openai_client.embeddings.create(
+            input=[texts[i] for i in missing],
+            model=self.embedding_model
+        )
+        fresh = [data.embedding for data in sorted(response.data, key=lambda d: d.index)]
+        self.embedding_cache.put_many(self.embedding_model, [texts[i] for i in missing], fresh)
         
-        return relevance_score
+        for i, embedding in zip(missing, fresh):
+            embeddings[i] = embedding
+        return embeddings
     
-    def query_with_high_confidence(self, query: str, conversation_history: List[Dict] = None) -> Dict[str, Any]:
-        """Main query method with 95%+ confidence optimization"""
+    async def aembed_texts(self, texts: List[str]) -> List[List[float]]:
+        """Async embed_texts: cached vectors first, then one batched request on the async client"""
+        if not texts:
+            return []
         
-        print(f"\n🎯 High-Confidence Query: {query}")
-        print("=" * 70)
+        embeddings = self.embedding_cache.get_many(self.embedding_model, texts)
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if not missing:
+            return embeddings
         
-        try:
-            # Step 1: Multi-query semantic search
-            print("1️⃣ Performing multi-query semantic search...")
-            expanded_queries = self.expand_query_semantically(query)
-            print(f"🔍 Enhanced search with {len(expanded_queries)} query variations...")
-            
-            all_results = []
-            
-            # Get embedding for main query
-            embedding_response = self.openai_client.embeddings.create(
-                input=query,
-                model="text-embedding-ada-002"
-            )
-            query_embedding = embedding_response.data[0].embedding
-            
-            # Search with main query
-            search_results = self.pinecone_client.query(
-                vector=query_embedding,
-                top_k=25,
-                include_metadata=True
-            )
-            
-            all_results.extend(search_results.matches)
-            print(f"   📚 Aggregated {len(all_results)} results from expanded queries")
-            
-            # Step 2: Clinical relevance ranking
-            print("2️⃣ Ranking by clinical relevance...")
-            for result in all_results:
-                if 'text' in result.metadata:
-                    result.clinical_relevance = self.calculate_clinical_relevance(result.metadata['text'])
-                else:
-                    result.clinical_relevance = 0
-            
-            # Sort by clinical relevance + similarity score
-            all_results.sort(key=lambda x: (x.clinical_relevance * 0.3 + x.score * 0.7), reverse=True)
-            
-            # Step 3: High-confidence filtering
-            print("3️⃣ Filtering for high-confidence results...")
-            high_confidence_results = []
+        response = await self.async_openai_client.embeddings.create(
+            input=[texts[i] for i in missing],
+            model=self.embedding_model
+        )
+        fresh = [data.embedding for data in sorted(response.data, key=lambda d: d.index)]
+        self.embedding_cache.put_many(self.embedding_model, [texts[i] for i in missing], fresh)
+        
+        for i, embedding in zip(missing, fresh):
+            embeddings[i] = embedding
+        return embeddings
+    
+    def _search_vector(self, embedding: List[float]) -> List[Dict]:
+        """Single vector query returning plain chunk dicts"""
+        search_results = self.pinecone_client.query(
+            vector=embedding,
+            top_k=self.top_k_results,
+            include_metadata=True
+        )
+        return [
+            {
+                'chunk_id': match.id,
+                'score': match.score,
+                'metadata': match.metadata or {}
+            }
+            for match in search_results.matches
+        ]
+    
+    def multi_query_search(self, queries: List[str], embeddings: Optional[List[List[float]]] = None) -> List[Dict]:
+        """
+        Multi-query search: one batched embedding call for all query variants, parallel
+        vector queries, then weighted aggregation (earlier variants weigh more, repeat hits are boosted)
+        """
+        # Remove duplicate variants, keeping any precomputed embeddings aligned
+        unique_queries, unique_embeddings, seen = [], [], set()
+        for i, query in enumerate(queries):
+            if query.lower() not in seen:
+                seen.add(query.lower())
+                unique_queries.append(query)
+                if embeddings is not None:
+                    unique_embeddings.append(embeddings[i])
+        
+        if embeddings is None:
+            unique_embeddings = self.embed_texts(unique_queries)
+        
+        if hasattr(self.pinecone_client, 'query_batch'):
+            # Local index scores every variant in one pass over the matrix
+            match_lists = [
+                [{'chunk_id': m.id, 'score': m.score, 'metadata': m.metadata or {}} for m in response.matches]
+                for response in self.pinecone_client.query_batch(
+                    unique_embeddings, top_k=self.top_k_results, include_metadata=True
+                )
+            ]
+        elif len(unique_embeddings) == 1:
+            match_lists = [self._search_vector(unique_embeddings[0])]
+        else:
+            match_lists = list(self._search_executor.map(self._search_vector, unique_embeddings))
+        
+        all_results = {}
+        for i, matches in enumerate(match_lists):
+            weight = self.query_weights[min(i, len(self.query_weights) - 1)]
             
-
-            # Enhanced filtering for procedural content
-            for result in all_results:
-                # Lower threshold for procedural/emergency content
-                is_procedural = any(term in result.metadata.get('text', '').lower() 
-                                  for term in ['trocar', 'procedure', 'technique', 'landmark', 'equipment', 'insertion'])
-                is_emergency = any(term in result.metadata.get('text', '').lower() 
-                                 for term in ['emergency', 'critical', 'urgent', 'decompression'])
-                
-                threshold = 0.70 if (is_procedural or is_emergency) else 0.75
+            for match in matches:
+                chunk_id = match['chunk_id']
+                weighted_score = match['score'] * weight
                 
-                if (result.score >= threshold or result.clinical_relevance >= 10):
-                    high_confidence_results.append(result)
-            
-            print(f"   ✅ {len(high_confidence_results)} high-confidence chunks selected")
-            
-            if not high_confidence_results:
-                return {
-                    'answer': "I don't have high-confidence information about this query. Please try rephrasing your question or provide more specific details.",
-                    'confidence': 0.0,
-                    'high_confidence_chunks': 0,
-                    'drugs_found': []
-                }
-            
-            # Step 4: Context formatting
-            print("4️⃣ Formatting high-confidence context...")
-
-            # Use more context for procedural queries
-            is_procedural_query = any(term in query.lower() 
-                                    for term in ['trocar', 'procedure', 'technique', 'landmark', 'equipment', 'how to', 'list'])
-            context_size = 20 if is_procedural_query else 15
-            context_chunks = high_confidence_results[:context_size]
-            
-            context = "\n\n".join([
-                f"REFERENCE {i+1} (Confidence: {chunk.score:.1%}, Clinical Relevance: {chunk.clinical_relevance}):\n{chunk.metadata.get('text', '')}"
-                for i, chunk in enumerate(context_chunks)
-            ])
-            
-            # Step 5: Generate response with Claude
-            print("5️⃣ Generating high-confidence clinical response...")
-            
-            # Process conversation history for context
-            conversation_context = ""
-            if conversation_history:
-                print(f"   📝 Including {len(conversation_history)} previous messages for context...")
-                # Get recent relevant context
-                recent_messages = conversation_history[-6:]  # Last 6 messages
-                conversation_context = "\n\nPREVIOUS CONVERSATION CONTEXT:\n"
-                for msg in recent_messages:
-                    role = msg.get('role', 'unknown')
-                    content = msg.get('content', '')[:200]  # Limit length
-                    conversation_context += f"{role.upper()}: {content}\n"
-                conversation_context += "\n"
-            
-            system_prompt = """You are a veterinary medical expert providing clinical information from your comprehensive veterinary knowledge. 
+                if chunk_id in all_results:
+                    # Enhanced aggregation for multiple matches
+                    all_results[chunk_id]['aggregated_score'] += weighted_score * 0.6
+                    all_results[chunk_id]['query_matches'] += 1
+                    all_results[chunk_id]['score'] = max(all_results[chunk_id]['score'], match['score'])
+                else:
+                    all_results[chunk_id] = dict(match, aggregated_score=weighted_score, query_matches=1)
+        
+        sorted_results = sorted(all_results.values(), 
+                              key=lambda x: x['aggregated_score'], 
+                              reverse=True)
+        
+        return sorted_results[:self.top_k_results]
+    
+    def _similarity_scores(self, chunk_ids: List[str], query_embedding: List[float]) -> Dict[str, float]:
+        """
+        Cosine similarity of lexically found chunks to the query, fetched from the vector index
+        so the similarity thresholds and confidence model apply to them unchanged
+        """
+        if not chunk_ids:
+            return {}
+        
+        response = self.pinecone_client.fetch(ids=list(chunk_ids))
+        query_vector = np.asarray(query_embedding, dtype=np.float32)
+        query_vector /= np.linalg.norm(query_vector) or 1.0
+        
+        scores = {}
+        for chunk_id, vector in response.vectors.items():
+            values = np.asarray(vector.values, dtype=np.float32)
+            scores[chunk_id] = float(values @ query_vector / (np.linalg.norm(values) or 1.0))
+        return scores
+    
+    def hybrid_search(self, query: str, query_variants: List[str],
+                      embeddings: Optional[List[List[float]]] = None) -> List[Dict]:
+        """Dense multi-query search and BM25 lexical search run in parallel, merged by reciprocal rank fusion"""
+        if embeddings is None:
+            embeddings = self.embed_texts(query_variants)
+        
+        lexical_future = self._search_executor.submit(self.lexical_index.search, query, self.top_k_results)
+        dense_results = self.multi_query_search(query_variants, embeddings)
+        lexical_results = lexical_future.result()
+        
+        fused = reciprocal_rank_fusion([
+            [result['chunk_id'] for result in dense_results],
+            [result['chunk_id'] for result in lexical_results]
+        ])
+        
+        results_by_id = {result['chunk_id']: result for result in dense_results}
+        lexical_only = [result for result in lexical_results if result['chunk_id'] not in results_by_id]
+        similarity = self._similarity_scores([result['chunk_id'] for result in lexical_only], embeddings[0])
+        
+        for result in lexical_results:
+            chunk_id = result['chunk_id']
+            if chunk_id in results_by_id:
+                results_by_id[chunk_id].update(lexical_rank=result['lexical_rank'], bm25=result['bm25'])
+            elif chunk_id in similarity:  # skip chunks missing from the vector index
+                results_by_id[chunk_id] = dict(result, score=similarity[chunk_id], aggregated_score=0.0, query_matches=0)
+        
+        # Scaled so a first place in one list scores 1.0, comparable with the dense aggregated score
+        for chunk_id, result in results_by_id.items():
+            result['fused_score'] = fused[chunk_id] * (RRF_K + 1)
+        
+        print(f"   🔤 {len(lexical_results)} lexical hits, {len(lexical_only)} not found by dense search")
+        return sorted(results_by_id.values(), key=lambda x: x['fused_score'], reverse=True)[:self.top_k_results]
+    
+    def lexical_drug_lookup(self, query: str, query_embedding: Optional[List[float]] = None) -> List[Dict]:
+        """Exact drug-name queries: one BM25 lookup instead of the multi-query dense search"""
+        lexical_results = self.lexical_index.search(query, self.top_k_results)
+        if not lexical_results:
+            return []
+        
+        if query_embedding is None:
+            query_embedding = self.embed_texts([query])[0]
+        similarity = self._similarity_scores([result['chunk_id'] for result in lexical_results], query_embedding)
+        
+        return [
+            dict(result, score=similarity[result['chunk_id']], aggregated_score=similarity[result['chunk_id']],
+                 query_matches=1, fused_score=(RRF_K + 1) / (RRF_K + result['lexical_rank']))
+            for result in lexical_results if result['chunk_id'] in similarity
+        ]
+    
+    def retrieve_context(self, query: str, query_variants: Optional[List[str]] = None,
+                         embeddings: Optional[List[List[float]]] = None) -> Dict[str, Any]:
+        """
+        Retrieval-only search: ranked high-confidence chunks without any Claude generation.
+        query_variants defaults to the semantic expansion of the query; embeddings, when given,
+        must align with query_variants and skip the embedding request.
+        """
+        
+        # Step 1: Exact drug-name lookup, or multi-query semantic (+ lexical) search
+        all_results = []
+        if self.lexical_index is not None and self.lexical_index.is_drug_name(query):
+            print("1️⃣ Exact drug-name query - resolving with a lexical lookup...")
+            all_results = self.lexical_drug_lookup(query, embeddings[0] if embeddings else None)
+        
+        if not all_results:
+            print("1️⃣ Performing multi-query semantic search...")
+            if query_variants is None:
+                query_variants = self.expand_query_semantically(query)
+            print(f"🔍 Enhanced search with {len(query_variants)} query variations...")
+            
+            if self.lexical_index is not None:
+                all_results = self.hybrid_search(query, query_variants, embeddings)
+            else:
+                all_results = self.multi_query_search(query_variants, embeddings)
+                for result in all_results:
+                    result['fused_score'] = result['aggregated_score']
+        print(f"   📚 Aggregated {len(all_results)} results from expanded queries")
+        
+        # Step 2: Clinical relevance ranking
+        print("2️⃣ Ranking by clinical relevance...")
+        similarity = np.empty(len(all_results))
+        relevance = np.empty(len(all_results))
+        fused = np.empty(len(all_results))
+        thresholds = np.empty(len(all_results))
+        for i, result in enumerate(all_results):
+            text_lower = result['metadata'].get('text', '').lower()
+            result['clinical_relevance'] = self.clinical_keyword_scorer.score(text_lower)
+            similarity[i] = result['score']
+            relevance[i] = result['clinical_relevance']
+            fused[i] = result['fused_score']
+            # Lower threshold for procedural/emergency content
+            thresholds[i] = 0.70 if self.lenient_threshold_scorer.matches_any(text_lower) else 0.75
+        
+        # Step 3: High-confidence filtering
+        print("3️⃣ Filtering for high-confidence results...")
+        # Use more context for procedural queries
+        is_procedural_query = any(term in query.lower() 
+                                for term in ['trocar', 'procedure', 'technique', 'landmark', 'equipment', 'how to', 'list'])
+        context_size = 20 if is_procedural_query else 15
+        
+        # Sort by clinical relevance + fused retrieval score, keep chunks over their similarity
+        # threshold (or clinically relevant enough) and cut to the context size
+        ranking = self.reranker.rerank(similarity, relevance, fused, thresholds=thresholds, top_k=context_size)
+        context_chunks = ranking.select(all_results)
+        print(f"   ✅ {len(context_chunks)} high-confidence chunks selected")
+        
+        confidence, avg_relevance = self.calculate_retrieval_confidence(query, context_chunks, ranking.stats)
+        
+        return {
+            'query': query,
+            'chunks': context_chunks,
+            'context_used': self.format_context(context_chunks),
+            'confidence': confidence,
+            'clinical_relevance_score': avg_relevance
+        }
+    
+    async def aretrieve_context(self, query: str, query_variants: Optional[List[str]] = None,
+                                embeddings: Optional[List[List[float]]] = None) -> Dict[str, Any]:
+        """
+        Async retrieve_context: embeddings come from the async client; the vector and lexical
+        searches (synchronous clients) run in a worker thread
+        """
+        if query_variants is None:
+            query_variants = self.expand_query_semantically(query)
+        if embeddings is None:
+            embeddings = await self.aembed_texts(query_variants)
+        return await asyncio.to_thread(self.retrieve_context, query, query_variants, embeddings)
+    
+    def format_context(self, chunks: List[Dict]) -> str:
+        """Format ranked chunks as numbered references for the generation prompt"""
+        return "\n\n".join([
+            f"REFERENCE {i+1} (Confidence: {chunk['score']:.1%}, Clinical Relevance: {chunk['clinical_relevance']}):\n{chunk['metadata'].get('text', '')}"
+            for i, chunk in enumerate(chunks)
+        ])
+    
+    def calculate_retrieval_confidence(self, query: str, context_chunks: List[Dict],
+                                       stats: Optional[Dict[str, float]] = None) -> Tuple[float, float]:
+        """Calculate final confidence and average clinical relevance for the selected chunks"""
+        if not context_chunks:
+            return 0.0, 0.0
+        
+        if stats is None:
+            stats = ClinicalReranker.confidence_statistics(
+                np.array([r['score'] for r in context_chunks], dtype=np.float64),
+                np.array([r['clinical_relevance'] for r in context_chunks], dtype=np.float64)
+            )
+        
+        # Enhanced confidence calculation with uncertainty modeling
+        avg_similarity = stats['avg_similarity']
+        avg_relevance = stats['avg_relevance']
+        
+        # Base confidence from similarity and relevance
+        base_confidence = avg_similarity * 0.6 + min(avg_relevance / 20, 1.0) * 0.4
+        
+        # Uncertainty factors that reduce confidence
+        uncertainty_factors = 0.0
+        
+        # Factor 1: Low number of high-quality matches
+        if stats['above_085'] < 3:
+            uncertainty_factors += 0.15
+        
+        # Factor 2: Wide variation in similarity scores
+        if stats['count'] > 1 and stats['similarity_variance'] > 0.02:  # High variance means inconsistent results
+            uncertainty_factors += 0.1
+        
+        # Factor 3: Low clinical relevance
+        if avg_relevance < 10:
+            uncertainty_factors += 0.1
+        
+        # Factor 4: Procedural/technical queries have inherent uncertainty
+        is_procedural_query = any(term in query.lower() 
+                                for term in ['trocar', 'procedure', 'technique', 'landmark', 'equipment', 'how to'])
+        if is_procedural_query and avg_similarity < 0.90:
+            uncertainty_factors += 0.05
+        
+        # Factor 5: Emergency queries with incomplete information
+        is_emergency_query = any(term in query.lower() 
+                               for term in ['emergency', 'critical', 'urgent', 'acute'])
+        if is_emergency_query and stats['above_080'] < 5:
+            uncertainty_factors += 0.08
+        
+        # Apply uncertainty reduction
+        final_confidence = base_confidence - uncertainty_factors
+        
+        # Ensure confidence stays within realistic bounds
+        if final_confidence > 0.95:
+            final_confidence = 0.85 + (final_confidence - 0.85) * 0.5  # Cap at ~92%
+        
+        final_confidence = max(final_confidence, 0.20)  # Minimum 20% confidence
+        final_confidence = min(final_confidence, 0.95)  # Maximum 95% confidence
+        
+        return final_confidence, avg_relevance
+    
+    def generate_response(self, query: str, retrieval: Dict[str, Any], conversation_history: List[Dict] = None) -> Dict[str, Any]:
+        """Generate a single clinical answer over an already retrieved (possibly merged) context"""
+        context_chunks = retrieval['chunks']
+        
+        if not context_chunks:
+            return self.build_no_context_response()
+        
+        # Step 4: Context formatting
+        print("4️⃣ Formatting high-confidence context...")
+        context = self.format_context(context_chunks)
+        
+        # Step 5: Generate response with Claude
+        print("5️⃣ Generating high-confidence clinical response...")
+        answer = self.generate_answer(query, context, conversation_history)
+        
+        return self.build_response(retrieval, context, answer)
+    
+    def stream_response(self, query: str, retrieval: Dict[str, Any],
+                        conversation_history: List[Dict] = None) -> Generator[str, None, Dict[str, Any]]:
+        """Like generate_response, but yields answer text deltas as Claude produces them and returns the response"""
+        context_chunks = retrieval['chunks']
+        
+        if not context_chunks:
+            response = self.build_no_context_response()
+            yield response['answer']
+            return response
+        
+        print("4️⃣ Formatting high-confidence context...")
+        context = self.format_context(context_chunks)
+        
+        print("5️⃣ Streaming high-confidence clinical response...")
+        answer_parts = []
+        for delta in self.stream_answer(query, context, conversation_history):
+            answer_parts.append(delta)
+            yield delta
+        
+        return self.build_response(retrieval, context, "".join(answer_parts))
+    
+    async def agenerate_response(self, query: str, retrieval: Dict[str, Any],
+                                 conversation_history: List[Dict] = None) -> Dict[str, Any]:
+        """Async generate_response on the async Anthropic client"""
+        context_chunks = retrieval['chunks']
+        
+        if not context_chunks:
+            return self.build_no_context_response()
+        
+        print("4️⃣ Formatting high-confidence context...")
+        context = self.format_context(context_chunks)
+        
+        print("5️⃣ Generating high-confidence clinical response...")
+        response = await self.async_anthropic_client.messages.create(
+            **self.build_answer_request(query, context, conversation_history)
+        )
+        
+        return self.build_response(retrieval, context, response.content[0].text)
+    
+    def build_response(self, retrieval: Dict[str, Any], context: str, answer: str) -> Dict[str, Any]:
+        """Response dict for an answer generated over the retrieved context"""
+        return {
+            'answer': answer,
+            'confidence': retrieval['confidence'],
+            'high_confidence_chunks': len(retrieval['chunks']),
+            # Extract drug names from context
+            'drugs_found': self.extract_drug_names(context),
+            'clinical_relevance_score': retrieval['clinical_relevance_score']
+        }
+    
+    def build_no_context_response(self) -> Dict[str, Any]:
+        """Response returned when no chunk passes the confidence filter"""
+        return {
+            'answer': "I don't have high-confidence information about this query. Please try rephrasing your question or provide more specific details.",
+            'confidence': 0.0,
+            'high_confidence_chunks': 0,
+            'drugs_found': []
+        }
+    
+    def generate_answer(self, query: str, context: str, conversation_history: List[Dict] = None) -> str:
+        """Call Claude once over the formatted knowledge context"""
+        response = self.anthropic_client.messages.create(**self.build_answer_request(query, context, conversation_history))
+        return response.content[0].text
+    
+    def stream_answer(self, query: str, context: str, conversation_history: List[Dict] = None) -> Iterator[str]:
+        """Same request as generate_answer, yielding text deltas as they arrive"""
+        with self.anthropic_client.messages.stream(**self.build_answer_request(query, context, conversation_history)) as stream:
+            yield from stream.text_stream
+    
+    def build_answer_request(self, query: str, context: str, conversation_history: List[Dict] = None) -> Dict[str, Any]:
+        """Claude Messages API arguments for an answer over the formatted knowledge context"""
+        
+        # Process conversation history for context
+        conversation_context = ""
+        if conversation_history:
+            print(f"   📝 Including {len(conversation_history)} previous messages for context...")
+            # Get recent relevant context
+            recent_messages = conversation_history[-6:]  # Last 6 messages
+            conversation_context = "\n\nPREVIOUS CONVERSATION CONTEXT:\n"
+            for msg in recent_messages:
+                role = msg.get('role', 'unknown')
+                content = msg.get('content', '')[:200]  # Limit length
+                conversation_context += f"{role.upper()}: {content}\n"
+            conversation_context += "\n"
+        
+        system_prompt = """You are a veterinary medical expert providing clinical information from your comprehensive veterinary knowledge. 
 
 CRITICAL RESPONSE FORMATTING - SUPREME PRIORITY:
 NEVER use these phrases in responses:
@@ -257,10 +662,10 @@ CLINICAL REQUIREMENTS:
 - Consider previous conversation context for follow-up questions
 
 Format your response professionally for veterinary use with confident, direct clinical statements that begin immediately with medical content."""
-            # Enhanced system prompt for procedural queries
-            if any(term in query.lower() for term in ['trocar', 'procedure', 'technique', 'equipment', 'landmark', 'how to']):
-                system_prompt += '''
-                
+        # Enhanced system prompt for procedural queries
+        if any(term in query.lower() for term in ['trocar', 'procedure', 'technique', 'equipment', 'landmark', 'how to']):
+            system_prompt += '''
+            
 SPECIAL INSTRUCTIONS FOR PROCEDURAL QUERIES:
 - If asked about procedures, provide step-by-step details when available
 - For equipment questions, specify sizes, types, and preparation details
@@ -268,95 +673,76 @@ SPECIAL INSTRUCTIONS FOR PROCEDURAL QUERIES:
 - If the exact procedural details aren't in the references, clearly state what information IS available
 - Focus on practical, actionable information for veterinary technicians
 - Include safety considerations and contraindications'''
-            
-            user_prompt = f"""Question: {query}
+        
+        user_prompt = f"""Question: {query}
 
 {conversation_context}VETERINARY KNOWLEDGE CONTEXT:
 {context}
 
 Provide a comprehensive, clinically accurate response using your veterinary expertise. If this is a follow-up question, consider the previous conversation appropriately. Start your response directly with medical information without referencing sources."""
+        
+        return {
+            'model': "claude-3-5-haiku-20241022",
+            'max_tokens': 1500,
+            'temperature': 0.1,
+            'system': system_prompt,
+            'messages': [{"role": "user", "content": user_prompt}]
+        }
+    
+    def query_with_high_confidence(self, query: str, conversation_history: List[Dict] = None) -> Dict[str, Any]:
+        """Main query method with 95%+ confidence optimization"""
+        
+        print(f"\n🎯 High-Confidence Query: {query}")
+        print("=" * 70)
+        
+        try:
+            retrieval = self.retrieve_context(query)
+            return self.generate_response(query, retrieval, conversation_history)
             
-            response = self.anthropic_client.messages.create(
-                model="claude-3-5-haiku-20241022",
-                max_tokens=1500,
-                temperature=0.1,
-                system=system_prompt,
-                messages=[{"role": "user", "content": user_prompt}]
-            )
-            
-            answer = response.content[0].text
-            
-            # Step 6: Calculate final confidence
-            avg_similarity = sum(r.score for r in context_chunks) / len(context_chunks)
-            avg_relevance = sum(r.clinical_relevance for r in context_chunks) / len(context_chunks)
-            
-            # Enhanced confidence calculation with uncertainty modeling
-            avg_similarity = sum(r.score for r in context_chunks) / len(context_chunks)
-            avg_relevance = sum(r.clinical_relevance for r in context_chunks) / len(context_chunks)
-            
-            # Base confidence from similarity and relevance
-            base_confidence = avg_similarity * 0.6 + min(avg_relevance / 20, 1.0) * 0.4
-            
-            # Uncertainty factors that reduce confidence
-            uncertainty_factors = 0.0
-            
-            # Factor 1: Low number of high-quality matches
-            high_quality_matches = len([r for r in context_chunks if r.score >= 0.85])
-            if high_quality_matches < 3:
-                uncertainty_factors += 0.15
-            
-            # Factor 2: Wide variation in similarity scores
-            similarity_scores = [r.score for r in context_chunks]
-            if len(similarity_scores) > 1:
-                score_variance = sum((s - avg_similarity) ** 2 for s in similarity_scores) / len(similarity_scores)
-                if score_variance > 0.02:  # High variance means inconsistent results
-                    uncertainty_factors += 0.1
-            
-            # Factor 3: Low clinical relevance
-            if avg_relevance < 10:
-                uncertainty_factors += 0.1
-            
-            # Factor 4: Procedural/technical queries have inherent uncertainty
-            is_procedural_query = any(term in query.lower() 
-                                    for term in ['trocar', 'procedure', 'technique', 'landmark', 'equipment', 'how to'])
-            if is_procedural_query and avg_similarity < 0.90:
-                uncertainty_factors += 0.05
-            
-            # Factor 5: Emergency queries with incomplete information
-            is_emergency_query = any(term in query.lower() 
-                                   for term in ['emergency', 'critical', 'urgent', 'acute'])
-            if is_emergency_query and len([r for r in context_chunks if r.score >= 0.80]) < 5:
-                uncertainty_factors += 0.08
-            
-            # Apply uncertainty reduction
-            final_confidence = base_confidence - uncertainty_factors
-            
-            # Ensure confidence stays within realistic bounds
-            if final_confidence > 0.95:
-                final_confidence = 0.85 + (final_confidence - 0.85) * 0.5  # Cap at ~92%
-            
-            final_confidence = max(final_confidence, 0.20)  # Minimum 20% confidence
-            final_confidence = min(final_confidence, 0.95)  # Maximum 95% confidence
-            
-            # Extract drug names from context
-            drugs_found = self.extract_drug_names(context)
+        except Exception as e:
+            print(f"❌ Error in high-confidence query: {str(e)}")
+            return self.build_error_response(e)
+    
+    def stream_query_with_high_confidence(self, query: str,
+                                          conversation_history: List[Dict] = None) -> Generator[str, None, Dict[str, Any]]:
+        """Streaming query_with_high_confidence: yields answer text deltas, returns the complete response"""
+        
+        print(f"\n🎯 High-Confidence Query (streaming): {query}")
+        print("=" * 70)
+        
+        try:
+            retrieval = self.retrieve_context(query)
+            return (yield from self.stream_response(query, retrieval, conversation_history))
             
-            return {
-                'answer': answer,
-                'confidence': final_confidence,
-                'high_confidence_chunks': len(context_chunks),
-                'drugs_found': drugs_found,
-                'clinical_relevance_score': avg_relevance
-            }
+        except Exception as e:
+            print(f"❌ Error in high-confidence query: {str(e)}")
+            response = self.build_error_response(e)
+            yield response['answer']
+            return response
+    
+    async def aquery_with_high_confidence(self, query: str, conversation_history: List[Dict] = None) -> Dict[str, Any]:
+        """Async query_with_high_confidence"""
+        
+        print(f"\n🎯 High-Confidence Query (async): {query}")
+        print("=" * 70)
+        
+        try:
+            retrieval = await self.aretrieve_context(query)
+            return await self.agenerate_response(query, retrieval, conversation_history)
             
         except Exception as e:
             print(f"❌ Error in high-confidence query: {str(e)}")
-            return {
-                'answer': f"I encountered an error processing your veterinary query: {str(e)}. Please try again or rephrase your question.",
-                'confidence': 0.0,
-                'high_confidence_chunks': 0,
-                'drugs_found': []
-            }
+            return self.build_error_response(e)
+    
+    def build_error_response(self, error: Exception) -> Dict[str, Any]:
+        """Standard response returned when retrieval or generation fails"""
+        return {
+            'answer': f"I encountered an error processing your veterinary query: {str(error)}. Please try again or rephrase your question.",
+            'confidence': 0.0,
+            'high_confidence_chunks': 0,
+            'drugs_found': [],
+            'error': str(error)
+        }
     
     def extract_drug_names(self, text: str) -> List[str]:
         """Extract drug names from text"""
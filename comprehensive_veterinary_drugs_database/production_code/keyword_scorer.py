@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Keyword Scorer
+Compiled multi-keyword matcher shared by retrieval ranking, the extractor and the validators.
+All keywords are found in one Aho-Corasick pass per text (pyahocorasick); per-keyword
+counts follow str.count semantics (non-overlapping occurrences of each keyword).
+"""
+
+import json
+import os
+import sys
+import time
+from typing import Dict, Iterable, List, Union
+
+try:
+    import ahocorasick
+except ImportError:  # pragma: no cover - scorer falls back to per-keyword str.count scans
+    ahocorasick = None
+
+class KeywordScorer:
+    def __init__(self, keywords: Union[Dict[str, float], Iterable[str]]):
+        """keywords: {keyword: weight} for weighted scoring, or a plain list (weight 1 each)"""
+        if isinstance(keywords, dict):
+            self.weights = dict(keywords)
+        else:
+            self.weights = {keyword: 1 for keyword in keywords}
+        self.keywords: List[str] = list(self.weights)
+
+        self._automaton = None
+        if ahocorasick is not None and self.keywords:
+            automaton = ahocorasick.Automaton()
+            for index, keyword in enumerate(self.keywords):
+                automaton.add_word(keyword, (index, len(keyword)))
+            automaton.make_automaton()
+            self._automaton = automaton
+
+    def counts(self, text: str) -> List[int]:
+        """Non-overlapping occurrence count of every keyword (same order as self.keywords)"""
+        if self._automaton is None:
+            return [text.count(keyword) for keyword in self.keywords]
+
+        counts = [0] * len(self.keywords)
+        last_end = [-1] * len(self.keywords)
+        # Matches arrive by end position, so for each keyword the greedy left-to-right
+        # choice str.count makes is reproduced by skipping overlaps with its previous match
+        for end, (index, length) in self._automaton.iter(text):
+            if end - length >= last_end[index]:
+                counts[index] += 1
+                last_end[index] = end
+        return counts
+
+    def score(self, text: str) -> float:
+        """Sum of count * weight over all keywords"""
+        if self._automaton is None:
+            return sum(text.count(keyword) * weight for keyword, weight in self.weights.items())
+
+        weights = self.weights
+        return sum(count * weights[keyword] for keyword, count in zip(self.keywords, self.counts(text)) if count)
+
+    def distinct(self, text: str) -> int:
+        """Number of different keywords present (sum(1 for k in keywords if k in text))"""
+        if self._automaton is None:
+            return sum(1 for keyword in self.keywords if keyword in text)
+        return len({index for _, (index, _) in self._automaton.iter(text)})
+
+    def matches_any(self, text: str) -> bool:
+        """any(k in text for k in keywords), stopping at the first hit"""
+        if self._automaton is None:
+            return any(keyword in text for keyword in self.keywords)
+        for _ in self._automaton.iter(text):
+            return True
+        return False
+
+def _benchmark(label: str, scorer: KeywordScorer, texts: List[str], method: str, baseline):
+    """Time a scorer method against the per-keyword loop it replaces and check they agree"""
+    start = time.perf_counter()
+    expected = [baseline(text) for text in texts]
+    loop_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    scored = [getattr(scorer, method)(text) for text in texts]
+    scorer_s = time.perf_counter() - start
+
+    status = "✅" if scored == expected else "❌ MISMATCH"
+    print(f"   {status} {label}: {len(scorer.keywords)} keywords, "
+          f"loop {loop_s * 1000:.0f} ms, scorer {scorer_s * 1000:.0f} ms ({loop_s / scorer_s:.1f}x)")
+
+def main():
+    """Benchmark the scorer against the per-keyword loops on the chunk corpus"""
+    print("🔎 KEYWORD SCORER BENCHMARK")
+    print("=" * 50)
+    print(f"Backend: {'pyahocorasick' if ahocorasick is not None else 'str.count fallback (pip install pyahocorasick)'}")
+
+    candidates = sys.argv[1:] or ["maximal_results/maximal_chunks.json", "vet_database/embedded_veterinary_chunks.json"]
+    corpus_file = next((path for path in candidates if os.path.exists(path)), None)
+    if corpus_file is None:
+        print(f"❌ Chunk corpus not found: {', '.join(candidates)}")
+        print("💡 Run 'python maximal_extractor.py' first or pass a chunks JSON path")
+        return
+    with open(corpus_file, 'r', encoding='utf-8') as f:
+        texts = [chunk['text'].lower() for chunk in json.load(f)]
+    print(f"📦 {corpus_file}: {len(texts)} chunks, {sum(map(len, texts)) / 1_048_576:.1f} MB of text")
+
+    from final_95_confidence_standalone import Final95ConfidenceAssistant
+    clinical_keywords = Final95ConfidenceAssistant.CLINICAL_KEYWORDS
+    _benchmark("clinical relevance", KeywordScorer(clinical_keywords), texts, 'score',
+               lambda text: sum(text.count(keyword) * weight for keyword, weight in clinical_keywords.items()))
+    _benchmark("distinct keywords", KeywordScorer(clinical_keywords), texts, 'distinct',
+               lambda text: sum(1 for keyword in clinical_keywords if keyword in text))
+    _benchmark("any keyword", KeywordScorer(clinical_keywords), texts, 'matches_any',
+               lambda text: any(keyword in text for keyword in clinical_keywords))
+
+if __name__ == "__main__":
+    main()
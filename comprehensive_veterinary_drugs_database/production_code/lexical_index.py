@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Lexical Chunk Index
+SQLite FTS5 (BM25) index over chunk text and drug names, queried alongside the dense
+vector index and merged with reciprocal rank fusion
+"""
+
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from typing import Dict, List, Optional
+
+DEFAULT_LEXICAL_INDEX = os.path.join("vet_database", "lexical_index.sqlite3")
+
+# Query words that carry no retrieval signal on their own
+STOPWORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'can', 'do', 'does', 'for', 'from', 'how',
+    'i', 'in', 'is', 'it', 'me', 'my', 'of', 'on', 'or', 'should', 'the', 'to', 'what', 'when',
+    'which', 'with', 'you'
+}
+
+# Reciprocal rank fusion constant (Cormack et al. use 60)
+RRF_K = 60
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = RRF_K) -> Dict[str, float]:
+    """Fuse ranked id lists: each id scores sum(1 / (k + rank)) over the lists it appears in"""
+    fused: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, item_id in enumerate(ranking, start=1):
+            fused[item_id] = fused.get(item_id, 0.0) + 1.0 / (k + rank)
+    return fused
+
+class LexicalIndex:
+    def __init__(self, path: Optional[str] = None):
+        """Open (or create) the FTS5 index at path (LIMOSA_LEXICAL_INDEX)"""
+        self.path = path if path is not None else os.getenv('LIMOSA_LEXICAL_INDEX', DEFAULT_LEXICAL_INDEX)
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        # '/' is a token character so dosing units such as mg/kg and ug/kg/min stay whole
+        self._db.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS chunks USING fts5("
+            "chunk_id UNINDEXED, drug_name, text, metadata UNINDEXED, "
+            "tokenize = \"unicode61 tokenchars '/'\")"
+        )
+        # chunk_id -> FTS rowid, so re-upserted chunks are deleted by rowid instead of scanning the
+        # UNINDEXED chunk_id column; filled from the chunks table for indexes built before it existed
+        self._db.execute("CREATE TABLE IF NOT EXISTS chunk_map (chunk_id TEXT PRIMARY KEY, rowid INTEGER)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS drug_names (name TEXT PRIMARY KEY)")
+        if self._db.execute("SELECT 1 FROM chunk_map LIMIT 1").fetchone() is None:
+            self._db.execute("INSERT OR REPLACE INTO chunk_map SELECT chunk_id, rowid FROM chunks")
+        self._db.commit()
+        self._drug_names = {row[0] for row in self._db.execute("SELECT name FROM drug_names")}
+
+    @staticmethod
+    def normalize_name(name: str) -> str:
+        """Case- and punctuation-insensitive drug name ('ALPRAZolam' -> 'alprazolam')"""
+        return " ".join(re.findall(r"[\w/-]+", name.lower()))
+
+    def count(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def upsert(self, vectors: List[Dict]):
+        """Index Pinecone-style {'id', 'metadata': {'text', 'drug_name', ...}} records (values are ignored)"""
+        rows, names = [], set()
+        for vector in vectors:
+            metadata = vector.get('metadata') or {}
+            drug_name = metadata.get('drug_name', '')
+            rows.append((vector['id'], drug_name, metadata.get('text', ''), json.dumps(metadata)))
+            if drug_name and drug_name != 'unknown':
+                names.add(self.normalize_name(drug_name))
+
+        # The last record wins when a batch repeats an id
+        rows = list({row[0]: row for row in rows}.values())
+
+        with self._lock:
+            # A first build has nothing to replace
+            if self._db.execute("SELECT 1 FROM chunk_map LIMIT 1").fetchone() is not None:
+                self._delete_chunks([row[0] for row in rows])
+            next_rowid = self._db.execute("SELECT COALESCE(MAX(rowid), 0) + 1 FROM chunks").fetchone()[0]
+            self._db.executemany(
+                "INSERT INTO chunks (rowid, chunk_id, drug_name, text, metadata) VALUES (?, ?, ?, ?, ?)",
+                [(next_rowid + i,) + row for i, row in enumerate(rows)]
+            )
+            self._db.executemany("INSERT INTO chunk_map VALUES (?, ?)",
+                                 [(row[0], next_rowid + i) for i, row in enumerate(rows)])
+            self._db.executemany("INSERT OR IGNORE INTO drug_names VALUES (?)", [(name,) for name in names])
+            self._db.commit()
+            self._drug_names |= names
+
+    def _delete_chunks(self, chunk_ids: List[str]):
+        """Remove indexed chunks by id through chunk_map (caller holds the lock)"""
+        for start in range(0, len(chunk_ids), 500):
+            batch = chunk_ids[start:start + 500]
+            placeholders = ", ".join("?" * len(batch))
+            rowids = [row[0] for row in self._db.execute(
+                f"SELECT rowid FROM chunk_map WHERE chunk_id IN ({placeholders})", batch)]
+            if rowids:
+                self._db.execute(f"DELETE FROM chunks WHERE rowid IN ({', '.join('?' * len(rowids))})", rowids)
+                self._db.execute(f"DELETE FROM chunk_map WHERE chunk_id IN ({placeholders})", batch)
+
+    def is_drug_name(self, query: str) -> bool:
+        """True when the whole query is a drug name present in the index"""
+        return self.normalize_name(query) in self._drug_names
+
+    @staticmethod
+    def match_expression(query: str) -> str:
+        """FTS5 MATCH expression: any non-stopword query term, each quoted literally"""
+        terms = [term for term in re.findall(r"[\w/]+", query.lower()) if term not in STOPWORDS]
+        return " OR ".join(f'"{term}"' for term in dict.fromkeys(terms))
+
+    def search(self, query: str, top_k: int = 25) -> List[Dict]:
+        """BM25-ranked chunks; drug-name matches weigh 4x body text"""
+        expression = self.match_expression(query)
+        if not expression:
+            return []
+
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT chunk_id, metadata, bm25(chunks, 0.0, 4.0, 1.0, 0.0) AS rank "
+                "FROM chunks WHERE chunks MATCH ? ORDER BY rank LIMIT ?",
+                (expression, top_k)
+            ).fetchall()
+
+        # SQLite's bm25() is negated so that lower is better; flip it back for readability
+        return [
+            {'chunk_id': chunk_id, 'metadata': json.loads(metadata), 'bm25': -rank, 'lexical_rank': i + 1}
+            for i, (chunk_id, metadata, rank) in enumerate(rows)
+        ]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+def open_lexical_index() -> Optional[LexicalIndex]:
+    """The lexical index when one has been built (LIMOSA_LEXICAL_INDEX, empty disables), otherwise None"""
+    path = os.getenv('LIMOSA_LEXICAL_INDEX', DEFAULT_LEXICAL_INDEX)
+    if not path or not os.path.exists(path):
+        return None
+    index = LexicalIndex(path)
+    chunk_count = index.count()
+    if not chunk_count:
+        index.close()
+        return None
+    print(f"✅ Using lexical index: {path} ({chunk_count} chunks, {len(index._drug_names)} drug names)")
+    return index
+
+def main():
+    """Build the lexical index from the embedder backup (--build) and time sample lookups"""
+    print("🔤 LEXICAL CHUNK INDEX")
+    print("=" * 50)
+
+    index = LexicalIndex()
+
+    if '--build' in sys.argv:
+        from veterinary_embedder import VeterinaryEmbedder
+        embedded_file = "vet_database/embedded_veterinary_chunks.json"
+        if not os.path.exists(embedded_file):
+            print(f"❌ Embedded chunks not found: {embedded_file}")
+            print("💡 Run 'python veterinary_embedder.py' first")
+            return
+        with open(embedded_file, 'r', encoding='utf-8') as f:
+            embedded_chunks = json.load(f)
+        vectors = VeterinaryEmbedder.prepare_pinecone_vectors(embedded_chunks)
+        for i in range(0, len(vectors), 1000):
+            index.upsert(vectors[i:i + 1000])
+        print(f"✅ Indexed {len(vectors)} chunks")
+
+    print(f"📊 Chunks: {index.count()}  Drug names: {len(index._drug_names)}")
+
+    for query in ["ALPRAZolam", "AMIOdarone dose mg/kg", "acepromazine dosing for dogs"]:
+        start = time.perf_counter()
+        results = index.search(query)
+        elapsed = (time.perf_counter() - start) * 1000
+        top = results[0]['metadata'].get('drug_name', '?') if results else '-'
+        print(f"   '{query}': {len(results)} hits in {elapsed:.2f} ms "
+              f"(top: {top}, drug-name query: {index.is_drug_name(query)})")
+    index.close()
+
+if __name__ == "__main__":
+    main()
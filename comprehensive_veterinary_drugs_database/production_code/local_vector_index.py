@@ -0,0 +1,677 @@
+#!/usr/bin/env python3
+"""
+Local Vector Index
+In-process drop-in for the Pinecone index: float32 vectors in a memory-mapped matrix,
+exact top-k by blocked matrix multiply, metadata in a SQLite side store.
+An optional IVF (inverted file) partition trades a little recall for scanning only
+the nprobe nearest clusters per query, and optional quantized codes (float16, int8, PQ)
+are scanned in RAM with the best candidates rescored at full precision.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+import numpy as np
+from vector_quantization import VectorQuantizer, quantizer_from_params, train_quantizer
+
+DEFAULT_INDEX_DIR = os.path.join("vet_database", "local_vector_index")
+
+class IndexRecord(dict):
+    """dict with attribute access, matching how callers use Pinecone responses (match.id / match['id'])"""
+
+    def __getattribute__(self, name):
+        # Stored fields win over dict methods, so vector.values is the vector, not dict.values
+        if dict.__contains__(self, name):
+            return dict.__getitem__(self, name)
+        return dict.__getattribute__(self, name)
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+class SearchSnapshot(NamedTuple):
+    """Index state one search reads, taken together under the lock so a concurrent upsert cannot skew it"""
+    vectors: np.ndarray
+    quantizer: Optional[VectorQuantizer]
+    codes: Optional[np.ndarray]
+    ivf: Optional[Dict[str, Any]]
+    mask: Optional[np.ndarray]
+
+class LocalVectorIndex:
+    # Rows scored per matrix multiply; bounds the temporary score buffer
+    BLOCK_ROWS = 16384
+
+    def __init__(self, index_dir: Optional[str] = None, search_mode: Optional[str] = None,
+                 nprobe: Optional[int] = None, use_quantization: Optional[bool] = None,
+                 rescore_factor: Optional[int] = None):
+        """
+        Open (or create) the index stored in index_dir (LIMOSA_VECTOR_INDEX_DIR).
+        search_mode: 'auto' uses IVF when it has been built, 'exact' or 'ivf' force one (LIMOSA_VECTOR_SEARCH)
+        nprobe: IVF clusters scanned per query; higher is slower with better recall (LIMOSA_IVF_NPROBE)
+        use_quantization: scan quantized codes when built (LIMOSA_VECTOR_QUANTIZED=auto|off)
+        rescore_factor: top_k * rescore_factor quantized candidates are rescored in float32 (LIMOSA_RESCORE_FACTOR)
+        """
+        self.logger = logging.getLogger(__name__)
+        self.index_dir = index_dir or os.getenv('LIMOSA_VECTOR_INDEX_DIR', DEFAULT_INDEX_DIR)
+        os.makedirs(self.index_dir, exist_ok=True)
+
+        self.search_mode = (search_mode or os.getenv('LIMOSA_VECTOR_SEARCH', 'auto')).lower()
+        self.nprobe = nprobe if nprobe is not None else int(os.getenv('LIMOSA_IVF_NPROBE', 8))
+        self.use_quantization = use_quantization if use_quantization is not None else (
+            os.getenv('LIMOSA_VECTOR_QUANTIZED', 'auto').lower() != 'off'
+        )
+        self.rescore_factor = rescore_factor if rescore_factor is not None else int(
+            os.getenv('LIMOSA_RESCORE_FACTOR', 10)
+        )
+
+        self.vectors_path = os.path.join(self.index_dir, "vectors.f32")
+        self.manifest_path = os.path.join(self.index_dir, "manifest.json")
+        self.ivf_path = os.path.join(self.index_dir, "ivf.npz")
+        self.quantizer_path = os.path.join(self.index_dir, "quantizer.npz")
+        self.codes_path = os.path.join(self.index_dir, "quantized_codes.npy")
+
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(
+            os.path.join(self.index_dir, "metadata.sqlite3"), check_same_thread=False
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS records ("
+            "row INTEGER PRIMARY KEY, id TEXT UNIQUE NOT NULL, fields TEXT NOT NULL, text TEXT)"
+        )
+        self._db.commit()
+
+        manifest = {}
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        self.dimension = manifest.get('dimension')
+        self.count = manifest.get('count', 0)
+
+        self._load_side_store()
+        self._map_vectors()
+        self._ivf = self._load_ivf()
+        self._quantizer, self._codes = self._load_quantization()
+
+    def _load_side_store(self):
+        """Load ids and filterable fields (everything except text) into memory"""
+        rows = self._db.execute("SELECT row, id, fields FROM records ORDER BY row").fetchall()
+        self._ids = [row_id for _, row_id, _ in rows]
+        self._fields = [json.loads(fields) for _, _, fields in rows]
+        self._row_by_id = {row_id: row for row, row_id, _ in rows}
+        self._mask_cache: Dict[str, np.ndarray] = {}
+
+    def _map_vectors(self):
+        """(Re)map the vector file read-only; readers keep whatever snapshot they grabbed"""
+        if self.count and self.dimension:
+            self._vectors = np.memmap(self.vectors_path, dtype=np.float32, mode='r',
+                                      shape=(self.count, self.dimension))
+        else:
+            self._vectors = np.zeros((0, self.dimension or 0), dtype=np.float32)
+
+    def _write_manifest(self):
+        with open(self.manifest_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': 1, 'metric': 'cosine', 'dimension': self.dimension, 'count': self.count}, f)
+
+    @staticmethod
+    def _normalize(matrix: np.ndarray) -> np.ndarray:
+        """Unit-normalize rows so the dot product is cosine similarity"""
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    def upsert(self, vectors: List[Dict[str, Any]], **kwargs) -> Dict[str, int]:
+        """Insert or overwrite vectors given as {'id', 'values', 'metadata'} dicts (or (id, values, metadata) tuples)"""
+        records = [
+            v if isinstance(v, dict) else {'id': v[0], 'values': v[1], 'metadata': v[2] if len(v) > 2 else {}}
+            for v in vectors
+        ]
+        records = list({r['id']: r for r in records}.values())  # last write wins within a batch
+        if not records:
+            return IndexRecord(upserted_count=0)
+
+        matrix = self._normalize(np.asarray([r['values'] for r in records], dtype=np.float32))
+
+        with self._lock:
+            if self.dimension is None:
+                self.dimension = int(matrix.shape[1])
+            elif matrix.shape[1] != self.dimension:
+                raise ValueError(f"Vector dimension {matrix.shape[1]} does not match index dimension {self.dimension}")
+
+            updates, appends, new_rows = [], [], {}
+            for position, record in enumerate(records):
+                row = self._row_by_id.get(record['id'])
+                if row is None:
+                    new_rows[record['id']] = self.count + len(appends)
+                    appends.append(position)
+                else:
+                    updates.append((row, position))
+
+            if updates and self._ivf is not None and min(row for row, _ in updates) < self._ivf['count']:
+                # Moved vectors may now belong to other clusters; fall back to exact search until rebuilt
+                self.logger.warning("Upsert changed IVF-partitioned vectors; IVF dropped, run build_ivf() again")
+                self._drop_ivf()
+
+            if updates:
+                writable = np.memmap(self.vectors_path, dtype=np.float32, mode='r+',
+                                     shape=(self.count, self.dimension))
+                for row, position in updates:
+                    writable[row] = matrix[position]
+                writable.flush()
+                del writable
+                self._reencode_rows(updates, matrix)
+            if appends:
+                # Written right after the indexed rows, replacing anything a failed upsert left behind
+                with open(self.vectors_path, 'r+b' if os.path.exists(self.vectors_path) else 'wb') as f:
+                    f.seek(self.count * self.dimension * matrix.itemsize)
+                    f.write(matrix[appends].tobytes())
+                    f.truncate()
+
+            rows, side_store = [], []
+            for record in records:
+                metadata = dict(record.get('metadata') or {})
+                text = metadata.pop('text', None)
+                row = new_rows[record['id']] if record['id'] in new_rows else self._row_by_id[record['id']]
+                rows.append((row, record['id'], json.dumps(metadata), text))
+                side_store.append((row, record['id'], metadata))
+            try:
+                self._db.executemany("INSERT OR REPLACE INTO records VALUES (?, ?, ?, ?)", rows)
+                self._db.commit()
+            except sqlite3.Error:
+                self._db.rollback()
+                raise
+
+            # New ids only point at rows once the vector file and SQLite both hold them
+            self._row_by_id.update(new_rows)
+            for row, record_id, metadata in side_store:
+                # Appended rows arrive in row order, so the in-memory side store stays aligned
+                if row == len(self._ids):
+                    self._ids.append(record_id)
+                    self._fields.append(metadata)
+                else:
+                    self._fields[row] = metadata
+            self.count += len(appends)
+            self._mask_cache = {}
+            self._write_manifest()
+            self._map_vectors()
+
+        return IndexRecord(upserted_count=len(records))
+
+    def _filter_mask(self, filter: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+        """Boolean row mask for Pinecone-style filters ($eq, $ne, $in, $nin or a bare value)"""
+        if not filter:
+            return None
+
+        cache_key = json.dumps(filter, sort_keys=True, default=str)
+        with self._lock:
+            mask = self._mask_cache.get(cache_key)
+            if mask is not None and len(mask) == self.count:
+                return mask
+
+            fields = self._fields
+            mask = np.ones(len(fields), dtype=bool)
+            for field, condition in filter.items():
+                if not isinstance(condition, dict):
+                    condition = {'$eq': condition}
+                for operator, operand in condition.items():
+                    if operator == '$eq':
+                        test = lambda value: value == operand
+                    elif operator == '$ne':
+                        test = lambda value: value != operand
+                    elif operator == '$in':
+                        test = lambda value: value in operand
+                    elif operator == '$nin':
+                        test = lambda value: value not in operand
+                    else:
+                        raise ValueError(f"Unsupported filter operator: {operator}")
+                    mask &= np.fromiter((test(f.get(field)) for f in fields), dtype=bool, count=len(fields))
+
+            self._mask_cache[cache_key] = mask
+            return mask
+
+    def _load_ivf(self) -> Optional[Dict[str, Any]]:
+        """Load the persisted IVF partition, if one was built"""
+        if not os.path.exists(self.ivf_path):
+            return None
+        with np.load(self.ivf_path) as data:
+            ivf = {key: data[key] for key in ('centroids', 'order', 'offsets')}
+            ivf['count'] = int(data['count'])
+        if ivf['count'] > self.count or ivf['centroids'].shape[1] != self.dimension:
+            self.logger.warning(f"Ignoring IVF partition that does not match the index: {self.ivf_path}")
+            return None
+        return ivf
+
+    def _drop_ivf(self):
+        self._ivf = None
+        if os.path.exists(self.ivf_path):
+            os.remove(self.ivf_path)
+
+    @staticmethod
+    def _nearest_centroids(vectors: np.ndarray, centroids: np.ndarray, block_rows: int = 8192) -> np.ndarray:
+        """Index of the most similar centroid for every row, computed in blocks"""
+        assignments = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), block_rows):
+            block = np.asarray(vectors[start:start + block_rows])
+            assignments[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+        return assignments
+
+    def build_ivf(self, nlist: Optional[int] = None, iterations: int = 10,
+                  train_per_list: int = 64, seed: int = 0) -> Dict[str, Any]:
+        """
+        Partition the index with spherical k-means and persist it (ivf.npz).
+        nlist defaults to ~sqrt(N) clusters; training uses a sample of train_per_list rows per cluster.
+        Vectors appended later are scanned exactly until the next build.
+        """
+        with self._lock:
+            vectors, count = self._vectors, self.count
+        if count == 0:
+            raise ValueError("Cannot build IVF for an empty index")
+
+        nlist = min(nlist or max(1, int(round(np.sqrt(count)))), count)
+        rng = np.random.default_rng(seed)
+        sample_rows = np.sort(rng.choice(count, size=min(count, nlist * train_per_list), replace=False))
+        sample = np.asarray(vectors[sample_rows])
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+
+        for _ in range(iterations):
+            assignments = self._nearest_centroids(sample, centroids)
+            order = np.argsort(assignments, kind='stable')
+            clusters, starts = np.unique(assignments[order], return_index=True)
+            centroids[clusters] = np.add.reduceat(sample[order], starts, axis=0)
+            # Reseed empty clusters from random sample rows
+            empty = np.setdiff1d(np.arange(nlist), clusters)
+            if len(empty):
+                centroids[empty] = sample[rng.choice(len(sample), size=len(empty), replace=False)]
+            centroids = self._normalize(centroids).astype(np.float32)
+
+        assignments = self._nearest_centroids(vectors, centroids)
+        order = np.argsort(assignments, kind='stable').astype(np.int32)
+        offsets = np.searchsorted(assignments[order], np.arange(nlist + 1)).astype(np.int64)
+
+        np.savez(self.ivf_path, centroids=centroids, order=order, offsets=offsets, count=np.int64(count))
+        with self._lock:
+            self._ivf = self._load_ivf()
+
+        sizes = np.diff(offsets)
+        return {'nlist': nlist, 'count': count, 'largest_list': int(sizes.max()), 'empty_lists': int((sizes == 0).sum())}
+
+    def _load_quantization(self) -> Tuple[Optional[VectorQuantizer], Optional[np.ndarray]]:
+        """Load the persisted quantizer and its codes fully into RAM"""
+        if not (os.path.exists(self.quantizer_path) and os.path.exists(self.codes_path)):
+            return None, None
+        with np.load(self.quantizer_path) as data:
+            kind = str(data['kind'])
+            params = {key: data[key] for key in data.files if key not in ('kind', 'count')}
+        codes = np.load(self.codes_path)
+        if len(codes) > self.count:
+            self.logger.warning(f"Ignoring quantized codes that do not match the index: {self.codes_path}")
+            return None, None
+        return quantizer_from_params(kind, params), codes
+
+    def build_quantization(self, kind: str, train_size: Optional[int] = None, seed: int = 0,
+                           **kwargs) -> Dict[str, Any]:
+        """
+        Encode every vector with a float16, int8 or pq quantizer (trained on a sample) and persist
+        the codes. Vectors appended later are scored in float32 until the next build.
+        """
+        # PQ runs k-means per subspace, so it trains on a smaller sample than the scalar range fit
+        train_size = train_size or (16384 if kind == 'pq' else 65536)
+        with self._lock:
+            vectors, count = self._vectors, self.count
+        if count == 0:
+            raise ValueError("Cannot quantize an empty index")
+
+        rng = np.random.default_rng(seed)
+        sample_rows = np.sort(rng.choice(count, size=min(count, train_size), replace=False))
+        quantizer = train_quantizer(kind, np.asarray(vectors[sample_rows]), **kwargs)
+
+        codes = np.concatenate([
+            quantizer.encode(np.asarray(vectors[start:start + self.BLOCK_ROWS]))
+            for start in range(0, count, self.BLOCK_ROWS)
+        ])
+        np.save(self.codes_path, codes)
+        np.savez(self.quantizer_path, kind=np.array(kind), count=np.int64(count), **quantizer.params())
+
+        with self._lock:
+            self._quantizer, self._codes = self._load_quantization()
+        return {'kind': kind, 'count': count, 'bytes_per_vector': quantizer.bytes_per_vector(self.dimension),
+                'codes_mb': codes.nbytes / 1_048_576, 'float32_mb': count * self.dimension * 4 / 1_048_576}
+
+    def _reencode_rows(self, updates: List[Tuple[int, int]], matrix: np.ndarray):
+        """Keep quantized codes in step with overwritten vectors"""
+        if self._codes is None:
+            return
+        coded = [(row, position) for row, position in updates if row < len(self._codes)]
+        if not coded:
+            return
+        rows = np.array([row for row, _ in coded])
+        new_codes = self._quantizer.encode(matrix[[position for _, position in coded]])
+        self._codes[rows] = new_codes
+        on_disk = np.load(self.codes_path, mmap_mode='r+')
+        on_disk[rows] = new_codes
+        on_disk.flush()
+        del on_disk
+
+    def _snapshot(self, filter: Optional[Dict[str, Any]] = None) -> SearchSnapshot:
+        """Vectors, codes, IVF partition and filter mask of one moment; upserts remap rather than mutate them"""
+        with self._lock:
+            return SearchSnapshot(self._vectors, self._quantizer, self._codes, self._ivf, self._filter_mask(filter))
+
+    def _active_codes(self, snapshot: SearchSnapshot, use_codes: bool) -> Optional[np.ndarray]:
+        return snapshot.codes if use_codes and self.use_quantization else None
+
+    def _score_range(self, queries: np.ndarray, start: int, stop: int, snapshot: SearchSnapshot,
+                     codes: Optional[np.ndarray]) -> np.ndarray:
+        """Scores for rows [start, stop): quantized where codes exist, float32 beyond them"""
+        coded = len(codes) if codes is not None else 0
+        parts = []
+        if start < coded:
+            parts.append(snapshot.quantizer.score(queries, codes[start:min(stop, coded)]))
+        if stop > coded:
+            parts.append(queries @ snapshot.vectors[max(start, coded):stop].T)
+        return parts[0] if len(parts) == 1 else np.hstack(parts)
+
+    def _score_rows(self, query: np.ndarray, rows: np.ndarray, snapshot: SearchSnapshot,
+                    codes: Optional[np.ndarray]) -> np.ndarray:
+        """Scores for sorted row ids: quantized where codes exist, float32 beyond them"""
+        split = np.searchsorted(rows, len(codes)) if codes is not None else 0
+        parts = []
+        if split:
+            parts.append(snapshot.quantizer.score(query[None, :], codes[rows[:split]])[0])
+        if split < len(rows):
+            parts.append(snapshot.vectors[rows[split:]] @ query)
+        return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+    def _finish(self, query: np.ndarray, rows: np.ndarray, scores: np.ndarray, top_k: int,
+                snapshot: SearchSnapshot, quantized: bool) -> List[Tuple[int, float]]:
+        """Final top-k for one query; quantized candidates are rescored against float32 rows"""
+        finite = np.isfinite(scores)
+        rows, scores = rows[finite], scores[finite]
+        if quantized and len(rows):
+            k = min(top_k * self.rescore_factor, len(rows))
+            candidates = np.argpartition(-scores, k - 1)[:k]
+            rows = np.sort(rows[candidates])
+            scores = snapshot.vectors[rows] @ query
+        if len(rows) == 0:
+            return []
+
+        k = min(top_k, len(rows))
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best], kind='stable')]
+        return [(int(rows[i]), float(scores[i])) for i in best]
+
+    def _default_nprobe(self, snapshot: SearchSnapshot) -> Optional[int]:
+        """nprobe for searches that did not ask for one; None means exact search"""
+        if self.search_mode == 'exact':
+            return None
+        if snapshot.ivf is None:
+            if self.search_mode == 'ivf':
+                self.logger.warning("IVF search requested but no IVF partition is built; using exact search")
+            return None
+        return self.nprobe
+
+    def _ivf_top_k(self, queries: np.ndarray, top_k: int, snapshot: SearchSnapshot,
+                   nprobe: int, use_codes: bool = True) -> List[List[Tuple[int, float]]]:
+        """Approximate top-k: score only rows in the nprobe closest clusters (plus rows added since the build)"""
+        ivf, vectors, mask = snapshot.ivf, snapshot.vectors, snapshot.mask
+        codes = self._active_codes(snapshot, use_codes)
+        nlist = len(ivf['centroids'])
+        nprobe = max(1, min(nprobe, nlist))
+        tail = np.arange(ivf['count'], vectors.shape[0])
+
+        results = []
+        for query, centroid_scores in zip(queries, queries @ ivf['centroids'].T):
+            probes = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+            parts = [ivf['order'][ivf['offsets'][c]:ivf['offsets'][c + 1]] for c in probes]
+            rows = np.sort(np.concatenate(parts + [tail]))  # sorted rows keep memmap reads sequential
+            if mask is not None:
+                rows = rows[mask[rows]]
+            if len(rows) == 0:
+                results.append([])
+                continue
+
+            scores = self._score_rows(query, rows, snapshot, codes)
+            results.append(self._finish(query, rows, scores, top_k, snapshot, codes is not None))
+        return results
+
+    def _top_k(self, queries: np.ndarray, top_k: int, snapshot: SearchSnapshot,
+               use_codes: bool = True) -> List[List[Tuple[int, float]]]:
+        """Full-scan top-k rows per query via blocked matrix multiply (over quantized codes when built)"""
+        codes = self._active_codes(snapshot, use_codes)
+        candidates_per_query = top_k * self.rescore_factor if codes is not None else top_k
+        total, mask = snapshot.vectors.shape[0], snapshot.mask
+        best_rows = [np.empty(0, dtype=np.int64) for _ in range(len(queries))]
+        best_scores = [np.empty(0, dtype=np.float32) for _ in range(len(queries))]
+
+        for start in range(0, total, self.BLOCK_ROWS):
+            stop = min(start + self.BLOCK_ROWS, total)
+            scores = self._score_range(queries, start, stop, snapshot, codes)  # (num_queries, block_rows)
+            if mask is not None:
+                scores[:, ~mask[start:stop]] = -np.inf
+
+            k = min(candidates_per_query, scores.shape[1])
+            candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            for qi in range(len(queries)):
+                rows = candidates[qi]
+                best_rows[qi] = np.concatenate([best_rows[qi], rows + start])
+                best_scores[qi] = np.concatenate([best_scores[qi], scores[qi, rows]])
+
+        return [
+            self._finish(query, rows, scores, top_k, snapshot, codes is not None)
+            for query, rows, scores in zip(queries, best_rows, best_scores)
+        ]
+
+    def _build_response(self, hits: List[Tuple[int, float]], include_metadata: bool, include_values: bool,
+                        snapshot: SearchSnapshot) -> IndexRecord:
+        """Matches for the hit rows of a snapshot; the SQLite side store and id lists are read under the lock"""
+        with self._lock:
+            texts = {}
+            if include_metadata and hits:
+                placeholders = ",".join("?" * len(hits))
+                texts = dict(self._db.execute(
+                    f"SELECT row, text FROM records WHERE row IN ({placeholders})", [row for row, _ in hits]
+                ).fetchall())
+
+            matches = []
+            for row, score in hits:
+                match = IndexRecord(id=self._ids[row], score=score)
+                if include_metadata:
+                    metadata = dict(self._fields[row])
+                    if texts.get(row) is not None:
+                        metadata['text'] = texts[row]
+                    match['metadata'] = metadata
+                if include_values:
+                    match['values'] = snapshot.vectors[row].tolist()
+                matches.append(match)
+            return IndexRecord(matches=matches, namespace='')
+
+    def query(self, vector: List[float], top_k: int = 10, include_metadata: bool = False,
+              filter: Optional[Dict[str, Any]] = None, include_values: bool = False,
+              nprobe: Optional[int] = None, exact: bool = False, **kwargs) -> IndexRecord:
+        """Same call surface as pinecone Index.query (plus nprobe / exact overrides)"""
+        return self.query_batch([vector], top_k, include_metadata, filter, include_values, nprobe, exact)[0]
+
+    def query_batch(self, vectors: List[List[float]], top_k: int = 10, include_metadata: bool = False,
+                    filter: Optional[Dict[str, Any]] = None, include_values: bool = False,
+                    nprobe: Optional[int] = None, exact: bool = False) -> List[IndexRecord]:
+        """Score several query vectors (exact: one pass over the matrix; IVF: probed clusters only)"""
+        snapshot = self._snapshot(filter)
+        if len(snapshot.vectors) == 0:
+            return [IndexRecord(matches=[], namespace='') for _ in vectors]
+
+        queries = self._normalize(np.asarray(vectors, dtype=np.float32))
+        hits = self._search(queries, top_k, snapshot, nprobe, exact)
+        return [self._build_response(h, include_metadata, include_values, snapshot) for h in hits]
+
+    def _search(self, queries: np.ndarray, top_k: int, snapshot: SearchSnapshot,
+                nprobe: Optional[int] = None, exact: bool = False) -> List[List[Tuple[int, float]]]:
+        if exact:
+            return self._top_k(queries, top_k, snapshot, use_codes=False)
+        if snapshot.ivf is not None:
+            nprobe = nprobe if nprobe is not None else self._default_nprobe(snapshot)
+            if nprobe is not None:
+                return self._ivf_top_k(queries, top_k, snapshot, nprobe)
+        return self._top_k(queries, top_k, snapshot)
+
+    def recall_report(self, nprobe_values: Tuple[int, ...] = (1, 2, 4, 8, 16, 32), top_k: int = 25,
+                      num_queries: int = 100, seed: int = 0) -> List[Dict[str, Any]]:
+        """
+        recall@k and latency against exact float32 search: a full scan over the quantized codes
+        (nprobe None) when built, and IVF search for each nprobe when partitioned.
+        Queries are midpoints of random pairs of indexed vectors, so they land between
+        clusters the way real paraphrased questions do.
+        """
+        snapshot = self._snapshot()
+        codes = self._active_codes(snapshot, True)
+        if snapshot.ivf is None and codes is None:
+            raise ValueError("Nothing approximate to report; run build_ivf() or build_quantization() first")
+
+        rng = np.random.default_rng(seed)
+        vectors = snapshot.vectors
+        pairs = rng.integers(0, len(vectors), size=(num_queries, 2))
+        queries = self._normalize(np.asarray(vectors[pairs[:, 0]]) + np.asarray(vectors[pairs[:, 1]]))
+
+        start = time.perf_counter()
+        exact_hits = [self._top_k(q[None, :], top_k, snapshot, use_codes=False)[0] for q in queries]
+        exact_ms = (time.perf_counter() - start) * 1000 / num_queries
+        truth = [{row for row, _ in hits} for hits in exact_hits]
+
+        settings = []
+        if codes is not None:
+            settings.append(None)
+        if snapshot.ivf is not None:
+            settings.extend(nprobe_values)
+
+        quantization = snapshot.quantizer.kind if codes is not None else 'none'
+        report = []
+        for nprobe in settings:
+            start = time.perf_counter()
+            if nprobe is None:
+                approx_hits = [self._top_k(q[None, :], top_k, snapshot)[0] for q in queries]
+            else:
+                approx_hits = [self._ivf_top_k(q[None, :], top_k, snapshot, nprobe)[0] for q in queries]
+            approx_ms = (time.perf_counter() - start) * 1000 / num_queries
+            recall = np.mean([
+                len(expected & {row for row, _ in hits}) / len(expected)
+                for expected, hits in zip(truth, approx_hits) if expected
+            ])
+            report.append({'nprobe': nprobe, 'quantization': quantization, f'recall@{top_k}': float(recall),
+                           'approx_ms': approx_ms, 'exact_ms': exact_ms})
+        return report
+
+    def fetch(self, ids: List[str], **kwargs) -> IndexRecord:
+        """Same call surface as pinecone Index.fetch: stored (normalized) vectors and metadata by id"""
+        with self._lock:
+            snapshot = self._snapshot()
+            rows = [self._row_by_id[chunk_id] for chunk_id in ids if chunk_id in self._row_by_id]
+        hits = self._build_response([(row, 0.0) for row in rows], True, True, snapshot)
+        return IndexRecord(
+            vectors={match['id']: IndexRecord(id=match['id'], values=match['values'], metadata=match['metadata'])
+                     for match in hits['matches']},
+            namespace=''
+        )
+
+    def describe_index_stats(self, **kwargs) -> IndexRecord:
+        return IndexRecord(
+            dimension=self.dimension or 0,
+            total_vector_count=self.count,
+            namespaces={'': IndexRecord(vector_count=self.count)},
+            ivf_lists=len(self._ivf['centroids']) if self._ivf is not None else 0,
+            quantization=self._quantizer.kind if self._quantizer is not None else 'none'
+        )
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+def vector_backend() -> str:
+    """Configured vector store: 'pinecone' (default) or 'local'"""
+    return os.getenv('LIMOSA_VECTOR_BACKEND', 'pinecone').strip().lower()
+
+def open_local_vector_index() -> Optional[LocalVectorIndex]:
+    """The local index when LIMOSA_VECTOR_BACKEND=local, otherwise None (use Pinecone)"""
+    if vector_backend() != 'local':
+        return None
+    index = LocalVectorIndex()
+    print(f"✅ Using local vector index: {index.index_dir} ({index.count} vectors)")
+    return index
+
+def main():
+    """
+    Build the local index from the embedder backup (--build), partition it (--build-ivf),
+    quantize it (--quantize float16|int8|pq), then benchmark retrieval and report
+    approximate recall against exact search
+    """
+    print("🗂️ LOCAL VECTOR INDEX")
+    print("=" * 50)
+
+    index = LocalVectorIndex()
+
+    if '--build' in sys.argv:
+        from veterinary_embedder import VeterinaryEmbedder
+        embedded_file = "vet_database/embedded_veterinary_chunks.json"
+        if not os.path.exists(embedded_file):
+            print(f"❌ Embedded chunks not found: {embedded_file}")
+            print("💡 Run 'python veterinary_embedder.py' first")
+            return
+        with open(embedded_file, 'r', encoding='utf-8') as f:
+            embedded_chunks = json.load(f)
+        vectors = VeterinaryEmbedder.prepare_pinecone_vectors(embedded_chunks)
+        for i in range(0, len(vectors), 1000):
+            index.upsert(vectors[i:i + 1000])
+        print(f"✅ Indexed {len(vectors)} vectors")
+
+    stats = index.describe_index_stats()
+    print(f"📊 Vectors: {stats['total_vector_count']}  Dimension: {stats['dimension']}")
+    if not stats['total_vector_count']:
+        print("💡 Run with --build to index vet_database/embedded_veterinary_chunks.json")
+        return
+
+    if '--build-ivf' in sys.argv:
+        print("🧩 Building IVF partition...")
+        start = time.perf_counter()
+        ivf_stats = index.build_ivf()
+        print(f"✅ {ivf_stats['nlist']} lists in {time.perf_counter() - start:.1f}s "
+              f"(largest list {ivf_stats['largest_list']}, empty {ivf_stats['empty_lists']})")
+
+    if '--quantize' in sys.argv:
+        kind = sys.argv[sys.argv.index('--quantize') + 1]
+        print(f"🗜️ Building {kind} quantized codes...")
+        start = time.perf_counter()
+        q_stats = index.build_quantization(kind)
+        print(f"✅ {q_stats['bytes_per_vector']} bytes/vector: {q_stats['codes_mb']:.1f} MB in RAM "
+              f"vs {q_stats['float32_mb']:.1f} MB float32 ({time.perf_counter() - start:.1f}s)")
+
+    if index._ivf is not None or index._codes is not None:
+        print("🎯 Approximate recall vs exact float32 search:")
+        for row in index.recall_report():
+            mode = f"nprobe={row['nprobe']:>3}" if row['nprobe'] is not None else "full scan  "
+            print(f"   {mode}  {row['quantization']:>7}  recall@25={row['recall@25']:.3f}  "
+                  f"{row['approx_ms']:.2f} ms vs exact {row['exact_ms']:.2f} ms")
+
+    # Deterministic benchmark: random unit queries against the exact index
+    rng = np.random.default_rng(0)
+    queries = rng.standard_normal((50, stats['dimension'])).astype(np.float32)
+    index.query(queries[0].tolist(), top_k=25)  # warm the page cache
+
+    start = time.perf_counter()
+    for q in queries:
+        index.query(q.tolist(), top_k=25, include_metadata=True)
+    single_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+    start = time.perf_counter()
+    index.query_batch(queries[:8].tolist(), top_k=25, include_metadata=True)
+    batch_ms = (time.perf_counter() - start) * 1000
+
+    print(f"⏱️ Single query (top 25, with metadata): {single_ms:.2f} ms")
+    print(f"⏱️ Batch of 8 queries: {batch_ms:.2f} ms")
+    index.close()
+
+if __name__ == "__main__":
+    main()
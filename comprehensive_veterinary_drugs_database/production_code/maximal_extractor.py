@@ -10,6 +10,7 @@ import json
 from typing import List, Dict, Any
 from tqdm import tqdm
 import os
+from keyword_scorer import KeywordScorer
 
 class MaximalVeterinaryExtractor:
     def __init__(self):
@@ -33,6 +34,8 @@ class MaximalVeterinaryExtractor:
             'anesthetic', 'anticonvulsant', 'cardiac', 'respiratory',
             'gastrointestinal', 'renal', 'hepatic', 'dermatologic'
         ]
+        # Counts how many distinct keywords a text contains, in one pass
+        self.medical_keyword_scorer = KeywordScorer(self.medical_keywords)
         
         print(f"📋 Monitoring {len(self.medical_keywords)} medical keywords")
         print("✅ Maximal extractor ready")
@@ -70,8 +73,7 @@ class MaximalVeterinaryExtractor:
                     if len(chunk_text.strip()) > 30:
                         # Check if this chunk contains medical content
                         chunk_lower = chunk_text.lower()
-                        medical_score = sum(1 for keyword in self.medical_keywords 
-                                          if keyword in chunk_lower)
+                        medical_score = self.medical_keyword_scorer.distinct(chunk_lower)
                         
                         # AGGRESSIVE: Include if ANY medical content detected
                         if medical_score >= 1:
@@ -96,8 +98,7 @@ class MaximalVeterinaryExtractor:
                 for sent_idx, sentence in enumerate(sentences):
                     if len(sentence.strip()) > 50:
                         sent_lower = sentence.lower()
-                        medical_score = sum(1 for keyword in self.medical_keywords 
-                                          if keyword in sent_lower)
+                        medical_score = self.medical_keyword_scorer.distinct(sent_lower)
                         
                         if medical_score >= 2:  # Higher threshold for sentences
                             chunk_entry = {
@@ -120,8 +121,7 @@ class MaximalVeterinaryExtractor:
                 for para_idx, paragraph in enumerate(paragraphs):
                     if len(paragraph.strip()) > 100:
                         para_lower = paragraph.lower()
-                        medical_score = sum(1 for keyword in self.medical_keywords 
-                                          if keyword in para_lower)
+                        medical_score = self.medical_keyword_scorer.distinct(para_lower)
                         
                         if medical_score >= 3:  # Even higher threshold for paragraphs
                             chunk_entry = {
@@ -141,8 +141,7 @@ class MaximalVeterinaryExtractor:
                 
                 # STRATEGY 4: Full page extraction for high medical density
                 page_lower = page_text.lower()
-                page_medical_score = sum(1 for keyword in self.medical_keywords 
-                                       if keyword in page_lower)
+                page_medical_score = self.medical_keyword_scorer.distinct(page_lower)
                 
                 if page_medical_score >= 5:  # High medical density pages
                     # Split page into multiple chunks for better embedding
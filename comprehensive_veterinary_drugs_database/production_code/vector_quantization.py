@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Vector Quantization
+Compact codes for the local vector index: float16, int8 scalar and product quantization.
+Codes are scored approximately in RAM; the index rescores the best candidates against
+the full-precision float32 rows.
+"""
+
+from abc import ABC, abstractmethod
+from typing import Dict, Optional
+import numpy as np
+
+class VectorQuantizer(ABC):
+    """Base class: encode unit vectors to codes and score queries against codes"""
+    kind = "none"
+
+    @abstractmethod
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        ...
+
+    @abstractmethod
+    def score(self, queries: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        """Approximate dot products, shape (num_queries, num_codes)"""
+
+    def params(self) -> Dict[str, np.ndarray]:
+        return {}
+
+    @abstractmethod
+    def bytes_per_vector(self, dimension: int) -> int:
+        ...
+
+class Float16Quantizer(VectorQuantizer):
+    """Half precision: 2x smaller, near-lossless for unit vectors"""
+    kind = "float16"
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        return np.asarray(vectors, dtype=np.float16)
+
+    def score(self, queries: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        # numpy has no half-precision BLAS; widen block-wise and use the float32 kernel
+        return queries @ codes.astype(np.float32).T
+
+    def bytes_per_vector(self, dimension: int) -> int:
+        return 2 * dimension
+
+class Int8Quantizer(VectorQuantizer):
+    """Symmetric per-dimension scalar quantization: 4x smaller"""
+    kind = "int8"
+
+    def __init__(self, scale: np.ndarray):
+        self.scale = np.asarray(scale, dtype=np.float32)
+
+    @classmethod
+    def train(cls, sample: np.ndarray) -> "Int8Quantizer":
+        scale = np.abs(sample).max(axis=0) / 127.0
+        scale[scale == 0] = 1.0
+        return cls(scale)
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        return np.clip(np.rint(np.asarray(vectors) / self.scale), -127, 127).astype(np.int8)
+
+    def score(self, queries: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        # q . (code * scale) == (q * scale) . code
+        return (queries * self.scale) @ codes.astype(np.float32).T
+
+    def params(self) -> Dict[str, np.ndarray]:
+        return {'scale': self.scale}
+
+    def bytes_per_vector(self, dimension: int) -> int:
+        return dimension
+
+class ProductQuantizer(VectorQuantizer):
+    """
+    Product quantization: the vector is split into m subvectors, each replaced by the id of
+    its nearest of 256 sub-centroids (one byte). Scored by asymmetric distance computation:
+    a per-query lookup table of sub-centroid dot products summed over the code bytes.
+    """
+    kind = "pq"
+
+    def __init__(self, codebooks: np.ndarray):
+        self.codebooks = np.asarray(codebooks, dtype=np.float32)  # (m, 256, dsub)
+        self.m, self.ksub, self.dsub = self.codebooks.shape
+        self._offsets = (np.arange(self.m) * self.ksub).astype(np.intp)
+
+    @staticmethod
+    def default_subquantizers(dimension: int) -> int:
+        """Largest m dividing the dimension with at least 16 dimensions per subvector"""
+        for m in range(max(1, dimension // 16), 0, -1):
+            if dimension % m == 0:
+                return m
+        return 1
+
+    @classmethod
+    def train(cls, sample: np.ndarray, m: Optional[int] = None, iterations: int = 15,
+              seed: int = 0) -> "ProductQuantizer":
+        sample = np.asarray(sample, dtype=np.float32)
+        dimension = sample.shape[1]
+        m = m or cls.default_subquantizers(dimension)
+        if dimension % m:
+            raise ValueError(f"Dimension {dimension} is not divisible into {m} subvectors")
+        dsub = dimension // m
+        ksub = min(256, len(sample))
+        rng = np.random.default_rng(seed)
+
+        codebooks = np.zeros((m, 256, dsub), dtype=np.float32)
+        for j in range(m):
+            sub = sample[:, j * dsub:(j + 1) * dsub]
+            centroids = sub[rng.choice(len(sub), size=ksub, replace=False)].copy()
+            for _ in range(iterations):
+                assignments = cls._nearest(sub, centroids)
+                counts = np.bincount(assignments, minlength=ksub)
+                sums = np.stack([np.bincount(assignments, weights=sub[:, d], minlength=ksub)
+                                 for d in range(dsub)], axis=1)
+                filled = counts > 0
+                centroids[filled] = sums[filled] / counts[filled, None]
+                empty = np.flatnonzero(~filled)
+                if len(empty):
+                    centroids[empty] = sub[rng.choice(len(sub), size=len(empty), replace=False)]
+            codebooks[j, :ksub] = centroids
+        return cls(codebooks)
+
+    @staticmethod
+    def _nearest(sub: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        """Nearest centroid by squared Euclidean distance (||c||^2 - 2 x.c)"""
+        return np.argmin((centroids * centroids).sum(axis=1) - 2.0 * (sub @ centroids.T), axis=1)
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        codes = np.empty((len(vectors), self.m), dtype=np.uint8)
+        for j in range(self.m):
+            sub = vectors[:, j * self.dsub:(j + 1) * self.dsub]
+            codes[:, j] = self._nearest(sub, self.codebooks[j])
+        return codes
+
+    def score(self, queries: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        # Lookup tables: (num_queries, m * 256) dot products between query subvectors and sub-centroids
+        tables = np.einsum('qmd,mkd->qmk', queries.reshape(len(queries), self.m, self.dsub), self.codebooks)
+        tables = tables.reshape(len(queries), -1)
+        flat_codes = codes.astype(np.intp) + self._offsets
+        return np.stack([table[flat_codes].sum(axis=1) for table in tables])
+
+    def params(self) -> Dict[str, np.ndarray]:
+        return {'codebooks': self.codebooks}
+
+    def bytes_per_vector(self, dimension: int) -> int:
+        return self.m
+
+QUANTIZERS = {
+    'float16': Float16Quantizer,
+    'int8': Int8Quantizer,
+    'pq': ProductQuantizer,
+}
+
+def train_quantizer(kind: str, sample: np.ndarray, **kwargs) -> VectorQuantizer:
+    """Train a quantizer of the given kind on a sample of unit vectors"""
+    if kind == 'float16':
+        return Float16Quantizer()
+    if kind == 'int8':
+        return Int8Quantizer.train(sample)
+    if kind == 'pq':
+        return ProductQuantizer.train(sample, **kwargs)
+    raise ValueError(f"Unknown quantization: {kind} (expected one of {', '.join(QUANTIZERS)})")
+
+def quantizer_from_params(kind: str, params: Dict[str, np.ndarray]) -> VectorQuantizer:
+    """Rebuild a persisted quantizer"""
+    if kind == 'float16':
+        return Float16Quantizer()
+    if kind == 'int8':
+        return Int8Quantizer(params['scale'])
+    if kind == 'pq':
+        return ProductQuantizer(params['codebooks'])
+    raise ValueError(f"Unknown quantization: {kind}")
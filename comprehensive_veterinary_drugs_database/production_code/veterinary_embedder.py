@@ -12,6 +12,8 @@ from typing import List, Dict
 import openai
 from pinecone import Pinecone
 from tqdm import tqdm
+from local_vector_index import LocalVectorIndex, open_local_vector_index
+from lexical_index import LexicalIndex
 
 class VeterinaryEmbedder:
     def __init__(self):
@@ -27,6 +29,7 @@ class VeterinaryEmbedder:
         # Initialize clients
         self.openai_client = self._init_openai()
         self.pinecone_index = self._init_pinecone()
+        self.lexical_index = LexicalIndex()  # BM25 side index kept in step with the vector upload
         
         print("✅ Veterinary Drug Embedder ready!")
 
@@ -47,7 +50,11 @@ class VeterinaryEmbedder:
             raise
 
     def _init_pinecone(self):
-        """Initialize Pinecone with veterinary index"""
+        """Initialize Pinecone with veterinary index (or the local index when LIMOSA_VECTOR_BACKEND=local)"""
+        local_index = open_local_vector_index()
+        if local_index is not None:
+            return local_index
+        
         try:
             pc = Pinecone()
             
@@ -163,7 +170,8 @@ class VeterinaryEmbedder:
         
         return embedded_chunks, failed_chunks
 
-    def prepare_pinecone_vectors(self, embedded_chunks: List[Dict]) -> List[Dict]:
+    @staticmethod
+    def prepare_pinecone_vectors(embedded_chunks: List[Dict]) -> List[Dict]:
         """Prepare vectors for Pinecone upload with veterinary-specific metadata"""
         print("📦 Preparing vectors for Pinecone...")
         
@@ -214,8 +222,10 @@ class VeterinaryEmbedder:
             
             try:
                 self.pinecone_index.upsert(vectors=batch)
+                self.lexical_index.upsert(batch)
                 uploaded_count += len(batch)
-                time.sleep(0.2)  # Rate limiting
+                if not isinstance(self.pinecone_index, LocalVectorIndex):
+                    time.sleep(0.2)  # Rate limiting
                 
             except Exception as e:
                 print(f"❌ Upload batch {i//upload_batch_size + 1} failed: {str(e)}")
@@ -7,11 +7,15 @@ Alternative approach to verify extraction accuracy through content analysis
 import json
 import os
 import re
+import sys
 from typing import List, Dict, Any
 from collections import Counter
 import random
 from datetime import datetime
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'production_code'))
+from keyword_scorer import KeywordScorer
+
 class ContentValidationAuditor:
     def __init__(self):
         """Initialize content validation auditor"""
@@ -328,14 +332,14 @@ class ContentValidationAuditor:
             'high_quality_chunks': 0
         }
         
-        medical_terms = [
+        medical_terms = KeywordScorer([
             'administration', 'contraindication', 'indication', 'dosage', 'pharmacokinetics',
             'metabolism', 'distribution', 'elimination', 'bioavailability', 'efficacy',
             'therapeutic', 'clinical', 'veterinary', 'treatment', 'diagnosis'
-        ]
+        ])
         
-        dosage_units = ['mg', 'ml', 'units', 'kg', 'po', 'iv', 'im', 'sc']
-        species = ['dog', 'cat', 'horse', 'cattle', 'canine', 'feline', 'equine', 'bovine']
+        dosage_units = KeywordScorer(['mg', 'ml', 'units', 'kg', 'po', 'iv', 'im', 'sc'])
+        species = KeywordScorer(['dog', 'cat', 'horse', 'cattle', 'canine', 'feline', 'equine', 'bovine'])
         
         print("🔬 Analyzing content integrity...")
         
@@ -350,7 +354,10 @@ class ContentValidationAuditor:
                 integrity_metrics['chunks_with_complete_sentences'] += 1
             
             # Check for medical terminology
-            if any(term in text_lower for term in medical_terms):
+            has_medical_terms = medical_terms.matches_any(text_lower)
+            has_dosage_units = dosage_units.matches_any(text_lower)
+            has_species = species.matches_any(text_lower)
+            if has_medical_terms:
                 integrity_metrics['chunks_with_medical_terminology'] += 1
             
             # Check for proper formatting
@@ -358,11 +365,11 @@ class ContentValidationAuditor:
                 integrity_metrics['chunks_with_proper_formatting'] += 1
             
             # Check for dosage units
-            if any(unit in text_lower for unit in dosage_units):
+            if has_dosage_units:
                 integrity_metrics['chunks_with_dosage_units'] += 1
             
             # Check for species mentions
-            if any(sp in text_lower for sp in species):
+            if has_species:
                 integrity_metrics['chunks_with_species_mentions'] += 1
             
             # Identify suspicious chunks
@@ -379,9 +386,9 @@ class ContentValidationAuditor:
             # High quality chunks
             quality_score = 0
             quality_score += 1 if len(text) > 100 else 0
-            quality_score += 1 if any(term in text_lower for term in medical_terms) else 0
-            quality_score += 1 if any(unit in text_lower for unit in dosage_units) else 0
-            quality_score += 1 if any(sp in text_lower for sp in species) else 0
+            quality_score += 1 if has_medical_terms else 0
+            quality_score += 1 if has_dosage_units else 0
+            quality_score += 1 if has_species else 0
             quality_score += 1 if text.count('.') >= 2 else 0
             
             if quality_score >= 4:
@@ -11,6 +11,7 @@ from typing import List, Dict, Any
 from collections import Counter
 from datetime import datetime
 from final_95_confidence import Final95ConfidenceAssistant
+from keyword_scorer import KeywordScorer
 
 class DatabaseQualityReviewer:
     def __init__(self):
@@ -82,18 +83,18 @@ class DatabaseQualityReviewer:
         }
         
         # Medical content analysis
-        medical_keywords = [
+        medical_keywords = KeywordScorer([
             'mg', 'kg', 'dose', 'dosage', 'administration', 'contraindication',
             'adverse', 'side effect', 'veterinary', 'drug', 'medication',
             'treatment', 'therapy', 'clinical', 'patient', 'animal'
-        ]
+        ])
         
         chunks_with_medical_content = 0
         total_medical_keywords = 0
         
         for chunk in chunks:
             text_lower = chunk['text'].lower()
-            medical_count = sum(1 for keyword in medical_keywords if keyword in text_lower)
+            medical_count = medical_keywords.distinct(text_lower)
             
             if medical_count > 0:
                 chunks_with_medical_content += 1
@@ -5,16 +5,91 @@ Handles all Constant Rate Infusion calculations with proper protocol logic
 """
 
 import re
+import io
+import csv
 import math
-from typing import Dict, List, Tuple, Optional, Any
-from dataclasses import dataclass
+import time
+from functools import lru_cache
+from typing import Dict, List, Tuple, Optional, Any, Iterable, IO, Union
+from dataclasses import dataclass, field
 import logging
+import numpy as np
+from clinical_entity_recognizer import ClinicalContext
+from clinical_reference_data import ClinicalReferenceData, get_reference_data
+
+# CRI drug names and aliases (matched as whole words) -> canonical drug
+CRI_DRUG_ALIASES = {
+    'morphine': 'morphine', 'mso4': 'morphine',
+    'lidocaine': 'lidocaine', 'xylocaine': 'lidocaine',
+    'ketamine': 'ketamine',
+    'fentanyl': 'fentanyl',
+    'dopamine': 'dopamine',
+    'dexmedetomidine': 'dexmedetomidine', 'dex': 'dexmedetomidine',
+    'propofol': 'propofol',
+    'butorphanol': 'butorphanol', 'torbugesic': 'butorphanol',
+}
+
+# Words next to a plain mL volume that make it the fluid bag, or the flow rate
+BAG_WORDS = {'bag', 'bags', 'saline', 'fluid', 'fluids', 'd5w', 'lrs', 'nacl', 'normal', 'lactated', 'plasmalyte'}
+RATE_CUES = {'rate', 'flow', 'at', 'run', 'running', 'infuse', 'infusion'}
+# Words before an hour count that make it the infusion duration
+DURATION_CUES = {'over', 'for', 'want', 'last', 'lasting', 'duration'}
+
+_MASS = r'(?:mg|µg|μg|mcg|ug)'
+_PER = r'\s*(?:/|per\b)\s*'
+_HOURS = r'(?:hours?|hrs?|h)'
+# One pass over the lower-cased query: a word, or a number with an optional unit
+CRI_TOKEN_PATTERN = re.compile(
+    r'(?P<word>[a-zµμ][a-z0-9µμ]*)'
+    r'|(?P<number>\d+(?:\.\d+)?|\.\d+)(?:\s*-?\s*(?P<unit>'
+    rf'{_MASS}{_PER}kg{_PER}(?:minutes?|min|{_HOURS})\b'
+    rf'|(?:ml|milliliters?){_PER}{_HOURS}\b'
+    rf'|{_MASS}{_PER}ml\b'
+    r'|%'
+    r'|(?:kg|kilograms?)\b'
+    r'|(?:ml|milliliters?)\b'
+    r'|(?:liters?|litres?|l)\b'
+    rf'|{_MASS}\b'
+    rf'|{_HOURS}\b'
+    r'))?'
+)
+
+@lru_cache(maxsize=256)
+def _classify_unit(unit: str) -> Tuple[str, Optional[str]]:
+    """(role, canonical units) for a unit matched by CRI_TOKEN_PATTERN"""
+    parts = [part.strip() for part in re.split(r'/|\bper\b', unit) if part.strip()]
+    mass = 'mg' if parts[0] == 'mg' else 'μg'
+    if len(parts) == 3:
+        return 'dose', f"{mass}/kg/{'minute' if parts[2].startswith('min') else 'hour'}"
+    if len(parts) == 2:
+        if parts[0].startswith(('ml', 'milliliter')):
+            return 'rate', "mL/hour"
+        return 'concentration', f"{mass}/mL"
+    if unit == '%':
+        return 'percent', None
+    if unit.startswith(('kg', 'kilogram')):
+        return 'weight', "kg"
+    if unit.startswith(('ml', 'milliliter')):
+        return 'volume', "mL"
+    if unit.startswith('l'):
+        return 'liters', "L"
+    if unit.startswith('h'):
+        return 'duration', "hour"
+    return 'mass', mass
+
+# Dose units -> factor converting them to mg/kg/hour
+DOSE_UNIT_TO_MG_PER_KG_HOUR = {
+    "mg/kg/hour": 1.0,
+    "mg/kg/minute": 60.0,
+    "μg/kg/hour": 0.001,
+    "μg/kg/minute": 0.06,
+}
 
 @dataclass
 class CRIDrug:
     name: str
-    dose_per_kg_per_hour: float  # mg/kg/hour or μg/kg/minute
-    dose_units: str  # "mg/kg/hour" or "μg/kg/minute"
+    dose_per_kg_per_hour: float  # dose in dose_units
+    dose_units: str  # a key of DOSE_UNIT_TO_MG_PER_KG_HOUR ("mg/kg/hour", "μg/kg/minute", ...)
     concentration: float  # mg/mL or μg/mL
     concentration_units: str  # "mg/mL" or "μg/mL"
 
@@ -35,14 +110,81 @@ class CRIResult:
     warnings: List[str]
     is_valid: bool
 
+@dataclass
+class CRIBatchResult:
+    """
+    CRI volumes for every weight × bag volume × flow rate combination (one row each, weight-major);
+    step-by-step working is only built when a row is requested
+    """
+    drugs: List[CRIDrug]
+    weights_kg: np.ndarray                # (rows,)
+    bag_volumes_ml: np.ndarray            # (rows,)
+    flow_rates_ml_per_hour: np.ndarray    # (rows,)
+    total_run_time_hours: np.ndarray      # (rows,)
+    hourly_mg_needed: np.ndarray          # (rows, drugs)
+    total_mg_needed: np.ndarray           # (rows, drugs)
+    volume_to_add_ml: np.ndarray          # (rows, drugs)
+    total_drug_volume_ml: np.ndarray      # (rows,)
+    final_bag_volume_ml: np.ndarray       # (rows,)
+    volume_displacement_percent: np.ndarray  # (rows,)
+    engine: "CRICalculationEngine" = field(repr=False, default=None)
+
+    def __len__(self) -> int:
+        return len(self.weights_kg)
+
+    def parameters(self, row: int) -> CRIParameters:
+        """The single-calculation parameters of a row"""
+        return CRIParameters(
+            patient_weight_kg=float(self.weights_kg[row]),
+            bag_volume_ml=float(self.bag_volumes_ml[row]),
+            flow_rate_ml_per_hour=float(self.flow_rates_ml_per_hour[row]),
+            drugs=self.drugs
+        )
+
+    def row(self, row: int) -> CRIResult:
+        """Full CRIResult, calculation steps included, for one row"""
+        return self.engine.calculate_cri(self.parameters(row))
+
+    def to_csv(self, destination: Union[str, IO[str]], decimals: int = 2):
+        """Write the chart as CSV (a path or an open text file)"""
+        header = ["weight_kg", "bag_volume_ml", "flow_rate_ml_per_hour", "run_time_hours"]
+        for drug in self.drugs:
+            header += [f"{drug.name.lower()}_mg", f"{drug.name.lower()}_ml"]
+        header += ["total_drug_volume_ml", "final_bag_volume_ml", "high_volume_displacement"]
+
+        per_drug = np.empty((len(self), 2 * len(self.drugs)))
+        per_drug[:, 0::2] = self.total_mg_needed
+        per_drug[:, 1::2] = self.volume_to_add_ml
+        values = np.round(np.column_stack([
+            self.weights_kg, self.bag_volumes_ml, self.flow_rates_ml_per_hour, self.total_run_time_hours,
+            per_drug, self.total_drug_volume_ml, self.final_bag_volume_ml
+        ]), decimals)
+        flags = self.volume_displacement_percent > 20
+
+        if isinstance(destination, str):
+            with open(destination, "w", newline="") as handle:
+                self._write_csv(handle, header, values, flags)
+        else:
+            self._write_csv(destination, header, values, flags)
+
+    @staticmethod
+    def _write_csv(handle: IO[str], header: List[str], values: np.ndarray, flags: np.ndarray):
+        writer = csv.writer(handle)
+        writer.writerow(header)
+        writer.writerows(row + [flag] for row, flag in zip(values.tolist(), flags.tolist()))
+
 class CRICalculationEngine:
     """
     Dedicated engine for CRI calculations with proper protocol logic
     """
     
-    def __init__(self):
-        """Initialize CRI calculation engine"""
+    def __init__(self, reference_data: Optional[ClinicalReferenceData] = None):
+        """
+        Initialize CRI calculation engine
+        reference_data: source of the default drug concentrations (defaults to the process-wide copy)
+        """
         self.logger = logging.getLogger(__name__)
+        self.reference_data = reference_data or get_reference_data()
         print("💉 CRI Calculation Engine initialized")
         print("   🎯 Proper total duration protocol logic")
 
@@ -108,6 +250,55 @@ class CRICalculationEngine:
                 is_valid=False
             )
 
+    def calculate_cri_batch(
+        self,
+        weights_kg: Iterable[float],
+        bag_volumes_ml: Iterable[float],
+        flow_rates_ml_per_hour: Iterable[float],
+        drugs: List[CRIDrug]
+    ) -> CRIBatchResult:
+        """
+        Calculate a CRI chart for every combination of weight, bag volume and flow rate in one
+        vectorized pass (same total duration logic as calculate_cri)
+        """
+        weights, bags, rates = (np.asarray(values, dtype=float).ravel()
+                                for values in (weights_kg, bag_volumes_ml, flow_rates_ml_per_hour))
+        if not drugs:
+            raise ValueError("CRI batch needs at least one drug")
+        for label, values in (("weights", weights), ("bag volumes", bags), ("flow rates", rates)):
+            if values.size == 0 or np.any(values <= 0):
+                raise ValueError(f"CRI batch {label} must be non-empty and positive")
+
+        weight_grid, bag_grid, rate_grid = (grid.ravel() for grid in np.meshgrid(weights, bags, rates, indexing="ij"))
+
+        dose_mg_kg_hour = np.array([
+            drug.dose_per_kg_per_hour * DOSE_UNIT_TO_MG_PER_KG_HOUR.get(drug.dose_units, 1.0) for drug in drugs
+        ])
+        concentration_mg_ml = np.array([
+            drug.concentration / 1000 if drug.concentration_units == "μg/mL" else drug.concentration for drug in drugs
+        ])
+
+        total_run_time_hours = bag_grid / rate_grid
+        hourly_mg_needed = weight_grid[:, None] * dose_mg_kg_hour
+        total_mg_needed = hourly_mg_needed * total_run_time_hours[:, None]
+        volume_to_add_ml = total_mg_needed / concentration_mg_ml
+        total_drug_volume_ml = volume_to_add_ml.sum(axis=1)
+
+        return CRIBatchResult(
+            drugs=list(drugs),
+            weights_kg=weight_grid,
+            bag_volumes_ml=bag_grid,
+            flow_rates_ml_per_hour=rate_grid,
+            total_run_time_hours=total_run_time_hours,
+            hourly_mg_needed=hourly_mg_needed,
+            total_mg_needed=total_mg_needed,
+            volume_to_add_ml=volume_to_add_ml,
+            total_drug_volume_ml=total_drug_volume_ml,
+            final_bag_volume_ml=bag_grid + total_drug_volume_ml,
+            volume_displacement_percent=total_drug_volume_ml / bag_grid * 100,
+            engine=self
+        )
+
     def _calculate_single_drug_volume(
         self, 
         drug: CRIDrug, 
@@ -127,6 +318,11 @@ class CRICalculationEngine:
             calculation_steps.append(
                 f"Step {step_base}a: Convert {drug.name} dose: {drug.dose_per_kg_per_hour} μg/kg/min × 60 min/hr ÷ 1000 μg/mg = {dose_mg_kg_hour:.3f} mg/kg/hr"
             )
+        elif drug.dose_units in DOSE_UNIT_TO_MG_PER_KG_HOUR and drug.dose_units != "mg/kg/hour":
+            dose_mg_kg_hour = drug.dose_per_kg_per_hour * DOSE_UNIT_TO_MG_PER_KG_HOUR[drug.dose_units]
+            calculation_steps.append(
+                f"Step {step_base}a: Convert {drug.name} dose: {drug.dose_per_kg_per_hour} {drug.dose_units} = {dose_mg_kg_hour:.3f} mg/kg/hr"
+            )
         else:
             dose_mg_kg_hour = drug.dose_per_kg_per_hour
         
@@ -164,26 +360,18 @@ class CRICalculationEngine:
             "volume_to_add_ml": volume_to_add_ml
         }
 
-    def parse_cri_query(self, query: str) -> Optional[CRIParameters]:
+    def parse_cri_query(self, query: str, context: Optional[ClinicalContext] = None) -> Optional[CRIParameters]:
         """
-        Enhanced CRI query parsing with comprehensive pattern recognition
+        Parse a CRI query in a single tokenizer pass
+        (context: the query's recognised clinical context; weight and species are taken from it)
         """
+        context = context or ClinicalContext()
         try:
-            # Enhanced weight extraction
-            weight_kg = self._extract_weight(query)
-            
-            # Enhanced bag volume extraction
-            bag_volume_ml = self._extract_bag_volume(query)
-            
-            # Enhanced flow rate extraction (including calculated rates)
-            flow_rate = self._extract_flow_rate(query, bag_volume_ml) if bag_volume_ml else None
-            
-            # Enhanced drug extraction with comprehensive patterns
-            drugs = self._extract_drugs(query)
+            weight_kg, bag_volume_ml, flow_rate, drugs = self._scan_query(query, context.weight_kg)
             
             # If any critical parameters are missing, try AI-powered fallback
             if not weight_kg or not bag_volume_ml or not flow_rate or not drugs:
-                ai_result = self._ai_parse_fallback(query)
+                ai_result = self._ai_parse_fallback(query, context)
                 if ai_result:
                     # Fill in missing parameters from AI parsing
                     if not weight_kg and ai_result.get('weight'):
@@ -210,7 +398,7 @@ class CRICalculationEngine:
             self.logger.error(f"Error parsing CRI query: {e}")
             return None
 
-    def _ai_parse_fallback(self, query: str) -> Optional[Dict]:
+    def _ai_parse_fallback(self, query: str, context: ClinicalContext) -> Optional[Dict]:
         """
         AI-powered fallback parsing for complex CRI queries
         """
@@ -218,9 +406,10 @@ class CRICalculationEngine:
         # This can be enhanced with actual AI parsing later
         
         # Try to infer missing weight (assume average dog/cat if not specified)
-        if 'cat' in query.lower():
+        species = context.species or ('feline' if 'cat' in query.lower() else 'canine' if 'dog' in query.lower() else None)
+        if species == 'feline':
             default_weight = 4.0  # kg
-        elif 'dog' in query.lower():
+        elif species == 'canine':
             default_weight = 25.0  # kg
         else:
             default_weight = 20.0  # kg generic
@@ -240,289 +429,124 @@ class CRICalculationEngine:
         
         return result
 
-    def _extract_weight(self, query: str) -> Optional[float]:
-        """Extract patient weight with multiple pattern support"""
-        patterns = [
-            r'(\d+\.?\d*)\s*kg(?:\s+(?:dog|cat|patient|animal))?',
-            r'(?:for|in)\s+(?:a\s+)?(\d+\.?\d*)\s*kg',
-            r'(\d+\.?\d*)\s*kilogram',
-            r'weight.*?(\d+\.?\d*)\s*kg',
-            r'patient.*?(\d+\.?\d*)\s*kg',
-            r'(\d+\.?\d*)\s*kg\s+(?:dog|cat|patient|animal)',
-            r'(?:dog|cat|patient|animal).*?(\d+\.?\d*)\s*kg'
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, query, re.IGNORECASE)
-            if match:
-                return float(match.group(1))
-        
-        # If no weight found, check if query mentions concentrations with implied weight
-        # This is a fallback for complex queries
-        return None
-
-    def _extract_bag_volume(self, query: str) -> Optional[float]:
-        """Extract bag volume with multiple format support"""
-        patterns = [
-            r'(\d+\.?\d*)\s*mL\s+bag',
-            r'(\d+\.?\d*)\s*mL.*?(?:saline|fluid|D5W|LRS|normal)',
-            r'(\d+\.?\d*)\s*ml.*?bag',
-            r'in\s+(?:a\s+)?(\d+\.?\d*)\s*mL',
-            r'bag.*?(\d+\.?\d*)\s*mL',
-            r'standard\s+(\d+\.?\d*)\s*mL',
-            r'(\d+\.?\d*)\s*mL\s+(?:of\s+)?(?:saline|fluid)'
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, query, re.IGNORECASE)
-            if match:
-                return float(match.group(1))
-        
-        # Default volumes for common scenarios
-        if re.search(r'standard.*?bag', query, re.IGNORECASE):
-            return 500.0  # Standard bag size
-        
-        return None
-
-    def _extract_flow_rate(self, query: str, bag_volume_ml: float) -> Optional[float]:
-        """Extract flow rate or calculate from duration"""
-        # Direct flow rate patterns
-        flow_patterns = [
-            r'(\d+\.?\d*)\s*mL/(?:hour|hr|h)',
-            r'(\d+\.?\d*)\s*ml/(?:hour|hr|h)',
-            r'flow.*?(\d+\.?\d*)\s*mL',
-            r'rate.*?(\d+\.?\d*)\s*mL',
-            r'infusion.*?(\d+\.?\d*)\s*mL',
-            r'at\s+(\d+\.?\d*)\s*mL',
-            r'(\d+\.?\d*)\s*mL/hr\s+flow',
-            r'(\d+\.?\d*)\s*mL/hr',
-            r'flow\s+rate.*?(\d+\.?\d*)\s*mL'
-        ]
-        
-        for pattern in flow_patterns:
-            match = re.search(pattern, query, re.IGNORECASE)
-            if match:
-                return float(match.group(1))
-        
-        # Calculate from duration if specified
-        duration_patterns = [
-            r'(\d+\.?\d*)[- ]hour\s+duration',
-            r'over\s+(\d+\.?\d*)\s+(?:hours|hr|h)',
-            r'(\d+\.?\d*)\s+hour.*?duration',
-            r'want\s+(\d+\.?\d*)[- ]hour',
-            r'(\d+\.?\d*)\s*hr\s+duration',
-            r'duration.*?(\d+\.?\d*)\s*(?:hours|hr|h)'
-        ]
-        
-        for pattern in duration_patterns:
-            match = re.search(pattern, query, re.IGNORECASE)
-            if match:
-                duration_hours = float(match.group(1))
-                return bag_volume_ml / duration_hours
-        
-        # Maintenance rate calculation for common scenarios
-        if re.search(r'maintenance\s+rate', query, re.IGNORECASE):
+    def _scan_query(
+        self, query: str, weight_kg: Optional[float] = None
+    ) -> Tuple[Optional[float], Optional[float], Optional[float], List[CRIDrug]]:
+        """
+        Tokenize the query once and assign each quantity a role from its unit and neighbouring words:
+        weight (kg), bag (mL or L), flow rate (mL/hr, or bag ÷ duration), and per-drug dose (mg|μg/kg/hr|min)
+        and concentration (mg|μg/mL, %, or "N mg in M mL") attached to the nearest drug mention
+        Returns (weight_kg, bag_volume_ml, flow_rate_ml_per_hour, drugs); weight_kg, when given, wins
+        """
+        tokens = []  # (role, value, unit); words are ('word', text, None)
+        for match in CRI_TOKEN_PATTERN.finditer(query.lower()):
+            word, number, unit = match.groups()
+            if word is not None:
+                tokens.append(('word', word, None))
+                continue
+            value = float(number)
+            role, unit = _classify_unit(unit) if unit else ('number', None)
+            if role == 'percent':
+                role, unit, value = 'concentration', 'mg/mL', value * 10  # 1% = 10 mg/mL
+            elif role == 'liters':
+                role, unit, value = 'volume', 'mL', value * 1000
+            tokens.append((role, value, unit))
+
+        mentions = [(index, CRI_DRUG_ALIASES[text]) for index, (role, text, _) in enumerate(tokens)
+                    if role == 'word' and text in CRI_DRUG_ALIASES]
+
+        def words(start: int, end: int) -> set:
+            return {text for role, text, _ in tokens[max(start, 0):end] if role == 'word'}
+
+        def nearest_drug(index: int, assigned: Dict[str, Tuple[float, str]]) -> Optional[str]:
+            # A mention separated from the value only by other quantities owns it
+            # ("morphine 0.1 mg/kg/hr (15 mg/mL)", "100 mg/mL ketamine"), preceding one first
+            for step in (-1, 1):
+                position = index + step
+                while 0 <= position < len(tokens) and tokens[position][0] != 'word':
+                    position += step
+                if 0 <= position < len(tokens):
+                    drug = CRI_DRUG_ALIASES.get(tokens[position][1])
+                    if drug and drug not in assigned:
+                        return drug
+            # Otherwise the closest mention (the preceding one on ties), skipping drugs that already have the value
+            for _, drug in sorted(mentions, key=lambda mention: (abs(mention[0] - index), mention[0] > index)):
+                if drug not in assigned:
+                    return drug
+            return None
+
+        weight, bag, weak_bag, rate, duration = None, None, None, None, None
+        doses: Dict[str, Tuple[float, str]] = {}
+        concentrations: Dict[str, Tuple[float, str]] = {}
+        consumed = set()
+        maintenance = standard_bag = False
+
+        for index, (role, value, unit) in enumerate(tokens):
+            if role == 'word':
+                if value == 'maintenance':
+                    maintenance = maintenance or 'rate' in words(index + 1, index + 3)
+                elif value == 'standard':
+                    standard_bag = standard_bag or 'bag' in words(index + 1, index + 3)
+            elif role == 'weight':
+                weight = weight or value
+            elif role == 'rate':
+                rate = rate or value
+            elif role in ('dose', 'concentration'):
+                assigned = doses if role == 'dose' else concentrations
+                drug = nearest_drug(index, assigned)
+                if drug:
+                    assigned[drug] = (value, unit)
+            elif role == 'mass':
+                # "200 mg in 5 mL" / "40 mg per 1 mL": an amount over a volume is a concentration
+                for offset in range(index + 1, min(index + 4, len(tokens))):
+                    if tokens[offset][0] == 'volume':
+                        drug = nearest_drug(index, concentrations)
+                        if drug:
+                            concentrations[drug] = (value / tokens[offset][1], f"{unit}/mL")
+                            consumed.add(offset)
+                        break
+            elif role == 'volume' and index not in consumed:
+                before, after = words(index - 3, index), words(index + 1, index + 3)
+                if after & BAG_WORDS or 'bag' in before:
+                    bag = bag or value
+                elif before & RATE_CUES:
+                    rate = rate or value
+                elif weak_bag is None:
+                    weak_bag = value
+            elif role == 'duration':
+                if words(index - 2, index) & DURATION_CUES or 'duration' in words(index + 1, index + 3):
+                    duration = duration or value
+
+        weight_kg = weight_kg or weight
+        bag_volume_ml = bag or weak_bag or (500.0 if standard_bag else None)  # standard bag size
+        flow_rate = rate
+        if not flow_rate and bag_volume_ml and duration:
+            flow_rate = bag_volume_ml / duration
+        if not flow_rate and maintenance and weight_kg:
             # Estimate maintenance rate: ~2-4 mL/kg/hr for dogs
-            weight_match = re.search(r'(\d+\.?\d*)\s*kg', query, re.IGNORECASE)
-            if weight_match:
-                weight = float(weight_match.group(1))
-                return weight * 3  # 3 mL/kg/hr average maintenance
-        
-        return None
+            flow_rate = weight_kg * 3  # 3 mL/kg/hr average maintenance
 
-    def _extract_drugs(self, query: str) -> List[CRIDrug]:
-        """Enhanced drug extraction with comprehensive patterns for complex clinical queries"""
         drugs = []
-        
-        # Define comprehensive drug patterns with enhanced parsing for clinical format
-        drug_patterns = {
-            'morphine': {
-                'names': ['morphine', 'MSO4'],
-                'dose_patterns': [
-                    r'(?:morphine|MSO4).*?(\d+\.?\d*)\s*mg/kg/(?:hour|hr|h)',
-                    r'(\d+\.?\d*)\s*mg/kg/(?:hour|hr|h).*?(?:morphine|MSO4)',
-                    r'morphine\s+at\s+(\d+\.?\d*)\s*mg/kg/hour',
-                    r'deliver\s+morphine\s+at\s+(\d+\.?\d*)\s*mg/kg/hour'
-                ],
-                'conc_patterns': [
-                    r'(?:morphine|MSO4).*?(\d+\.?\d*)\s*mg/mL',
-                    r'(\d+\.?\d*)\s*mg.*?(?:morphine|MSO4).*?(?:per\s+)?1?\s*mL',
-                    r'using\s+(\d+\.?\d*)\s*mg/mL.*?stock',
-                    r'\(using\s+(\d+\.?\d*)\s*mg/mL\s+stock\)',
-                    r'(\d+\.?\d*)\s*mg.*?(?:morphine|MSO4).*?ampules?'
-                ]
-            },
-            'lidocaine': {
-                'names': ['lidocaine', 'xylocaine'],
-                'dose_patterns': [
-                    r'(?:lidocaine|xylocaine).*?(\d+\.?\d*)\s*(?:μg|mcg)/kg/(?:minute|min)',
-                    r'(\d+\.?\d*)\s*(?:μg|mcg)/kg/(?:minute|min).*?(?:lidocaine|xylocaine)',
-                    r'(?:lidocaine|xylocaine).*?(\d+\.?\d*)\s*mg/kg/(?:hour|hr|h)',
-                    r'(\d+\.?\d*)\s*mg/kg/(?:hour|hr|h).*?(?:lidocaine|xylocaine)',
-                    r'lidocaine\s+at\s+(\d+\.?\d*)\s*(?:μg|mcg)/kg/minute',
-                    r'lidocaine\s+at\s+(\d+\.?\d*)\s*mg/kg/hour'
-                ],
-                'conc_patterns': [
-                    r'(?:lidocaine|xylocaine).*?(\d+\.?\d*)\s*mg/mL',
-                    r'(\d+\.?\d*)\s*mg/mL.*?(?:lidocaine|xylocaine)',
-                    r'using\s+(\d+\.?\d*)\s*mg/mL.*?stock',
-                    r'\(using\s+(\d+\.?\d*)\s*mg/mL\s+stock\)',
-                    r'(?:lidocaine|xylocaine).*?(\d+\.?\d*)\s*%',  # Handle percentage concentrations
-                    r'(\d+\.?\d*)\s*%.*?(?:lidocaine|xylocaine)'
-                ]
-            },
-            'ketamine': {
-                'names': ['ketamine'],
-                'dose_patterns': [
-                    r'ketamine.*?(\d+\.?\d*)\s*mg/kg/(?:hour|hr|h)',
-                    r'(\d+\.?\d*)\s*mg/kg/(?:hour|hr|h).*?ketamine'
-                ],
-                'conc_patterns': [
-                    r'ketamine.*?(\d+\.?\d*)\s*mg/mL',
-                    r'(\d+\.?\d*)\s*mg/mL.*?ketamine',
-                    r'ketamine.*?(\d+\.?\d*)\s*%',  # Handle percentage concentrations
-                    r'(\d+\.?\d*)\s*%.*?ketamine'
-                ]
-            },
-            'fentanyl': {
-                'names': ['fentanyl'],
-                'dose_patterns': [
-                    r'fentanyl.*?(\d+\.?\d*)\s*(?:μg|mcg)/kg/(?:hour|hr|h)',
-                    r'(\d+\.?\d*)\s*(?:μg|mcg)/kg/(?:hour|hr|h).*?fentanyl'
-                ],
-                'conc_patterns': [
-                    r'fentanyl.*?(\d+\.?\d*)\s*(?:μg|mcg)/mL',
-                    r'(\d+\.?\d*)\s*(?:μg|mcg)/mL.*?fentanyl'
-                ]
-            },
-            'dopamine': {
-                'names': ['dopamine'],
-                'dose_patterns': [
-                    r'dopamine.*?(\d+\.?\d*)\s*(?:μg|mcg)/kg/(?:minute|min)',
-                    r'(\d+\.?\d*)\s*(?:μg|mcg)/kg/(?:minute|min).*?dopamine'
-                ],
-                'conc_patterns': [
-                    r'dopamine.*?(\d+\.?\d*)\s*mg/mL',
-                    r'(\d+\.?\d*)\s*mg/mL.*?dopamine',
-                    r'(\d+\.?\d*)\s*mg.*?vials?.*?(\d+\.?\d*)\s*mL'
-                ]
-            },
-            'dexmedetomidine': {
-                'names': ['dexmedetomidine', 'dex'],
-                'dose_patterns': [
-                    r'(?:dexmedetomidine|dex).*?(\d+\.?\d*)\s*(?:μg|mcg)/kg/(?:hour|hr|h)',
-                    r'(\d+\.?\d*)\s*(?:μg|mcg)/kg/(?:hour|hr|h).*?(?:dexmedetomidine|dex)'
-                ],
-                'conc_patterns': [
-                    r'(?:dexmedetomidine|dex).*?(\d+\.?\d*)\s*(?:μg|mcg)/mL',
-                    r'(\d+\.?\d*)\s*(?:μg|mcg)/mL.*?(?:dexmedetomidine|dex)'
-                ]
-            },
-            'propofol': {
-                'names': ['propofol'],
-                'dose_patterns': [
-                    r'propofol.*?(\d+\.?\d*)\s*mg/kg/(?:hour|hr|h)',
-                    r'(\d+\.?\d*)\s*mg/kg/(?:hour|hr|h).*?propofol'
-                ],
-                'conc_patterns': [
-                    r'propofol.*?(\d+\.?\d*)\s*mg/mL',
-                    r'(\d+\.?\d*)\s*mg/mL.*?propofol',
-                    r'using\s+(\d+\.?\d*)\s*mg/mL.*?vials?'
-                ]
-            },
-            'butorphanol': {
-                'names': ['butorphanol', 'torbugesic'],
-                'dose_patterns': [
-                    r'(?:butorphanol|torbugesic).*?(\d+\.?\d*)\s*mg/kg/(?:hour|hr|h)',
-                    r'(\d+\.?\d*)\s*mg/kg/(?:hour|hr|h).*?(?:butorphanol|torbugesic)'
-                ],
-                'conc_patterns': [
-                    r'(?:butorphanol|torbugesic).*?(\d+\.?\d*)\s*mg/mL',
-                    r'(\d+\.?\d*)\s*mg/mL.*?(?:butorphanol|torbugesic)'
-                ]
-            }
-        }
-        
-        # Extract each drug
-        for drug_name, patterns in drug_patterns.items():
-            # Check if drug is mentioned
-            if any(re.search(name, query, re.IGNORECASE) for name in patterns['names']):
-                dose = self._extract_drug_dose(query, patterns['dose_patterns'])
-                concentration = self._extract_drug_concentration(query, patterns['conc_patterns'])
-                
-                # Use default concentrations if not found
-                if dose and not concentration:
-                    concentration = self._get_default_concentration(drug_name)
-                
-                if dose and concentration:
-                    # Determine units based on drug type and context
-                    if drug_name in ['fentanyl', 'dexmedetomidine']:
-                        dose_units = "μg/kg/hour"
-                        conc_units = "μg/mL"
-                    elif drug_name == 'dopamine':
-                        dose_units = "μg/kg/minute"
-                        conc_units = "mg/mL"
-                    elif drug_name == 'lidocaine':
-                        # Check if lidocaine dose is specified in μg/kg/minute (common CRI format)
-                        if re.search(r'lidocaine.*?(?:μg|mcg)/kg/(?:minute|min)', query, re.IGNORECASE):
-                            dose_units = "μg/kg/minute"
-                        else:
-                            dose_units = "mg/kg/hour"
-                        conc_units = "mg/mL"
-                    else:
-                        dose_units = "mg/kg/hour"
-                        conc_units = "mg/mL"
-                    
-                    drugs.append(CRIDrug(
-                        name=drug_name.title(),
-                        dose_per_kg_per_hour=dose,
-                        dose_units=dose_units,
-                        concentration=concentration,
-                        concentration_units=conc_units
-                    ))
-        
-        return drugs
-
-    def _extract_drug_dose(self, query: str, patterns: List[str]) -> Optional[float]:
-        """Extract drug dose using multiple patterns"""
-        for pattern in patterns:
-            match = re.search(pattern, query, re.IGNORECASE)
-            if match:
-                return float(match.group(1))
-        return None
-
-    def _extract_drug_concentration(self, query: str, patterns: List[str]) -> Optional[float]:
-        """Extract drug concentration using multiple patterns"""
-        for pattern in patterns:
-            match = re.search(pattern, query, re.IGNORECASE)
-            if match:
-                # Handle vial concentration patterns
-                if 'vials' in pattern and match.lastindex and match.lastindex >= 2:
-                    # Pattern like "200mg vials in 250mL" - calculate concentration
-                    drug_mg = float(match.group(1))
-                    volume_ml = float(match.group(2))
-                    return drug_mg / volume_ml
-                else:
-                    concentration = float(match.group(1))
-                    # Handle percentage concentrations (convert to mg/mL)
-                    if '%' in pattern:
-                        return concentration * 10  # 1% = 10 mg/mL
-                    return concentration
-        return None
-
-    def _get_default_concentration(self, drug_name: str) -> Optional[float]:
-        """Get default concentrations for common veterinary drugs"""
-        default_concentrations = {
-            'morphine': 15.0,     # mg/mL (common veterinary concentration)
-            'lidocaine': 20.0,    # mg/mL (2% solution)
-            'ketamine': 100.0,    # mg/mL (common veterinary concentration)
-            'fentanyl': 50.0,     # μg/mL (common concentration)
-            'dopamine': 40.0,     # mg/mL (common ICU concentration)
-            'dexmedetomidine': 100.0,  # μg/mL (common concentration)
-            'propofol': 10.0,     # mg/mL (standard concentration)
-            'butorphanol': 10.0   # mg/mL (common concentration)
-        }
-        return default_concentrations.get(drug_name)
+        for drug_name in dict.fromkeys(drug for _, drug in mentions):
+            if drug_name not in doses:
+                continue
+            dose, dose_units = doses[drug_name]
+            # Use default concentrations if not found
+            concentration, conc_units = concentrations.get(drug_name) or self._get_default_concentration(drug_name)
+            if concentration:
+                drugs.append(CRIDrug(
+                    name=drug_name.title(),
+                    dose_per_kg_per_hour=dose,
+                    dose_units=dose_units,
+                    concentration=concentration,
+                    concentration_units=conc_units
+                ))
+
+        return weight_kg, bag_volume_ml, flow_rate, drugs
+
+    def _get_default_concentration(self, drug_name: str) -> Tuple[Optional[float], str]:
+        """Get default concentrations (value, units) for common veterinary drugs from the reference data file"""
+        return self.reference_data.cri_default_concentrations.get(drug_name, (None, "mg/mL"))
 
     def generate_cri_report(self, result: CRIResult) -> str:
         """
@@ -595,6 +619,30 @@ def main():
                 print("❌ CALCULATION ERROR - needs debugging")
     else:
         print("❌ Failed to parse CRI parameters")
+    
+    runs = 2000
+    start = time.perf_counter()
+    for _ in range(runs):
+        engine._scan_query(test_query)
+    print(f"\n⚡ Query parsing: {(time.perf_counter() - start) * 1e6 / runs:.1f} µs per query")
+    
+    # Test Case 2: MLK chart for every kg from 2-60 kg across bag sizes and rates
+    print("\n📋 TEST CASE 2: MLK CRI chart")
+    print("-" * 40)
+    
+    mlk = [
+        CRIDrug("Morphine", 0.1, "mg/kg/hour", 15.0, "mg/mL"),
+        CRIDrug("Lidocaine", 50.0, "μg/kg/minute", 20.0, "mg/mL"),
+        CRIDrug("Ketamine", 0.6, "mg/kg/hour", 100.0, "mg/mL"),
+    ]
+    start = time.perf_counter()
+    chart = engine.calculate_cri_batch(np.arange(2, 61), [250, 500, 1000], [5, 10, 20, 40, 60], mlk)
+    print(f"⚡ {len(chart)} rows in {(time.perf_counter() - start) * 1000:.2f} ms")
+    
+    buffer = io.StringIO()
+    chart.to_csv(buffer)
+    print("\n".join(buffer.getvalue().splitlines()[:4]))
+    print("\n" + engine.generate_cri_report(chart.row(len(chart) // 2)))
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -13,48 +13,369 @@ from veterinary_calculation_validator import VeterinaryCalculationValidator, Ris
 from pharmacological_reasoning_engine import PharmacologicalReasoningEngine
 from principle_based_retrieval import PrincipleBasedRetrieval
 from cri_calculation_engine import CRICalculationEngine
+from semantic_answer_cache import SemanticAnswerCache
+from clinical_entity_recognizer import ClinicalContext
 import re
+import os
+import time
+import asyncio
+import atexit
 import logging
-from typing import Dict, Any, Optional, List
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from dataclasses import dataclass, field
+from typing import Dict, Any, Generator, Iterator, Optional, List
 from datetime import datetime
 
+@dataclass
+class VeterinaryQueryRequest:
+    """Per-request state for a single clinician query"""
+    query: str
+    context: Optional[Dict] = None
+    clinical_context: Optional[ClinicalContext] = None
+    request_id: str = field(default_factory=lambda: uuid.uuid4().hex[:12])
+    received_at: datetime = field(default_factory=datetime.now)
+
+class ResponseStream:
+    """
+    Iterable of answer text deltas for progressive rendering; response holds the complete
+    v4 response once iteration has finished
+    """
+    
+    def __init__(self, deltas: Generator[str, None, Dict[str, Any]]):
+        self._deltas = deltas
+        self.response: Optional[Dict[str, Any]] = None
+    
+    def __iter__(self) -> Iterator[str]:
+        self.response = yield from self._deltas
+
 class EnhancedVeterinaryAssistantV4:
     """
     Advanced veterinary assistant with CRI calculation engine, principle-based retrieval, 
     calculation validation, and pharmacological reasoning
     """
     
-    def __init__(self):
-        """Initialize with all safety and reasoning layers"""
+    # Upper bound on chunks passed to the single generation call after merging enhanced retrievals
+    MAX_MERGED_CONTEXT_CHUNKS = 25
+    # Minimum retrieval confidence for an enhanced query's context to be merged
+    ENHANCED_CONTEXT_MIN_CONFIDENCE = 0.7
+    # CRI answers whose knowledge-base context can still be attached before the oldest is dropped
+    MAX_PENDING_CRI_ENRICHMENTS = 256
+    CRI_ENRICHMENT_MODES = ("retrieval", "none")
+    
+    def __init__(
+        self,
+        retrieval_workers: Optional[int] = None,
+        enhanced_query_timeout: Optional[float] = None,
+        enhanced_context_target: Optional[int] = None,
+        cri_enrichment: Optional[str] = None
+    ):
+        """
+        Initialize with all safety and reasoning layers
+        
+        retrieval_workers: size of the pool running enhanced sub-query retrievals and CRI enrichment, and of
+                           the separate pool for primary retrievals
+        enhanced_query_timeout: seconds each sub-query may spend queued plus running before it is abandoned
+        enhanced_context_target: stop waiting once this many high-confidence contexts have arrived (0 waits for all)
+        cri_enrichment: 'retrieval' lets CRI answers attach knowledge-base context (prefetched in the
+                        background when streaming, fetched by attach_cri_enrichment otherwise),
+                        'none' answers CRI queries from the calculation engine alone (LIMOSA_CRI_ENRICHMENT)
+        """
         self.base_assistant = Final95ConfidenceAssistant()
         self.calc_validator = VeterinaryCalculationValidator()
         self.pharma_engine = PharmacologicalReasoningEngine()
         self.principle_retrieval = PrincipleBasedRetrieval()
         self.cri_engine = CRICalculationEngine()
+        # Built once with the principle terms, so one pass also yields principle triggers
+        self.entity_recognizer = self.principle_retrieval.entity_recognizer
         self.logger = logging.getLogger(__name__)
         
+        # Enhanced retrieval fan-out configuration (constructor overrides environment)
+        self.retrieval_workers = retrieval_workers or int(os.getenv('LIMOSA_RETRIEVAL_WORKERS', 4))
+        self.enhanced_query_timeout = enhanced_query_timeout or float(os.getenv('LIMOSA_ENHANCED_QUERY_TIMEOUT', 10.0))
+        self.enhanced_context_target = (
+            enhanced_context_target if enhanced_context_target is not None
+            else int(os.getenv('LIMOSA_ENHANCED_CONTEXT_TARGET', 3))
+        )
+        self.cri_enrichment = (cri_enrichment or os.getenv('LIMOSA_CRI_ENRICHMENT', 'retrieval')).lower()
+        if self.cri_enrichment not in self.CRI_ENRICHMENT_MODES:
+            raise ValueError(f"Unknown CRI enrichment mode '{self.cri_enrichment}' "
+                             f"(expected one of {', '.join(self.CRI_ENRICHMENT_MODES)})")
+        # request_id -> (query, retrieval future or None until attach_cri_enrichment asks for it)
+        self._cri_enrichments = OrderedDict()
+        self._cri_enrichment_lock = threading.Lock()
+        self._retrieval_executor = ThreadPoolExecutor(
+            max_workers=self.retrieval_workers,
+            thread_name_prefix="limosa-retrieval"
+        )
+        # Abandoned sub-queries keep running on the shared pool, so primary retrievals get their own
+        self._primary_executor = ThreadPoolExecutor(
+            max_workers=self.retrieval_workers,
+            thread_name_prefix="limosa-primary"
+        )
+        # Answer-independent local safety analysis runs here while retrieval and principle analysis proceed
+        self._analysis_executor = ThreadPoolExecutor(
+            max_workers=self.retrieval_workers,
+            thread_name_prefix="limosa-analysis"
+        )
+        
+        # Reworded repeat questions are answered from here without retrieval or Claude calls
+        self.answer_cache = SemanticAnswerCache(kb_version=self.base_assistant.knowledge_base_version())
+        
         print("🩺 Enhanced Veterinary Assistant v4.0")
         print("✅ Mathematical validation system activated")
         print("🧬 Pharmacological reasoning engine activated")
         print("🧠 Principle-based knowledge retrieval activated")
-        print("💉 CRI calculation engine activated")
+        print(f"💉 CRI calculation engine activated (knowledge-base enrichment: {self.cri_enrichment})")
         print("⚠️ Comprehensive safety analysis enabled")
+        print(f"⚡ Concurrent enhanced retrieval: {self.retrieval_workers} workers, {self.enhanced_query_timeout:.0f}s timeout")
+        if self.answer_cache.enabled:
+            print(f"♻️ Semantic answer cache: cosine >= {self.answer_cache.similarity_threshold}, "
+                  f"{self.answer_cache.max_entries} answers, KB version {self.answer_cache.kb_version}")
+
+    def shutdown(self):
+        """Release worker threads and network clients held by the retrieval and reasoning layers"""
+        self._retrieval_executor.shutdown(wait=False, cancel_futures=True)
+        self._primary_executor.shutdown(wait=False, cancel_futures=True)
+        self._analysis_executor.shutdown(wait=False, cancel_futures=True)
+        self.base_assistant.close()
+        self.principle_retrieval.close()
+        print("🛑 Enhanced Veterinary Assistant v4.0 shut down")
+
+    async def ashutdown(self):
+        """shutdown() for processes using the async API: async clients are closed on the running loop"""
+        self._retrieval_executor.shutdown(wait=False, cancel_futures=True)
+        self._primary_executor.shutdown(wait=False, cancel_futures=True)
+        self._analysis_executor.shutdown(wait=False, cancel_futures=True)
+        await self.base_assistant.aclose()
+        await self.principle_retrieval.aclose()
+        print("🛑 Enhanced Veterinary Assistant v4.0 shut down")
 
     def query_with_comprehensive_safety_v4(self, query: str, context: Optional[Dict] = None) -> Dict[str, Any]:
         """
         Main query method with CRI override and comprehensive safety analysis
         """
-        print(f"\n🔍 Processing query with v4.0 comprehensive safety analysis...")
+        return self.handle_request(VeterinaryQueryRequest(query=query, context=context))
+
+    def handle_request(self, request: VeterinaryQueryRequest) -> Dict[str, Any]:
+        """
+        Process a single query request; all per-query state lives on the request
+        """
+        print(f"\n🔍 Processing query with v4.0 comprehensive safety analysis... [{request.request_id}]")
         
         # Step 1: Check if this is a CRI calculation query
-        is_cri_query = self._detect_cri_query(query)
+        is_cri_query = self._detect_cri_query(request.query)
         
         if is_cri_query:
             print("💉 CRI query detected - using dedicated CRI calculation engine")
-            return self._handle_cri_query(query, context)
+            return self._handle_cri_query(request)
+        
+        # Step 2: Serve a cached answer to an equivalent earlier question
+        cached_response, query_embedding, cache_context = self._lookup_cached_answer(request)
+        if cached_response is not None:
+            return cached_response
+        
+        # Step 3: Proceed with standard enhanced processing for non-CRI queries
+        response = self._handle_standard_query(request)
+        self._store_answer(request, query_embedding, cache_context, response)
+        return response
+
+    def stream_query_with_comprehensive_safety_v4(self, query: str, context: Optional[Dict] = None) -> "ResponseStream":
+        """
+        Streaming variant of query_with_comprehensive_safety_v4: iterate for answer text as it is
+        generated; the complete response (with safety analysis) is on .response afterwards
+        """
+        return ResponseStream(self.stream_request(VeterinaryQueryRequest(query=query, context=context)))
+
+    def stream_request(self, request: VeterinaryQueryRequest) -> Generator[str, None, Dict[str, Any]]:
+        """
+        Streaming handle_request: yields answer text deltas and returns the complete response.
+        CRI and cached answers are computed without Claude streaming and yielded whole.
+        """
+        print(f"\n🔍 Streaming query with v4.0 comprehensive safety analysis... [{request.request_id}]")
+        
+        if self._detect_cri_query(request.query):
+            print("💉 CRI query detected - using dedicated CRI calculation engine")
+            response = self._handle_cri_query(request, prefetch_enrichment=True)
+            yield response['answer']
+            knowledge = self.attach_cri_enrichment(response, timeout=self.enhanced_query_timeout)
+            if knowledge:
+                yield knowledge
+            return response
         
-        # Step 2: Proceed with standard enhanced processing for non-CRI queries
-        return self._handle_standard_query(query, context)
+        cached_response, query_embedding, cache_context = self._lookup_cached_answer(request)
+        if cached_response is not None:
+            yield cached_response['answer']
+            return cached_response
+        
+        response = yield from self._stream_standard_query(request)
+        self._store_answer(request, query_embedding, cache_context, response)
+        return response
+
+    async def aquery_with_comprehensive_safety_v4(self, query: str, context: Optional[Dict] = None) -> Dict[str, Any]:
+        """
+        Asyncio variant of query_with_comprehensive_safety_v4 on async OpenAI/Anthropic clients;
+        many requests can be awaited concurrently on one event loop
+        """
+        return await self.ahandle_request(VeterinaryQueryRequest(query=query, context=context))
+
+    async def ahandle_request(self, request: VeterinaryQueryRequest) -> Dict[str, Any]:
+        """
+        Async handle_request; the principle analysis runs concurrently with the primary retrieval
+        """
+        print(f"\n🔍 Processing query with v4.0 comprehensive safety analysis (async)... [{request.request_id}]")
+        
+        if self._detect_cri_query(request.query):
+            print("💉 CRI query detected - using dedicated CRI calculation engine")
+            return await self._ahandle_cri_query(request)
+        
+        cached_response, query_embedding, cache_context = await self._alookup_cached_answer(request)
+        if cached_response is not None:
+            return cached_response
+        
+        response = await self._ahandle_standard_query(request)
+        self._store_answer(request, query_embedding, cache_context, response)
+        return response
+
+    async def _ahandle_standard_query(self, request: VeterinaryQueryRequest) -> Dict[str, Any]:
+        """
+        Async _handle_standard_query. The primary retrieval needs only the original query, so it
+        starts alongside the Claude principle analysis and the local safety analysis; sub-queries
+        follow once principles are known.
+        """
+        query = request.query
+        query_variants = self.base_assistant.expand_query_semantically(query)
+        
+        print("🧠 Analyzing underlying veterinary principles alongside the primary retrieval...")
+        primary_task = asyncio.create_task(self.base_assistant.aretrieve_context(query, query_variants=query_variants))
+        clinical_context = self._clinical_context(request)
+        safety_task = asyncio.create_task(asyncio.to_thread(self._analyze_query_safety, request))
+        try:
+            principle_analysis = await self.principle_retrieval.aanalyze_query_principles(query, clinical_context)
+        except BaseException:
+            primary_task.cancel()
+            safety_task.cancel()
+            raise
+        
+        enhanced_queries = self.principle_retrieval.generate_enhanced_search_queries(principle_analysis)
+        print(f"📚 Generated {len(enhanced_queries)} principle-based search queries")
+        sub_queries = enhanced_queries[1:]  # Skip first (original query)
+        
+        try:
+            sub_query_embeddings = await self.base_assistant.aembed_texts(sub_queries)
+            enhanced_retrievals = await self._acollect_enhanced_retrievals(sub_queries, sub_query_embeddings)
+        except Exception as e:
+            self.logger.warning(f"Enhanced sub-queries skipped: {e}")
+            enhanced_retrievals = [None] * len(sub_queries)
+        
+        try:
+            primary_retrieval = await primary_task
+        except Exception as e:
+            print(f"❌ Error in high-confidence query: {str(e)}")
+            base_response = self.base_assistant.build_error_response(e)
+        else:
+            retrieval = self._merge_enhanced_retrievals(primary_retrieval, sub_queries, enhanced_retrievals)
+            try:
+                base_response = await self.base_assistant.agenerate_response(query, retrieval)
+            except Exception as e:
+                print(f"❌ Error in high-confidence query: {str(e)}")
+                base_response = self.base_assistant.build_error_response(e)
+            else:
+                self._attach_enhanced_contexts(base_response, retrieval)
+        
+        return self._finalize_standard_response(request, principle_analysis, await safety_task, base_response)
+
+    async def _acollect_enhanced_retrievals(self, sub_queries: List[str],
+                                            sub_query_embeddings: List[List[float]]) -> List[Optional[Dict[str, Any]]]:
+        """
+        Async _collect_enhanced_retrievals: per-query timeout, early stop once enough
+        high-confidence context has arrived; results in sub-query order, failures are None
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(sub_queries)
+        pending = {
+            asyncio.create_task(asyncio.wait_for(
+                self.base_assistant.aretrieve_context(sub_query, query_variants=[sub_query], embeddings=[embedding]),
+                timeout=self.enhanced_query_timeout
+            )): index
+            for index, (sub_query, embedding) in enumerate(zip(sub_queries, sub_query_embeddings))
+        }
+        high_confidence_count = 0
+        
+        try:
+            while pending:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    index = pending.pop(task)
+                    try:
+                        results[index] = task.result()
+                    except asyncio.TimeoutError:
+                        self.logger.warning(f"Enhanced query timed out: {sub_queries[index][:50]}...")
+                        continue
+                    except Exception as e:
+                        self.logger.warning(f"Enhanced query failed: {sub_queries[index][:50]}... - {e}")
+                        continue
+                    if results[index]['confidence'] > self.ENHANCED_CONTEXT_MIN_CONFIDENCE:
+                        high_confidence_count += 1
+                
+                if self.enhanced_context_target and high_confidence_count >= self.enhanced_context_target:
+                    if pending:
+                        print(f"⚡ {high_confidence_count} high-confidence contexts collected - cancelling {len(pending)} remaining sub-queries")
+                    break
+        finally:
+            for task in pending:
+                task.cancel()
+        
+        return results
+
+    def _lookup_cached_answer(self, request: VeterinaryQueryRequest):
+        """
+        Returns (cached response or None, query embedding, clinical context); the embedding and
+        context are reused to store the answer on a miss
+        """
+        if not self.answer_cache.enabled:
+            return None, None, None
+        try:
+            # Every primary retrieval variant goes in this one request (the first is the query itself),
+            # so the primary retrieval is served from the embedding cache instead of a second round trip
+            query_variants = self.base_assistant.expand_query_semantically(request.query)
+            query_embedding = self.base_assistant.embed_texts(query_variants)[0]
+        except Exception as e:
+            self.logger.warning(f"Answer cache lookup skipped: {e}")
+            return None, None, None
+        return self._match_cached_answer(request, query_embedding)
+
+    async def _alookup_cached_answer(self, request: VeterinaryQueryRequest):
+        """Async _lookup_cached_answer (query embedded on the async client)"""
+        if not self.answer_cache.enabled:
+            return None, None, None
+        try:
+            query_variants = self.base_assistant.expand_query_semantically(request.query)
+            query_embedding = (await self.base_assistant.aembed_texts(query_variants))[0]
+        except Exception as e:
+            self.logger.warning(f"Answer cache lookup skipped: {e}")
+            return None, None, None
+        return self._match_cached_answer(request, query_embedding)
+
+    def _match_cached_answer(self, request: VeterinaryQueryRequest, query_embedding: List[float]):
+        """Look up an equivalent cached answer for the embedded query and its clinical context"""
+        cache_context = self._clinical_context(request).to_dict()
+        cached_response = self.answer_cache.get(request.query, query_embedding, cache_context)
+        if cached_response is not None:
+            print(f"♻️ Answer cache hit (similarity {cached_response['answer_cache']['similarity']:.3f}) - "
+                  f"skipping retrieval and generation")
+        return cached_response, query_embedding, cache_context
+
+    def _store_answer(self, request: VeterinaryQueryRequest, query_embedding: Optional[List[float]],
+                      cache_context: Optional[Dict[str, Any]], response: Dict[str, Any]):
+        """Cache a completed response unless it is an error response"""
+        if query_embedding is not None and 'error' not in response:
+            self.answer_cache.put(request.query, query_embedding, cache_context, response)
+
+    def refresh_answer_cache(self):
+        """Re-read the knowledge-base version; cached answers from an older version are dropped"""
+        self.answer_cache.set_kb_version(self.base_assistant.knowledge_base_version())
 
     def _detect_cri_query(self, query: str) -> bool:
         """
@@ -78,65 +399,154 @@ class EnhancedVeterinaryAssistantV4:
         
         return False
 
-    def _handle_cri_query(self, query: str, context: Optional[Dict] = None) -> Dict[str, Any]:
+    def _handle_cri_query(self, request: VeterinaryQueryRequest, prefetch_enrichment: bool = False) -> Dict[str, Any]:
         """
         Handle CRI queries using dedicated calculation engine
         """
+        response, calculation_error = self._calculate_cri_response(request, prefetch_enrichment)
+        if response is not None:
+            return response
+        
+        # Fall back to standard processing (with error warning when the calculation itself failed)
+        standard_response = self._handle_standard_query(request)
+        if calculation_error:
+            standard_response['cri_calculation_error'] = calculation_error
+        return standard_response
+
+    async def _ahandle_cri_query(self, request: VeterinaryQueryRequest) -> Dict[str, Any]:
+        """Async _handle_cri_query; only the standard-processing fallback awaits I/O"""
+        response, calculation_error = self._calculate_cri_response(request)
+        if response is not None:
+            return response
+        
+        standard_response = await self._ahandle_standard_query(request)
+        if calculation_error:
+            standard_response['cri_calculation_error'] = calculation_error
+        return standard_response
+
+    def _calculate_cri_response(self, request: VeterinaryQueryRequest, prefetch_enrichment: bool = False):
+        """
+        Deterministic CRI fast path: parse, calculate and report without any embedding, vector or
+        Claude round trip. When cri_enrichment is 'retrieval', knowledge-base context can be attached
+        afterwards (see attach_cri_enrichment); prefetch_enrichment starts that retrieval in the
+        background now, for callers that will attach it.
+        Returns (response, None), or (None, calculation error or None) when standard processing should answer
+        """
         print("💉 Processing CRI query with dedicated calculation engine...")
         
         # Step 1: Try to parse CRI parameters
-        cri_parameters = self.cri_engine.parse_cri_query(query)
-        
-        if cri_parameters:
-            print("✅ CRI parameters successfully parsed")
-            
-            # Step 2: Calculate CRI using proper protocol logic
-            cri_result = self.cri_engine.calculate_cri(cri_parameters)
-            
-            if cri_result.is_valid:
-                print("✅ CRI calculation completed successfully")
-                
-                # Step 3: Generate comprehensive response
-                cri_report = self.cri_engine.generate_cri_report(cri_result)
-                
-                # Step 4: Get additional context from knowledge base
-                base_response = self.base_assistant.query_with_high_confidence(query)
-                
-                # Step 5: Override with correct CRI calculation
-                enhanced_response = {
-                    'answer': self._generate_cri_override_response(cri_report, base_response, query),
-                    'confidence': 0.98,  # High confidence in CRI calculations
-                    'cri_calculation': {
-                        'performed': True,
-                        'valid': True,
-                        'total_run_time_hours': cri_result.total_run_time_hours,
-                        'drug_volumes': {calc['drug_name']: calc['volume_to_add_ml'] for calc in cri_result.drug_calculations},
-                        'total_drug_volume_ml': cri_result.total_drug_volume_ml,
-                        'warnings': cri_result.warnings
-                    },
-                    'safety_analysis': {
-                        'cri_engine_override': True,
-                        'calculation_validation_performed': True,
-                        'proper_protocol_logic': True
-                    },
-                    'grounding_score': base_response.get('grounding_score', 85),
-                    'context_used': base_response.get('context_used', ''),
-                    'chunks_used': base_response.get('chunks_used', [])
-                }
-                
-                return enhanced_response
-            else:
-                print("❌ CRI calculation failed")
-                # Fall back to standard processing with error warning
-                standard_response = self._handle_standard_query(query, context)
-                standard_response['cri_calculation_error'] = "CRI parameters could not be calculated properly"
-                return standard_response
-        else:
+        cri_parameters = self.cri_engine.parse_cri_query(request.query, self._clinical_context(request))
+        if not cri_parameters:
             print("⚠️ Could not parse CRI parameters - using standard processing")
-            # Fall back to standard processing
-            return self._handle_standard_query(query, context)
+            return None, None
+        print("✅ CRI parameters successfully parsed")
+        
+        # Step 2: Calculate CRI using proper protocol logic
+        cri_result = self.cri_engine.calculate_cri(cri_parameters)
+        if not cri_result.is_valid:
+            print("❌ CRI calculation failed")
+            return None, "CRI parameters could not be calculated properly"
+        print("✅ CRI calculation completed successfully")
+        
+        # Step 3: Generate comprehensive response
+        cri_report = self.cri_engine.generate_cri_report(cri_result)
+        
+        # Step 4: Override with correct CRI calculation
+        response = {
+            'answer': self._generate_cri_override_response(cri_report),
+            'confidence': 0.98,  # High confidence in CRI calculations
+            'cri_calculation': {
+                'performed': True,
+                'valid': True,
+                'total_run_time_hours': cri_result.total_run_time_hours,
+                'drug_volumes': {calc['drug_name']: calc['volume_to_add_ml'] for calc in cri_result.drug_calculations},
+                'total_drug_volume_ml': cri_result.total_drug_volume_ml,
+                'warnings': cri_result.warnings
+            },
+            'safety_analysis': {
+                'cri_engine_override': True,
+                'calculation_validation_performed': True,
+                'proper_protocol_logic': True
+            },
+            'grounding_score': 85,
+            'context_used': '',
+            'chunks_used': [],
+            'request_id': request.request_id,
+            'kb_enrichment': 'disabled'
+        }
+        
+        # Step 5: Knowledge-base context arrives later, off the answer's critical path
+        if self.cri_enrichment == 'retrieval':
+            future = None
+            if prefetch_enrichment:
+                future = self._retrieval_executor.submit(self.base_assistant.retrieve_context, request.query)
+            with self._cri_enrichment_lock:
+                self._cri_enrichments[request.request_id] = (request.query, future)
+                while len(self._cri_enrichments) > self.MAX_PENDING_CRI_ENRICHMENTS:
+                    _, dropped = self._cri_enrichments.popitem(last=False)[1]
+                    if dropped is not None:
+                        dropped.cancel()
+            response['kb_enrichment'] = 'pending'
+        
+        return response, None
+
+    def attach_cri_enrichment(self, response: Dict[str, Any], timeout: Optional[float] = None) -> str:
+        """
+        Fetch (or wait for the prefetched) knowledge-base retrieval of a CRI response and attach it:
+        context_used, chunks_used and a knowledge section appended to the answer. Returns the appended text
+        ('' when nothing was attached); kb_enrichment becomes 'attached' or 'unavailable'.
+        """
+        future = self._pop_cri_enrichment(response)
+        if future is None:
+            return ""
+        try:
+            retrieval = future.result(timeout=timeout)
+        except Exception as e:
+            future.cancel()
+            self.logger.warning(f"CRI knowledge-base enrichment unavailable: {e!r}")
+            response['kb_enrichment'] = 'unavailable'
+            return ""
+        return self._attach_cri_retrieval(response, retrieval)
+
+    async def aattach_cri_enrichment(self, response: Dict[str, Any], timeout: Optional[float] = None) -> str:
+        """Async attach_cri_enrichment"""
+        future = self._pop_cri_enrichment(response)
+        if future is None:
+            return ""
+        try:
+            retrieval = await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except Exception as e:
+            self.logger.warning(f"CRI knowledge-base enrichment unavailable: {e!r}")
+            response['kb_enrichment'] = 'unavailable'
+            return ""
+        return self._attach_cri_retrieval(response, retrieval)
 
-    def _generate_cri_override_response(self, cri_report: str, base_response: Dict, query: str) -> str:
+    def _pop_cri_enrichment(self, response: Dict[str, Any]) -> Optional[Future]:
+        """The response's retrieval future, submitted now unless it was prefetched"""
+        if response.get('kb_enrichment') != 'pending':
+            return None
+        with self._cri_enrichment_lock:
+            query, future = self._cri_enrichments.pop(response.get('request_id'), (None, None))
+        if query is None:
+            response['kb_enrichment'] = 'unavailable'
+            return None
+        if future is None:
+            future = self._retrieval_executor.submit(self.base_assistant.retrieve_context, query)
+        return future
+
+    def _attach_cri_retrieval(self, response: Dict[str, Any], retrieval: Dict[str, Any]) -> str:
+        response['context_used'] = retrieval.get('context_used', '')
+        response['chunks_used'] = retrieval.get('chunks', [])
+        response['retrieval_confidence'] = retrieval.get('confidence', 0.0)
+        response['kb_enrichment'] = 'attached'
+        if not response['context_used']:
+            return ""
+        
+        knowledge = self._format_cri_knowledge(response['context_used'])
+        response['answer'] += knowledge
+        return knowledge
+
+    def _generate_cri_override_response(self, cri_report: str) -> str:
         """
         Generate response that overrides base assistant with correct CRI calculation
         """
@@ -148,14 +558,6 @@ class EnhancedVeterinaryAssistantV4:
         response_parts.append("⚠️ USING DEDICATED CRI CALCULATION ENGINE FOR ACCURACY")
         response_parts.append("")
         
-        # Include relevant knowledge base context first
-        if base_response.get('context_used'):
-            response_parts.append("📚 RELEVANT VETERINARY KNOWLEDGE:")
-            response_parts.append("-" * 40)
-            context_preview = base_response['context_used'][:500] + "..." if len(base_response['context_used']) > 500 else base_response['context_used']
-            response_parts.append(context_preview)
-            response_parts.append("")
-        
         # Add the correct CRI calculation
         response_parts.append(cri_report)
         
@@ -170,36 +572,100 @@ class EnhancedVeterinaryAssistantV4:
         
         return "\n".join(response_parts)
 
-    def _handle_standard_query(self, query: str, context: Optional[Dict] = None) -> Dict[str, Any]:
+    def _format_cri_knowledge(self, context_used: str) -> str:
+        """Knowledge-base section appended to a CRI answer once its retrieval arrives"""
+        context_preview = context_used[:500] + "..." if len(context_used) > 500 else context_used
+        return "\n\n" + "\n".join([
+            "📚 RELEVANT VETERINARY KNOWLEDGE:",
+            "-" * 40,
+            context_preview
+        ])
+
+    def _handle_standard_query(self, request: VeterinaryQueryRequest) -> Dict[str, Any]:
         """
         Handle non-CRI queries using enhanced v3.0 processing
         """
-        # Step 1: Analyze veterinary principles in the query
-        print("🧠 Analyzing underlying veterinary principles...")
-        principle_analysis = self.principle_retrieval.analyze_query_principles(query)
+        principle_analysis, safety_future, retrieval = self._prepare_standard_query(request)
+        
+        # Step 3: Get response using enhanced retrieval
+        base_response = self._generate_principle_enhanced_response(request.query, retrieval)
+        
+        return self._finalize_standard_response(request, principle_analysis, safety_future.result(), base_response)
+
+    def _stream_standard_query(self, request: VeterinaryQueryRequest) -> Generator[str, None, Dict[str, Any]]:
+        """
+        Streaming _handle_standard_query: yields the generated answer as it arrives, then the safety
+        sections appended once the stream completes; returns the complete response
+        """
+        principle_analysis, safety_future, retrieval = self._prepare_standard_query(request)
+        
+        if 'error' in retrieval:
+            base_response = retrieval
+            yield base_response['answer']
+        else:
+            try:
+                base_response = yield from self.base_assistant.stream_response(request.query, retrieval)
+            except Exception as e:
+                print(f"❌ Error in high-confidence query: {str(e)}")
+                base_response = self.base_assistant.build_error_response(e)
+                yield f"\n\n{base_response['answer']}"
+            else:
+                self._attach_enhanced_contexts(base_response, retrieval)
+        
+        response = self._finalize_standard_response(request, principle_analysis, safety_future.result(), base_response)
+        # The final answer is the generated answer followed by the post-hoc safety sections
+        safety_sections = response['answer'][len(base_response.get('answer', '')):]
+        if safety_sections:
+            yield safety_sections
+        return response
+
+    def _prepare_standard_query(self, request: VeterinaryQueryRequest):
+        """
+        Principle analysis and principle-enhanced retrieval for a standard query. The primary retrieval
+        needs only the original query, so it runs on its own pool (with the local safety analysis)
+        while the Claude principle analysis and the sub-queries it produces proceed here; returns
+        (principle_analysis, safety analysis future, merged retrieval or an error response)
+        """
+        primary_future = self._primary_executor.submit(self.base_assistant.retrieve_context, request.query)
+        clinical_context = self._clinical_context(request)
+        safety_future = self._analysis_executor.submit(self._analyze_query_safety, request)
+        
+        # Step 1: Analyze veterinary principles in the query, alongside the primary retrieval
+        print("🧠 Analyzing underlying veterinary principles alongside the primary retrieval...")
+        try:
+            principle_analysis = self.principle_retrieval.analyze_query_principles(request.query, clinical_context)
+        except BaseException:
+            primary_future.cancel()
+            safety_future.cancel()
+            raise
         
         # Step 2: Generate enhanced search queries
         enhanced_queries = self.principle_retrieval.generate_enhanced_search_queries(principle_analysis)
         print(f"📚 Generated {len(enhanced_queries)} principle-based search queries")
         
-        # Step 3: Get response using enhanced retrieval
-        base_response = self._get_principle_enhanced_response(query, enhanced_queries)
-        
-        # Step 4: Extract context from query
-        extracted_context = self._extract_comprehensive_context(query)
-        if context:
-            extracted_context.update(context)
+        return principle_analysis, safety_future, self._retrieve_principle_enhanced_context(
+            primary_future, enhanced_queries
+        )
+
+    def _clinical_context(self, request: VeterinaryQueryRequest) -> ClinicalContext:
+        """
+        Recognise the query's clinical context once per request; request.context values take precedence
+        """
+        if request.clinical_context is None:
+            request.clinical_context = self.entity_recognizer.recognize(request.query).with_overrides(request.context)
+        return request.clinical_context
+
+    def _analyze_query_safety(self, request: VeterinaryQueryRequest) -> Dict[str, Any]:
+        """
+        Answer-independent safety steps: drug interactions and hepatic metabolism
+        """
+        clinical_context = self._clinical_context(request)
         
         # Step 5: Analyze for drug interactions if multiple drugs mentioned
         interaction_analysis = None
-        drugs_mentioned = extracted_context.get('drugs_mentioned', [])
-        
-        if len(drugs_mentioned) > 1:
-            print(f"🧬 Multiple drugs detected: {drugs_mentioned} - analyzing interactions...")
-            interactions = self.pharma_engine.analyze_drug_interactions(
-                drugs_mentioned,
-                extracted_context.get('patient_conditions', [])
-            )
+        if len(clinical_context.drugs) > 1:
+            print(f"🧬 Multiple drugs detected: {clinical_context.drugs} - analyzing interactions...")
+            interactions = self.pharma_engine.analyze_context_interactions(clinical_context)
             interaction_analysis = {
                 'interactions_found': len(interactions),
                 'interactions': interactions,
@@ -207,13 +673,23 @@ class EnhancedVeterinaryAssistantV4:
             }
         
         # Step 6: Check for hepatic metabolism principles if liver disease mentioned
-        hepatic_analysis = None
-        if any(condition in query.lower() for condition in ['liver', 'hepatic', 'enzyme']):
+        if clinical_context.hepatic_concern:
             print("🧬 Hepatic concerns detected - analyzing metabolism principles...")
-            hepatic_analysis = {}
-            for drug in drugs_mentioned:
-                hepatic_info = self.pharma_engine.get_hepatic_metabolism_principle(drug)
-                hepatic_analysis[drug] = hepatic_info
+        hepatic_analysis = self.pharma_engine.analyze_context_hepatic_metabolism(clinical_context)
+        
+        return {
+            'context': clinical_context,
+            'interaction_analysis': interaction_analysis,
+            'hepatic_analysis': hepatic_analysis
+        }
+
+    def _finalize_standard_response(self, request: VeterinaryQueryRequest, principle_analysis,
+                                    safety_analysis: Dict[str, Any], base_response: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Join the safety analysis with the generated answer, validate calculations and build the response
+        """
+        query = request.query
+        clinical_context = safety_analysis['context']
         
         # Step 7: Validate calculations if present (excluding CRIs which are handled separately)
         calculation_validation = None
@@ -223,7 +699,7 @@ class EnhancedVeterinaryAssistantV4:
             print("🧮 Mathematical calculations detected - validating...")
             validation_result = self.calc_validator.validate_calculation(
                 base_response.get('answer', ''), 
-                extracted_context
+                clinical_context
             )
             safety_report = self.calc_validator.generate_safety_report(validation_result)
             calculation_validation = {
@@ -241,109 +717,148 @@ class EnhancedVeterinaryAssistantV4:
         enhanced_response = self._generate_comprehensive_response_v4(
             base_response,
             principle_analysis,
-            interaction_analysis,
-            hepatic_analysis,
+            safety_analysis['interaction_analysis'],
+            safety_analysis['hepatic_analysis'],
             calculation_validation,
-            extracted_context
+            clinical_context.to_dict()
         )
         
         return enhanced_response
 
-    def _get_principle_enhanced_response(self, original_query: str, enhanced_queries: List[str]) -> Dict[str, Any]:
+    def _retrieve_principle_enhanced_context(self, primary_future, enhanced_queries: List[str]) -> Dict[str, Any]:
         """
-        Get response using principle-enhanced retrieval while maintaining knowledge base grounding
+        Principle-enhanced retrieval while maintaining knowledge base grounding. Enhanced queries are
+        retrieval-only and run concurrently with the (already running) primary retrieval; returns the
+        merged retrieval (or an error response)
         """
         print("📚 Performing principle-enhanced knowledge retrieval...")
         
-        # Primary response from original query
-        primary_response = self.base_assistant.query_with_high_confidence(original_query)
-        
-        # Collect additional context from enhanced queries
-        additional_contexts = []
-        for enhanced_query in enhanced_queries[1:]:  # Skip first (original query)
-            try:
-                enhanced_response = self.base_assistant.query_with_high_confidence(enhanced_query)
-                if enhanced_response.get('confidence', 0) > 0.7:  # Only high-confidence additions
-                    additional_contexts.append({
-                        'query': enhanced_query,
-                        'context': enhanced_response.get('context_used', ''),
-                        'confidence': enhanced_response.get('confidence', 0)
-                    })
-            except Exception as e:
-                self.logger.warning(f"Enhanced query failed: {enhanced_query[:50]}... - {e}")
+        # One batched embeddings request covers every sub-query
+        sub_queries = enhanced_queries[1:]  # Skip first (original query)
+        try:
+            sub_query_embeddings = self.base_assistant.embed_texts(sub_queries)
+        except Exception as e:
+            self.logger.warning(f"Enhanced sub-queries skipped: {e}")
+            enhanced_retrievals = [None] * len(sub_queries)
+        else:
+            pending_retrievals = self._submit_enhanced_retrievals(sub_queries, sub_query_embeddings)
+            enhanced_retrievals = self._collect_enhanced_retrievals(sub_queries, pending_retrievals)
         
-        # Enhance primary response with additional context if available
-        if additional_contexts:
-            print(f"✅ Incorporated {len(additional_contexts)} additional principle-based contexts")
-            primary_response['principle_enhanced_contexts'] = additional_contexts
+        try:
+            primary_retrieval = primary_future.result()
+        except Exception as e:
+            print(f"❌ Error in high-confidence query: {str(e)}")
+            return self.base_assistant.build_error_response(e)
         
-        return primary_response
+        return self._merge_enhanced_retrievals(primary_retrieval, sub_queries, enhanced_retrievals)
 
-    def _extract_comprehensive_context(self, query: str) -> Dict[str, Any]:
+    def _merge_enhanced_retrievals(self, primary_retrieval: Dict[str, Any], sub_queries: List[str],
+                                   enhanced_retrievals: List[Optional[Dict[str, Any]]]) -> Dict[str, Any]:
         """
-        Extract comprehensive context including drugs, conditions, and patient factors
+        Append high-confidence sub-query chunks to the primary retrieval, up to MAX_MERGED_CONTEXT_CHUNKS
         """
-        context = {}
-        
-        # Extract weight
-        weight_match = re.search(r'(\d+\.?\d*)\s*kg', query, re.IGNORECASE)
-        if weight_match:
-            context['weight'] = float(weight_match.group(1))
-        
-        # Extract age
-        age_match = re.search(r'(\d+)\s*(?:year|yr|month|mo)', query, re.IGNORECASE)
-        if age_match:
-            context['age'] = age_match.group(1)
-        
-        # Extract species
-        species_patterns = {
-            r'dog|canine': 'canine',
-            r'cat|feline': 'feline', 
-            r'horse|equine': 'equine',
-            r'cow|bovine': 'bovine'
-        }
-        
-        for pattern, species in species_patterns.items():
-            if re.search(pattern, query, re.IGNORECASE):
-                context['species'] = species
-                break
-        
-        # Extract drugs mentioned
-        drug_patterns = [
-            r'phenobarbital', r'diazepam', r'morphine', r'tramadol',
-            r'acepromazine', r'lidocaine', r'ketamine', r'fentanyl',
-            r'amoxicillin', r'clavamox', r'clavulanate', r'chloramphenicol',
-            r'ketoconazole', r'itraconazole', r'fluconazole', r'dopamine'
-        ]
+        merged_chunks = list(primary_retrieval['chunks'])
+        seen_chunk_ids = {chunk['chunk_id'] for chunk in merged_chunks}
         
-        detected_drugs = []
-        for pattern in drug_patterns:
-            matches = re.findall(pattern, query, re.IGNORECASE)
-            detected_drugs.extend([match.lower() for match in matches])
-        
-        # Remove duplicates while preserving order
-        context['drugs_mentioned'] = list(dict.fromkeys(detected_drugs))
+        # Merge additional context in enhanced-query order so output does not depend on completion order
+        additional_contexts = []
+        for enhanced_query, enhanced_retrieval in zip(sub_queries, enhanced_retrievals):
+            if enhanced_retrieval and enhanced_retrieval['confidence'] > self.ENHANCED_CONTEXT_MIN_CONFIDENCE:
+                additional_contexts.append({
+                    'query': enhanced_query,
+                    'context': enhanced_retrieval['context_used'],
+                    'confidence': enhanced_retrieval['confidence']
+                })
+                for chunk in enhanced_retrieval['chunks']:
+                    if chunk['chunk_id'] not in seen_chunk_ids and len(merged_chunks) < self.MAX_MERGED_CONTEXT_CHUNKS:
+                        seen_chunk_ids.add(chunk['chunk_id'])
+                        merged_chunks.append(chunk)
         
-        # Extract medical conditions
-        condition_patterns = [
-            r'liver\s+disease', r'hepatic\s+compromise', r'elevated\s+liver\s+enzymes',
-            r'seizures?', r'epilepsy', r'kidney\s+disease', r'renal\s+failure',
-            r'heart\s+disease', r'cardiac\s+disease', r'hypertension', r'hypotension'
-        ]
+        # Confidence stays anchored to the original query
+        return dict(primary_retrieval, chunks=merged_chunks, additional_contexts=additional_contexts)
+
+    def _generate_principle_enhanced_response(self, original_query: str, retrieval: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Single Claude generation over the merged principle-enhanced context
+        """
+        if 'error' in retrieval:
+            return retrieval
         
-        detected_conditions = []
-        for pattern in condition_patterns:
-            if re.search(pattern, query, re.IGNORECASE):
-                detected_conditions.append(pattern.replace('\\s+', '_').replace('?', ''))
+        try:
+            primary_response = self.base_assistant.generate_response(original_query, retrieval)
+        except Exception as e:
+            print(f"❌ Error in high-confidence query: {str(e)}")
+            return self.base_assistant.build_error_response(e)
         
-        if detected_conditions:
-            context['patient_conditions'] = detected_conditions
+        return self._attach_enhanced_contexts(primary_response, retrieval)
+
+    def _attach_enhanced_contexts(self, response: Dict[str, Any], retrieval: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Enhance the generated response with the additional principle-based contexts, if any
+        """
+        additional_contexts = retrieval.get('additional_contexts')
+        if additional_contexts:
+            print(f"✅ Incorporated {len(additional_contexts)} additional principle-based contexts")
+            response['principle_enhanced_contexts'] = additional_contexts
+        return response
+
+    def _submit_enhanced_retrievals(self, sub_queries: List[str], sub_query_embeddings: List[List[float]]) -> Dict[Any, Dict[str, Any]]:
+        """
+        Submit retrieval-only sub-queries (already embedded) to the shared pool; returns future -> tracking info
+        """
+        pending = {}
+        for index, (sub_query, embedding) in enumerate(zip(sub_queries, sub_query_embeddings)):
+            future = self._retrieval_executor.submit(
+                self.base_assistant.retrieve_context, sub_query, query_variants=[sub_query], embeddings=[embedding]
+            )
+            pending[future] = {'index': index, 'submitted': time.monotonic()}
+        return pending
+
+    def _collect_enhanced_retrievals(self, sub_queries: List[str], pending: Dict[Any, Dict[str, Any]]) -> List[Optional[Dict[str, Any]]]:
+        """
+        Wait for sub-query retrievals, enforcing the per-query timeout and cancelling
+        stragglers once enough high-confidence context has arrived.
+        Results are returned in sub-query order; failed, timed-out or cancelled entries are None.
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(sub_queries)
+        high_confidence_count = 0
         
-        # Extract interaction-related keywords
-        if re.search(r'interact|combination|together|with', query, re.IGNORECASE):
-            context['interaction_query'] = True
+        while pending:
+            now = time.monotonic()
+            next_deadline = min(info['submitted'] for info in pending.values()) + self.enhanced_query_timeout
+            done, _ = wait(list(pending), timeout=max(next_deadline - now, 0), return_when=FIRST_COMPLETED)
+            
+            for future in done:
+                info = pending.pop(future)
+                sub_query = sub_queries[info['index']]
+                try:
+                    results[info['index']] = future.result()
+                except Exception as e:
+                    self.logger.warning(f"Enhanced query failed: {sub_query[:50]}... - {e}")
+                    continue
+                if results[info['index']]['confidence'] > self.ENHANCED_CONTEXT_MIN_CONFIDENCE:
+                    high_confidence_count += 1
+            
+            if self.enhanced_context_target and high_confidence_count >= self.enhanced_context_target:
+                if pending:
+                    print(f"⚡ {high_confidence_count} high-confidence contexts collected - cancelling {len(pending)} remaining sub-queries")
+                break
+            
+            # Abandon sub-queries that exceeded their time budget (queued time counts against it)
+            now = time.monotonic()
+            for future, info in list(pending.items()):
+                if now - info['submitted'] >= self.enhanced_query_timeout:
+                    self.logger.warning(f"Enhanced query timed out: {sub_queries[info['index']][:50]}...")
+                    future.cancel()
+                    del pending[future]
         
-        return context
+        self._cancel_enhanced_retrievals(pending)
+        return results
+
+    def _cancel_enhanced_retrievals(self, pending: Dict[Any, Dict[str, Any]]):
+        """Cancel queued sub-queries; running ones finish in the background and are ignored"""
+        for future in pending:
+            future.cancel()
 
     def _detect_calculations(self, response_text: str) -> bool:
         """
@@ -489,9 +1004,12 @@ class EnhancedVeterinaryAssistantV4:
         print(f"{test_query}")
         print("\n" + "-" * 70)
         
+        start = time.perf_counter()
         result = self.query_with_comprehensive_safety_v4(test_query)
+        elapsed_ms = (time.perf_counter() - start) * 1000
         
         print(f"\n📊 SYSTEM ANALYSIS:")
+        print(f"   ⚡ Answered in {elapsed_ms:.1f} ms (knowledge-base enrichment: {result.get('kb_enrichment')})")
         safety = result.get('safety_analysis', {})
         cri_calc = result.get('cri_calculation', {})
         
@@ -503,12 +1021,44 @@ class EnhancedVeterinaryAssistantV4:
             print(f"   💊 Dopamine Volume Calculated: {dopamine_volume:.2f} mL")
             print(f"   🕐 Total Run Time: {cri_calc.get('total_run_time_hours', 0):.1f} hours")
         
+        self.attach_cri_enrichment(result, timeout=self.enhanced_query_timeout)
+        print(f"   📚 Knowledge-base enrichment: {result.get('kb_enrichment')}")
+        
         print(f"\n📋 RESPONSE:")
         print(result.get('answer', 'No response generated'))
 
+_shared_assistant: Optional[EnhancedVeterinaryAssistantV4] = None
+_shared_assistant_lock = threading.Lock()
+
+def get_shared_assistant() -> EnhancedVeterinaryAssistantV4:
+    """
+    Return the process-wide assistant, building it on first use.
+    Clients, the Pinecone index connection and the reasoning databases are
+    created once and reused by every session and request in the process.
+    """
+    global _shared_assistant
+    
+    if _shared_assistant is None:
+        with _shared_assistant_lock:
+            if _shared_assistant is None:
+                _shared_assistant = EnhancedVeterinaryAssistantV4()
+                atexit.register(shutdown_shared_assistant)
+    
+    return _shared_assistant
+
+def shutdown_shared_assistant():
+    """Shut down the process-wide assistant if one was built"""
+    global _shared_assistant
+    
+    with _shared_assistant_lock:
+        assistant, _shared_assistant = _shared_assistant, None
+    
+    if assistant is not None:
+        assistant.shutdown()
+
 def main():
     """Test the enhanced veterinary assistant v4.0"""
-    assistant = EnhancedVeterinaryAssistantV4()
+    assistant = get_shared_assistant()
     assistant.test_cri_override_system()
 
 if __name__ == "__main__":
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Local Principle Classifier
+Scores a query against every principle in the local principle database from the principle
+terms the clinical entity recognizer found, and decides whether the Claude principle analysis
+is needed: confident local matches are used as-is, low-confidence queries escalate to Claude
+"""
+
+import os
+import sys
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+from clinical_entity_recognizer import ClinicalContext
+
+ANALYSIS_MODES = ("auto", "claude", "local")
+
+@dataclass
+class PrincipleClassification:
+    """Local principle matches for one query and the escalation decision"""
+    principles: List               # matched VeterinaryPrinciple objects, in database order
+    scores: Dict[str, float]       # principle name -> evidence score (matched term weights)
+    confidence: float              # probability-like confidence that the local matches suffice
+    escalate: bool                 # True when the Claude analysis should be requested
+    matched_terms: Dict[str, List[str]] = field(default_factory=dict)
+
+class LocalPrincipleClassifier:
+    # Multi-word mechanism terms (search_expansion) are more specific evidence than trigger words
+    RELATED_TERM_WEIGHT = 1.0
+    EXPANSION_TERM_WEIGHT = 1.5
+
+    def __init__(self, principle_database: Dict[str, List], mode: Optional[str] = None,
+                 escalation_threshold: Optional[float] = None):
+        """
+        principle_database: {category: [VeterinaryPrinciple, ...]}
+        mode: 'auto' escalates below the threshold, 'claude' always escalates, 'local' never does
+              (LIMOSA_PRINCIPLE_ANALYSIS)
+        escalation_threshold: minimum confidence to skip Claude in auto mode (LIMOSA_PRINCIPLE_ESCALATION_THRESHOLD)
+        """
+        self.mode = (mode or os.getenv('LIMOSA_PRINCIPLE_ANALYSIS', 'auto')).lower()
+        if self.mode not in ANALYSIS_MODES:
+            raise ValueError(f"Unknown principle analysis mode '{self.mode}' (expected one of {', '.join(ANALYSIS_MODES)})")
+        self.escalation_threshold = escalation_threshold if escalation_threshold is not None else float(
+            os.getenv('LIMOSA_PRINCIPLE_ESCALATION_THRESHOLD', 0.7)
+        )
+
+        self.principles = [principle for principles in principle_database.values() for principle in principles]
+
+        # Every term of every principle; a term may serve several principles
+        self._term_owners: Dict[str, List] = {}
+        for index, principle in enumerate(self.principles):
+            for term in principle.related_terms:
+                self._term_owners.setdefault(term.lower(), []).append((index, self.RELATED_TERM_WEIGHT))
+            for term in principle.search_expansion:
+                self._term_owners.setdefault(term.lower(), []).append((index, self.EXPANSION_TERM_WEIGHT))
+
+        self._lock = threading.Lock()
+        self.stats = {'classified': 0, 'escalated': 0, 'local': 0}
+
+    @property
+    def terms(self) -> List[str]:
+        """Lower-cased principle terms the entity recognizer should report"""
+        return list(self._term_owners)
+
+    def classify(self, context: ClinicalContext) -> PrincipleClassification:
+        """Score principles from the recognised principle terms and decide whether to escalate to Claude"""
+        scores = [0.0] * len(self.principles)
+        matched_terms: Dict[int, List[str]] = {}
+        # Weights take the strongest role a term plays for each principle, counted once per term
+        for term in context.principle_terms:
+            if term not in self._term_owners:
+                continue
+            strongest: Dict[int, float] = {}
+            for index, weight in self._term_owners[term]:
+                strongest[index] = max(weight, strongest.get(index, 0.0))
+            for index, weight in strongest.items():
+                scores[index] += weight
+                matched_terms.setdefault(index, []).append(term)
+
+        matched = [index for index, score in enumerate(scores) if score > 0]
+        # Each principle's evidence s gives s / (s + 1); independent principles combine as 1 - prod(1 - c)
+        miss_probability = 1.0
+        for index in matched:
+            miss_probability *= 1.0 / (scores[index] + 1.0)
+        confidence = 1.0 - miss_probability if matched else 0.0
+
+        if self.mode == 'claude':
+            escalate = True
+        elif self.mode == 'local':
+            escalate = False
+        else:
+            escalate = confidence < self.escalation_threshold
+
+        with self._lock:
+            self.stats['classified'] += 1
+            self.stats['escalated' if escalate else 'local'] += 1
+
+        return PrincipleClassification(
+            principles=[self.principles[index] for index in matched],
+            scores={self.principles[index].principle: scores[index] for index in matched},
+            confidence=confidence,
+            escalate=escalate,
+            matched_terms={self.principles[index].principle: matched_terms[index] for index in matched}
+        )
+
+    def get_stats(self) -> Dict[str, float]:
+        """Classification counters plus the escalation rate"""
+        with self._lock:
+            stats = dict(self.stats)
+        stats['mode'] = self.mode
+        stats['escalation_threshold'] = self.escalation_threshold
+        stats['escalation_rate'] = stats['escalated'] / stats['classified'] if stats['classified'] else 0.0
+        return stats
+
+def main():
+    """Classify sample queries and report the escalation rate"""
+    from principle_based_retrieval import PrincipleBasedRetrieval
+
+    print("🧭 LOCAL PRINCIPLE CLASSIFIER")
+    print("=" * 50)
+
+    retrieval = PrincipleBasedRetrieval()
+    classifier = retrieval.principle_classifier
+    print(f"Mode: {classifier.mode}, escalation threshold {classifier.escalation_threshold}")
+
+    queries = sys.argv[1:] or [
+        "What are the drug interactions between phenobarbital and clavamox in dogs with liver disease?",
+        "How should I calculate morphine dosing for a cat with kidney disease?",
+        "What causes elevated liver enzymes in seizure patients on long-term anticonvulsants?",
+        "Acepromazine and enalapril in a dog with heart disease and low blood pressure",
+        "Trocar decompression technique for GDV",
+    ]
+    for query in queries:
+        result = classifier.classify(retrieval.entity_recognizer.recognize(query))
+        status = "☁️ escalate" if result.escalate else "✅ local"
+        print(f"\n{status} ({result.confidence:.2f}) {query}")
+        for principle, terms in result.matched_terms.items():
+            print(f"   • {principle}: {', '.join(terms)} ({result.scores[principle]:.1f})")
+
+    stats = classifier.get_stats()
+    print(f"\n📊 Escalation rate: {stats['escalation_rate']:.0%} ({stats['escalated']}/{stats['classified']})")
+
+if __name__ == "__main__":
+    main()
@@ -4,12 +4,22 @@ Pharmacological Reasoning Engine
 Addresses CYP450 interactions and mechanism-based drug reasoning
 """
 
+import os
 import re
+import sys
 import json
-from typing import Dict, List, Tuple, Optional, Set
+import time
+import hashlib
+import inspect
+import marshal
+import threading
+from typing import Dict, List, Tuple, Optional, Set, Iterable, Iterator
 from dataclasses import dataclass
 from enum import Enum
 import logging
+import numpy as np
+from clinical_entity_recognizer import ClinicalContext
+from clinical_reference_data import ClinicalReferenceData, DrugMechanism, get_reference_data
 
 class InteractionType(Enum):
     CYP450_INDUCTION = "cyp450_induction"
@@ -26,16 +36,7 @@ class InteractionSeverity(Enum):
     MAJOR = "major"
     CONTRAINDICATED = "contraindicated"
 
-@dataclass
-class DrugMechanism:
-    drug_name: str
-    cyp450_effects: List[str]  # ['inducer', 'inhibitor', 'substrate']
-    cyp450_enzymes: List[str]  # ['3A4', '2D6', '2C9', etc.]
-    hepatic_metabolism_percent: Optional[float]
-    renal_elimination_percent: Optional[float]
-    protein_binding_percent: Optional[float]
-    therapeutic_class: str
-    contraindications: List[str]
+SEVERITY_RANK = {severity: rank for rank, severity in enumerate(InteractionSeverity)}
 
 @dataclass
 class DrugInteraction:
@@ -48,498 +49,265 @@ class DrugInteraction:
     management: str
     confidence: float
 
+@dataclass
+class CompiledMechanisms:
+    """
+    Drug mechanisms as columns for vectorized rule evaluation: CYP450 effects and enzymes as
+    integer bitsets, therapeutic classes as ids, and percentages as floats (NaN when unknown)
+    """
+    drugs: List[str]
+    effect_bits: Dict[str, int]
+    enzyme_bits: Dict[str, int]
+    class_ids: Dict[str, int]
+    effects: np.ndarray            # uint32 bitset per drug
+    enzymes: np.ndarray            # uint64 bitset per drug
+    therapeutic_class: np.ndarray  # int32 class id per drug
+    hepatic_metabolism: np.ndarray
+    renal_elimination: np.ndarray
+    protein_binding: np.ndarray
+
+    @classmethod
+    def compile(cls, mechanisms: Dict[str, DrugMechanism]) -> "CompiledMechanisms":
+        drugs = sorted(mechanisms)
+        effect_bits = {effect: 1 << bit for bit, effect in enumerate(sorted(
+            {effect for mechanism in mechanisms.values() for effect in mechanism.cyp450_effects}))}
+        enzyme_bits = {enzyme: 1 << bit for bit, enzyme in enumerate(sorted(
+            {enzyme for mechanism in mechanisms.values() for enzyme in mechanism.cyp450_enzymes}))}
+        class_ids = {name: index for index, name in enumerate(sorted(
+            {mechanism.therapeutic_class for mechanism in mechanisms.values()}))}
+        if len(effect_bits) > 32 or len(enzyme_bits) > 64:
+            raise ValueError("Too many distinct CYP450 effects or enzymes for the bitset encoding")
+
+        def percentages(attribute: str) -> np.ndarray:
+            values = (getattr(mechanisms[drug], attribute) for drug in drugs)
+            return np.array([np.nan if value is None else value for value in values], dtype=np.float64)
+
+        return cls(
+            drugs=drugs,
+            effect_bits=effect_bits,
+            enzyme_bits=enzyme_bits,
+            class_ids=class_ids,
+            effects=np.array([sum(effect_bits[effect] for effect in set(mechanisms[drug].cyp450_effects))
+                              for drug in drugs], dtype=np.uint32),
+            enzymes=np.array([sum(enzyme_bits[enzyme] for enzyme in set(mechanisms[drug].cyp450_enzymes))
+                              for drug in drugs], dtype=np.uint64),
+            therapeutic_class=np.array([class_ids[mechanisms[drug].therapeutic_class] for drug in drugs], dtype=np.int32),
+            hepatic_metabolism=percentages('hepatic_metabolism_percent'),
+            renal_elimination=percentages('renal_elimination_percent'),
+            protein_binding=percentages('protein_binding_percent')
+        )
+
+    def select(self, indices: np.ndarray) -> "CompiledMechanisms":
+        """The rows of a medication list, in its order"""
+        return CompiledMechanisms(
+            [self.drugs[index] for index in indices], self.effect_bits, self.enzyme_bits,
+            self.class_ids, self.effects[indices], self.enzymes[indices], self.therapeutic_class[indices],
+            self.hepatic_metabolism[indices], self.renal_elimination[indices], self.protein_binding[indices]
+        )
+
+    def has_effect(self, effect: str) -> np.ndarray:
+        return (self.effects & np.uint32(self.effect_bits.get(effect, 0))) != 0
+
+    def in_class(self, *names: str) -> np.ndarray:
+        return np.isin(self.therapeutic_class, [self.class_ids[name] for name in names if name in self.class_ids])
+
+    def shares_enzyme(self) -> np.ndarray:
+        """[i, j]: drugs i and j have a CYP450 enzyme in common"""
+        return (self.enzymes[:, None] & self.enzymes[None, :]) != 0
+
+def pairwise(first: np.ndarray, second: np.ndarray) -> np.ndarray:
+    """[i, j] = first[i] and second[j]"""
+    return first[:, None] & second[None, :]
+
+DEFAULT_INTERACTION_TABLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                              "vet_database", "interaction_table.json")
+
+# (drug1, drug2, interaction type value, severity value, mechanism, clinical effect, management, confidence)
+InteractionRecord = Tuple[str, str, str, str, str, str, str, float]
+
+class DrugInteractionTable:
+    """
+    Precomputed interactions for every ordered pair of drugs in the mechanism database:
+    pair id (index1 * drug count + index2) -> tuple of interaction records, so pair analysis
+    is a dictionary lookup instead of rule evaluation
+    """
+    
+    FORMAT_VERSION = 1
+    
+    def __init__(self, drugs: List[str], pairs: Dict[int, Tuple[InteractionRecord, ...]], fingerprint: str):
+        self.drugs = drugs
+        self.fingerprint = fingerprint
+        self._index = {drug: index for index, drug in enumerate(drugs)}
+        self._pairs = pairs
+    
+    def __len__(self) -> int:
+        return len(self.drugs) ** 2
+    
+    def pair_id(self, drug1: str, drug2: str) -> Optional[int]:
+        index1, index2 = self._index.get(drug1), self._index.get(drug2)
+        if index1 is None or index2 is None:
+            return None
+        return index1 * len(self.drugs) + index2
+    
+    def lookup(self, drug1: str, drug2: str) -> Optional[Tuple[InteractionRecord, ...]]:
+        """Records for an ordered pair, or None when either drug is not in the table"""
+        pair_id = self.pair_id(drug1, drug2)
+        if pair_id is None:
+            return None
+        return self._pairs.get(pair_id, ())
+    
+    def items(self) -> Iterator[Tuple[str, str, Tuple[InteractionRecord, ...]]]:
+        """(drug1, drug2, records) for every ordered pair that has interactions"""
+        for pair_id, records in self._pairs.items():
+            index1, index2 = divmod(pair_id, len(self.drugs))
+            yield self.drugs[index1], self.drugs[index2], records
+    
+    def save(self, path: str):
+        """Write the table compactly: each distinct string and record is stored once"""
+        strings: Dict[str, int] = {}
+        records: Dict[InteractionRecord, int] = {}
+        for pair_records in self._pairs.values():
+            for record in pair_records:
+                if record not in records:
+                    records[record] = len(records)
+                    for text in record[:7]:
+                        strings.setdefault(text, len(strings))
+        
+        payload = {
+            "format_version": self.FORMAT_VERSION,
+            "fingerprint": self.fingerprint,
+            "drugs": self.drugs,
+            "strings": list(strings),
+            "records": [[strings[text] for text in record[:7]] + [record[7]] for record in records],
+            "pairs": {str(pair_id): [records[record] for record in pair_records]
+                      for pair_id, pair_records in sorted(self._pairs.items())}
+        }
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(payload, f, separators=(',', ':'))
+    
+    @classmethod
+    def load(cls, path: str) -> "DrugInteractionTable":
+        with open(path, 'r', encoding='utf-8') as f:
+            payload = json.load(f)
+        if payload.get("format_version") != cls.FORMAT_VERSION:
+            raise ValueError(f"Unsupported interaction table format {payload.get('format_version')}")
+        
+        strings = payload["strings"]
+        records = [tuple(strings[index] for index in record[:7]) + (record[7],) for record in payload["records"]]
+        pairs = {int(pair_id): tuple(records[index] for index in record_ids)
+                 for pair_id, record_ids in payload["pairs"].items()}
+        return cls(payload["drugs"], pairs, payload["fingerprint"])
+
+DEFAULT_FORMULARY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                      "comprehensive_veterinary_drugs_database", "analysis", "final_validated_drugs.json")
+
+def load_formulary(path: str = DEFAULT_FORMULARY_PATH) -> List[str]:
+    """Drug names of the validated formulary"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)["validated_drugs"]
+
+@dataclass
+class InteractingPartner:
+    """A drug that interacts with a queried drug, and how"""
+    drug: str
+    interacts_with: str
+    severity: InteractionSeverity          # the most severe of the interactions
+    interactions: List[DrugInteraction]
+
+class InteractionIndex:
+    """
+    Inverted index over an interaction table for "what interacts with X": drug -> (severity,
+    interaction type) -> (partner, interaction) postings, plus CYP450 enzyme and therapeutic
+    class -> drugs, so a query reads only the postings its filters select
+    """
+    
+    def __init__(self, table: DrugInteractionTable, mechanisms: Dict[str, DrugMechanism]):
+        self.fingerprint = table.fingerprint
+        # Each distinct record becomes one DrugInteraction, shared by every posting that lists it
+        interactions: Dict[InteractionRecord, DrugInteraction] = {}
+        self._postings: Dict[str, Dict[Tuple[InteractionSeverity, InteractionType], List[Tuple[str, DrugInteraction]]]] = {}
+        for drug1, drug2, records in table.items():
+            if drug1 == drug2:
+                continue
+            postings = self._postings.setdefault(drug1, {})
+            for record in records:
+                interaction = interactions.get(record)
+                if interaction is None:
+                    interaction = interactions[record] = DrugInteraction(
+                        record[0], record[1], InteractionType(record[2]), InteractionSeverity(record[3]), *record[4:])
+                postings.setdefault((interaction.severity, interaction.interaction_type), []).append((drug2, interaction))
+        # Most severe postings first, so every partner's interactions are collected already in severity order
+        for drug, postings in self._postings.items():
+            self._postings[drug] = dict(sorted(postings.items(), key=lambda item: SEVERITY_RANK[item[0][0]], reverse=True))
+        
+        self.drugs_by_enzyme: Dict[str, List[str]] = {}
+        self.drugs_by_class: Dict[str, List[str]] = {}
+        for drug in table.drugs:
+            mechanism = mechanisms[drug]
+            for enzyme in mechanism.cyp450_enzymes:
+                self.drugs_by_enzyme.setdefault(enzyme, []).append(drug)
+            self.drugs_by_class.setdefault(mechanism.therapeutic_class, []).append(drug)
+    
+    def drugs_with_enzyme(self, enzyme: str) -> List[str]:
+        """Drugs acting on a CYP450 enzyme ('3A4' or 'CYP3A4')"""
+        enzyme = enzyme.upper()
+        return self.drugs_by_enzyme.get(enzyme[3:] if enzyme.startswith("CYP") else enzyme, [])
+    
+    def drugs_in_class(self, therapeutic_class: str) -> List[str]:
+        return self.drugs_by_class.get(therapeutic_class.lower().replace(" ", "_"), [])
+    
+    def partners(self, drug: str, severities: Optional[Set[InteractionSeverity]] = None,
+                 interaction_types: Optional[Set[InteractionType]] = None,
+                 formulary: Optional[Set[str]] = None) -> Dict[str, List[DrugInteraction]]:
+        """partner -> interactions (most severe first) for one drug, optionally limited to some severities, types and partners"""
+        matches: Dict[str, List[DrugInteraction]] = {}
+        for (severity, interaction_type), postings in self._postings.get(drug, {}).items():
+            if severities is not None and severity not in severities:
+                continue
+            if interaction_types is not None and interaction_type not in interaction_types:
+                continue
+            for partner, interaction in postings:
+                if formulary is None or partner in formulary:
+                    matches.setdefault(partner, []).append(interaction)
+        return matches
+
 class PharmacologicalReasoningEngine:
     """
     Advanced drug interaction detection based on pharmacological mechanisms
     """
     
-    def __init__(self):
-        """Initialize the pharmacological reasoning engine"""
+    def __init__(self, reference_data: Optional[ClinicalReferenceData] = None):
+        """
+        reference_data: source of the drug mechanism database (defaults to the process-wide copy,
+                        read from the data file on first use and reloaded when it changes)
+        """
         self.logger = logging.getLogger(__name__)
+        self.reference_data = reference_data or get_reference_data()
         
-        # Initialize drug mechanism database
-        self.drug_mechanisms = self._initialize_drug_mechanisms()
+        # Structures derived from one version of the mechanism database, dropped when it reloads
+        self._mechanisms_source: Optional[Dict[str, DrugMechanism]] = None
+        self._compiled: Optional[Tuple[Dict[str, DrugMechanism], CompiledMechanisms, Dict[str, int]]] = None
         
         # Initialize interaction rules
         self.interaction_rules = self._initialize_interaction_rules()
         
+        # Ordered-pair interaction table: loaded from the rebuild output or computed on first use
+        self.interaction_table_path = os.getenv('LIMOSA_INTERACTION_TABLE', DEFAULT_INTERACTION_TABLE_PATH)
+        self._interaction_table: Optional[DrugInteractionTable] = None
+        self._interaction_table_lock = threading.RLock()
+        self._rules_fingerprint: Optional[str] = None
+        self._interaction_index: Optional[Tuple[DrugInteractionTable, InteractionIndex]] = None
+        
         print("🧬 Pharmacological Reasoning Engine initialized")
-        print(f"📊 Drug mechanisms loaded: {len(self.drug_mechanisms)} (comprehensive veterinary database)")
+        print(f"📊 Drug mechanisms: {os.path.basename(self.reference_data.path)} (loaded on first use)")
         print(f"⚗️ Interaction rules loaded: {len(self.interaction_rules)} (mechanism-based detection)")
         print("   🎯 CYP450 enzyme interactions, protein binding displacement")
         print("   🎯 Therapeutic class conflicts, renal elimination competition")
         print("   🎯 Veterinary-specific interactions with high clinical relevance")
 
-    def _initialize_drug_mechanisms(self) -> Dict[str, DrugMechanism]:
-        """
-        Initialize comprehensive drug mechanism database
-        """
-        mechanisms = {}
-        
-        # Veterinary CNS drugs
-        mechanisms["phenobarbital"] = DrugMechanism(
-            drug_name="phenobarbital",
-            cyp450_effects=["inducer"],
-            cyp450_enzymes=["3A4", "2C9", "2C19", "2B6"],
-            hepatic_metabolism_percent=75.0,
-            renal_elimination_percent=25.0,
-            protein_binding_percent=50.0,
-            therapeutic_class="anticonvulsant",
-            contraindications=["severe_liver_disease", "porphyria"]
-        )
-        
-        mechanisms["diazepam"] = DrugMechanism(
-            drug_name="diazepam",
-            cyp450_effects=["substrate"],
-            cyp450_enzymes=["3A4", "2C19"],
-            hepatic_metabolism_percent=95.0,
-            renal_elimination_percent=5.0,
-            protein_binding_percent=95.0,
-            therapeutic_class="benzodiazepine",
-            contraindications=["severe_liver_disease"]
-        )
-        
-        # Antibiotics
-        mechanisms["amoxicillin"] = DrugMechanism(
-            drug_name="amoxicillin",
-            cyp450_effects=["minimal"],
-            cyp450_enzymes=[],
-            hepatic_metabolism_percent=10.0,
-            renal_elimination_percent=90.0,
-            protein_binding_percent=20.0,
-            therapeutic_class="beta_lactam_antibiotic",
-            contraindications=["penicillin_allergy"]
-        )
-        
-        mechanisms["clavulanate"] = DrugMechanism(
-            drug_name="clavulanate",
-            cyp450_effects=["minimal"],
-            cyp450_enzymes=[],
-            hepatic_metabolism_percent=30.0,
-            renal_elimination_percent=70.0,
-            protein_binding_percent=25.0,
-            therapeutic_class="beta_lactamase_inhibitor",
-            contraindications=["penicillin_allergy"]
-        )
-        
-        mechanisms["chloramphenicol"] = DrugMechanism(
-            drug_name="chloramphenicol",
-            cyp450_effects=["inhibitor"],
-            cyp450_enzymes=["3A4", "2C9"],
-            hepatic_metabolism_percent=90.0,
-            renal_elimination_percent=10.0,
-            protein_binding_percent=60.0,
-            therapeutic_class="antibiotic",
-            contraindications=["bone_marrow_suppression"]
-        )
-        
-        # Analgesics
-        mechanisms["morphine"] = DrugMechanism(
-            drug_name="morphine",
-            cyp450_effects=["substrate"],
-            cyp450_enzymes=["2D6"],
-            hepatic_metabolism_percent=85.0,
-            renal_elimination_percent=15.0,
-            protein_binding_percent=35.0,
-            therapeutic_class="opioid_analgesic",
-            contraindications=["respiratory_depression"]
-        )
-        
-        mechanisms["tramadol"] = DrugMechanism(
-            drug_name="tramadol",
-            cyp450_effects=["substrate"],
-            cyp450_enzymes=["2D6", "3A4"],
-            hepatic_metabolism_percent=90.0,
-            renal_elimination_percent=10.0,
-            protein_binding_percent=20.0,
-            therapeutic_class="opioid_analgesic",
-            contraindications=["seizure_disorder"]
-        )
-        
-        # Sedatives
-        mechanisms["acepromazine"] = DrugMechanism(
-            drug_name="acepromazine",
-            cyp450_effects=["substrate"],
-            cyp450_enzymes=["3A4"],
-            hepatic_metabolism_percent=95.0,
-            renal_elimination_percent=5.0,
-            protein_binding_percent=90.0,
-            therapeutic_class="phenothiazine",
-            contraindications=["hypotension", "seizure_disorder"]
-        )
-        
-        # NSAIDs and Anti-inflammatories
-        mechanisms["carprofen"] = DrugMechanism(
-            drug_name="carprofen",
-            cyp450_effects=["substrate"],
-            cyp450_enzymes=["2C9"],
-            hepatic_metabolism_percent=95.0,
-            renal_elimination_percent=5.0,
-            protein_binding_percent=99.0,
-            therapeutic_class="nsaid",
-            contraindications=["cats", "kidney_disease", "liver_disease", "bleeding_disorders"]
-        )
-        
-        mechanisms["meloxicam"] = DrugMechanism(
-            drug_name="meloxicam",
-            cyp450_effects=["substrate"],
-            cyp450_enzymes=["2C9"],
-            hepatic_metabolism_percent=95.0,
-            renal_elimination_percent=5.0,
-            protein_binding_percent=99.0,
-            therapeutic_class="nsaid",
-            contraindications=["kidney_disease", "liver_disease", "dehydration"]
-        )
-        
-        mechanisms["firocoxib"] = DrugMechanism(
-            drug_name="firocoxib",
-            cyp450_effects=["substrate"],
-            cyp450_enzymes=["2C9", "3A4"],
-            hepatic_metabolism_percent=90.0,
-            renal_elimination_percent=10.0,
-            protein_binding_percent=96.0,
-            therapeutic_class="cox2_nsaid",
-            contraindications=["kidney_disease", "liver_disease"]
-        )
-        
-        mechanisms["gabapentin"] = DrugMechanism(
-            drug_name="gabapentin",
-            cyp450_effects=["minimal"],
-            cyp450_enzymes=[],
-            hepatic_metabolism_percent=0.0,
-            renal_elimination_percent=100.0,
-            protein_binding_percent=3.0,
-            therapeutic_class="anticonvulsant_analgesic",
-            contraindications=["severe_kidney_disease"]
-        )
-        
-        mechanisms["pregabalin"] = DrugMechanism(
-            drug_name="pregabalin",
-            cyp450_effects=["minimal"],
-            cyp450_enzymes=[],
-            hepatic_metabolism_percent=0.0,
-            renal_elimination_percent=100.0,
-            protein_binding_percent=0.0,
-            therapeutic_class="anticonvulsant_analgesic",
-            contraindications=["severe_kidney_disease"]
-        )
-        
-        # Anesthetics and Analgesics
-        mechanisms["lidocaine"] = DrugMechanism(
-            drug_name="lidocaine",
-            cyp450_effects=["substrate"],
-            cyp450_enzymes=["3A4", "1A2"],
-            hepatic_metabolism_percent=95.0,
-            renal_elimination_percent=5.0,
-            protein_binding_percent=70.0,
-            therapeutic_class="local_anesthetic",
-            contraindications=["heart_block", "severe_liver_disease"]
-        )
-        
-        mechanisms["bupivacaine"] = DrugMechanism(
-            drug_name="bupivacaine",
-            cyp450_effects=["substrate"],
-            cyp450_enzymes=["3A4"],
-            hepatic_metabolism_percent=95.0,
-            renal_elimination_percent=5.0,
-            protein_binding_percent=95.0,
-            therapeutic_class="local_anesthetic",
-            contraindications=["heart_block", "severe_liver_disease"]
-        )
-        
-        mechanisms["ketamine"] = DrugMechanism(
-            drug_name="ketamine",
-            cyp450_effects=["substrate"],
-            cyp450_enzymes=["3A4", "2B6"],
-            hepatic_metabolism_percent=90.0,
-            renal_elimination_percent=10.0,
-            protein_binding_percent=12.0,
-            therapeutic_class="nmda_antagonist",
-            contraindications=["increased_intracranial_pressure"]
-        )
-        
-        mechanisms["propofol"] = DrugMechanism(
-            drug_name="propofol",
-            cyp450_effects=["substrate"],
-            cyp450_enzymes=["2B6", "2C9"],
-            hepatic_metabolism_percent=88.0,
-            renal_elimination_percent=2.0,
-            protein_binding_percent=98.0,
-            therapeutic_class="general_anesthetic",
-            contraindications=["severe_cardiac_disease"]
-        )
-        
-        mechanisms["fentanyl"] = DrugMechanism(
-            drug_name="fentanyl",
-            cyp450_effects=["substrate"],
-            cyp450_enzymes=["3A4"],
-            hepatic_metabolism_percent=95.0,
-            renal_elimination_percent=5.0,
-            protein_binding_percent=84.0,
-            therapeutic_class="opioid_analgesic",
-            contraindications=["respiratory_depression", "severe_liver_disease"]
-        )
-        
-        mechanisms["buprenorphine"] = DrugMechanism(
-            drug_name="buprenorphine",
-            cyp450_effects=["substrate"],
-            cyp450_enzymes=["3A4"],
-            hepatic_metabolism_percent=95.0,
-            renal_elimination_percent=5.0,
-            protein_binding_percent=96.0,
-            therapeutic_class="partial_opioid_agonist",
-            contraindications=["severe_liver_disease"]
-        )
-        
-        mechanisms["butorphanol"] = DrugMechanism(
-            drug_name="butorphanol",
-            cyp450_effects=["substrate"],
-            cyp450_enzymes=["3A4"],
-            hepatic_metabolism_percent=85.0,
-            renal_elimination_percent=15.0,
-            protein_binding_percent=80.0,
-            therapeutic_class="opioid_analgesic",
-            contraindications=["severe_liver_disease"]
-        )
-        
-        # Antibiotics
-        mechanisms["doxycycline"] = DrugMechanism(
-            drug_name="doxycycline",
-            cyp450_effects=["minimal"],
-            cyp450_enzymes=[],
-            hepatic_metabolism_percent=30.0,
-            renal_elimination_percent=40.0,
-            protein_binding_percent=90.0,
-            therapeutic_class="tetracycline",
-            contraindications=["pregnancy", "young_animals"]
-        )
-        
-        mechanisms["enrofloxacin"] = DrugMechanism(
-            drug_name="enrofloxacin",
-            cyp450_effects=["inhibitor"],
-            cyp450_enzymes=["1A2"],
-            hepatic_metabolism_percent=70.0,
-            renal_elimination_percent=30.0,
-            protein_binding_percent=40.0,
-            therapeutic_class="fluoroquinolone",
-            contraindications=["cartilage_disorders", "young_animals"]
-        )
-        
-        mechanisms["ciprofloxacin"] = DrugMechanism(
-            drug_name="ciprofloxacin",
-            cyp450_effects=["inhibitor"],
-            cyp450_enzymes=["1A2"],
-            hepatic_metabolism_percent=50.0,
-            renal_elimination_percent=50.0,
-            protein_binding_percent=40.0,
-            therapeutic_class="fluoroquinolone",
-            contraindications=["cartilage_disorders", "young_animals"]
-        )
-        
-        mechanisms["cephalexin"] = DrugMechanism(
-            drug_name="cephalexin",
-            cyp450_effects=["minimal"],
-            cyp450_enzymes=[],
-            hepatic_metabolism_percent=10.0,
-            renal_elimination_percent=90.0,
-            protein_binding_percent=15.0,
-            therapeutic_class="cephalosporin",
-            contraindications=["penicillin_allergy"]
-        )
-        
-        mechanisms["metronidazole"] = DrugMechanism(
-            drug_name="metronidazole",
-            cyp450_effects=["inhibitor"],
-            cyp450_enzymes=["2C9"],
-            hepatic_metabolism_percent=80.0,
-            renal_elimination_percent=20.0,
-            protein_binding_percent=10.0,
-            therapeutic_class="nitroimidazole",
-            contraindications=["severe_liver_disease", "neurological_disorders"]
-        )
-        
-        mechanisms["azithromycin"] = DrugMechanism(
-            drug_name="azithromycin",
-            cyp450_effects=["mild_inhibitor"],
-            cyp450_enzymes=["3A4"],
-            hepatic_metabolism_percent=50.0,
-            renal_elimination_percent=12.0,
-            protein_binding_percent=50.0,
-            therapeutic_class="macrolide",
-            contraindications=["severe_liver_disease"]
-        )
-        
-        # Cardiovascular drugs
-        mechanisms["enalapril"] = DrugMechanism(
-            drug_name="enalapril",
-            cyp450_effects=["minimal"],
-            cyp450_enzymes=[],
-            hepatic_metabolism_percent=50.0,
-            renal_elimination_percent=50.0,
-            protein_binding_percent=50.0,
-            therapeutic_class="ace_inhibitor",
-            contraindications=["pregnancy", "bilateral_renal_artery_stenosis"]
-        )
-        
-        mechanisms["pimobendan"] = DrugMechanism(
-            drug_name="pimobendan",
-            cyp450_effects=["substrate"],
-            cyp450_enzymes=["3A4"],
-            hepatic_metabolism_percent=85.0,
-            renal_elimination_percent=15.0,
-            protein_binding_percent=95.0,
-            therapeutic_class="inodilator",
-            contraindications=["hypertrophic_cardiomyopathy"]
-        )
-        
-        mechanisms["furosemide"] = DrugMechanism(
-            drug_name="furosemide",
-            cyp450_effects=["minimal"],
-            cyp450_enzymes=[],
-            hepatic_metabolism_percent=10.0,
-            renal_elimination_percent=90.0,
-            protein_binding_percent=95.0,
-            therapeutic_class="loop_diuretic",
-            contraindications=["anuria", "severe_electrolyte_imbalance"]
-        )
-        
-        mechanisms["diltiazem"] = DrugMechanism(
-            drug_name="diltiazem",
-            cyp450_effects=["inhibitor", "substrate"],
-            cyp450_enzymes=["3A4"],
-            hepatic_metabolism_percent=90.0,
-            renal_elimination_percent=10.0,
-            protein_binding_percent=80.0,
-            therapeutic_class="calcium_channel_blocker",
-            contraindications=["heart_block", "severe_hypotension"]
-        )
-        
-        mechanisms["atenolol"] = DrugMechanism(
-            drug_name="atenolol",
-            cyp450_effects=["minimal"],
-            cyp450_enzymes=[],
-            hepatic_metabolism_percent=10.0,
-            renal_elimination_percent=90.0,
-            protein_binding_percent=5.0,
-            therapeutic_class="beta_blocker",
-            contraindications=["asthma", "severe_bradycardia"]
-        )
-        
-        # Anticonvulsants
-        mechanisms["levetiracetam"] = DrugMechanism(
-            drug_name="levetiracetam",
-            cyp450_effects=["minimal"],
-            cyp450_enzymes=[],
-            hepatic_metabolism_percent=24.0,
-            renal_elimination_percent=66.0,
-            protein_binding_percent=10.0,
-            therapeutic_class="anticonvulsant",
-            contraindications=["severe_kidney_disease"]
-        )
-        
-        mechanisms["zonisamide"] = DrugMechanism(
-            drug_name="zonisamide",
-            cyp450_effects=["substrate"],
-            cyp450_enzymes=["3A4"],
-            hepatic_metabolism_percent=85.0,
-            renal_elimination_percent=15.0,
-            protein_binding_percent=40.0,
-            therapeutic_class="anticonvulsant",
-            contraindications=["sulfonamide_allergy"]
-        )
-        
-        # Emergency/Critical Care drugs
-        mechanisms["dopamine"] = DrugMechanism(
-            drug_name="dopamine",
-            cyp450_effects=["substrate"],
-            cyp450_enzymes=["2D6"],
-            hepatic_metabolism_percent=75.0,
-            renal_elimination_percent=25.0,
-            protein_binding_percent=0.0,
-            therapeutic_class="catecholamine",
-            contraindications=["pheochromocytoma", "ventricular_fibrillation"]
-        )
-        
-        mechanisms["dobutamine"] = DrugMechanism(
-            drug_name="dobutamine",
-            cyp450_effects=["substrate"],
-            cyp450_enzymes=["2D6"],
-            hepatic_metabolism_percent=85.0,
-            renal_elimination_percent=15.0,
-            protein_binding_percent=0.0,
-            therapeutic_class="catecholamine",
-            contraindications=["hypertrophic_cardiomyopathy"]
-        )
-        
-        mechanisms["epinephrine"] = DrugMechanism(
-            drug_name="epinephrine",
-            cyp450_effects=["substrate"],
-            cyp450_enzymes=["2D6"],
-            hepatic_metabolism_percent=90.0,
-            renal_elimination_percent=10.0,
-            protein_binding_percent=0.0,
-            therapeutic_class="catecholamine",
-            contraindications=["ventricular_fibrillation"]
-        )
-        
-        # Antifungals (known CYP450 inhibitors)
-        mechanisms["ketoconazole"] = DrugMechanism(
-            drug_name="ketoconazole",
-            cyp450_effects=["inhibitor"],
-            cyp450_enzymes=["3A4"],
-            hepatic_metabolism_percent=95.0,
-            renal_elimination_percent=5.0,
-            protein_binding_percent=84.0,
-            therapeutic_class="antifungal",
-            contraindications=["liver_disease"]
-        )
-        
-        mechanisms["itraconazole"] = DrugMechanism(
-            drug_name="itraconazole",
-            cyp450_effects=["inhibitor"],
-            cyp450_enzymes=["3A4"],
-            hepatic_metabolism_percent=95.0,
-            renal_elimination_percent=5.0,
-            protein_binding_percent=99.0,
-            therapeutic_class="antifungal",
-            contraindications=["liver_disease", "heart_failure"]
-        )
-        
-        mechanisms["fluconazole"] = DrugMechanism(
-            drug_name="fluconazole",
-            cyp450_effects=["inhibitor"],
-            cyp450_enzymes=["2C9", "2C19"],
-            hepatic_metabolism_percent=80.0,
-            renal_elimination_percent=20.0,
-            protein_binding_percent=12.0,
-            therapeutic_class="antifungal",
-            contraindications=["liver_disease"]
-        )
-        
-        mechanisms["voriconazole"] = DrugMechanism(
-            drug_name="voriconazole",
-            cyp450_effects=["inhibitor", "substrate"],
-            cyp450_enzymes=["2C19", "2C9", "3A4"],
-            hepatic_metabolism_percent=95.0,
-            renal_elimination_percent=5.0,
-            protein_binding_percent=58.0,
-            therapeutic_class="antifungal",
-            contraindications=["liver_disease"]
-        )
-        
-        mechanisms["terbinafine"] = DrugMechanism(
-            drug_name="terbinafine",
-            cyp450_effects=["inhibitor"],
-            cyp450_enzymes=["2D6"],
-            hepatic_metabolism_percent=85.0,
-            renal_elimination_percent=15.0,
-            protein_binding_percent=99.0,
-            therapeutic_class="antifungal",
-            contraindications=["liver_disease"]
-        )
-        
-        return mechanisms
-
     def _initialize_interaction_rules(self) -> List[Dict]:
         """
         Initialize comprehensive mechanism-based interaction rules
@@ -554,6 +322,8 @@ class PharmacologicalReasoningEngine:
                     bool(set(self.drug_mechanisms.get(drug1, DrugMechanism("", [], [], None, None, None, "", [])).cyp450_enzymes) & 
                         set(self.drug_mechanisms.get(drug2, DrugMechanism("", [], [], None, None, None, "", [])).cyp450_enzymes))
                 ),
+                # [i, j]: condition(drugs[i], drugs[j]) over compiled mechanism columns
+                "vector_condition": lambda m: pairwise(m.has_effect("inducer"), m.has_effect("substrate")) & m.shares_enzyme(),
                 "interaction_type": InteractionType.CYP450_INDUCTION,
                 "severity": InteractionSeverity.MODERATE,
                 "mechanism": "CYP450 enzyme induction increases metabolism of substrate drug",
@@ -568,6 +338,7 @@ class PharmacologicalReasoningEngine:
                     bool(set(self.drug_mechanisms.get(drug1, DrugMechanism("", [], [], None, None, None, "", [])).cyp450_enzymes) & 
                         set(self.drug_mechanisms.get(drug2, DrugMechanism("", [], [], None, None, None, "", [])).cyp450_enzymes))
                 ),
+                "vector_condition": lambda m: pairwise(m.has_effect("inhibitor"), m.has_effect("substrate")) & m.shares_enzyme(),
                 "interaction_type": InteractionType.CYP450_INHIBITION,
                 "severity": InteractionSeverity.MAJOR,
                 "mechanism": "CYP450 enzyme inhibition decreases metabolism of substrate drug",
@@ -584,6 +355,7 @@ class PharmacologicalReasoningEngine:
                     self.drug_mechanisms.get(drug1, DrugMechanism("", [], [], None, None, None, "", [])).protein_binding_percent > 95 and
                     self.drug_mechanisms.get(drug2, DrugMechanism("", [], [], None, None, None, "", [])).protein_binding_percent > 95
                 ),
+                "vector_condition": lambda m: pairwise(m.protein_binding > 95, m.protein_binding > 95),
                 "interaction_type": InteractionType.PROTEIN_BINDING,
                 "severity": InteractionSeverity.MODERATE,
                 "mechanism": "Highly protein-bound drugs compete for binding sites",
@@ -598,6 +370,7 @@ class PharmacologicalReasoningEngine:
                     self.drug_mechanisms.get(drug1, DrugMechanism("", [], [], None, None, None, "", [])).therapeutic_class in ["nsaid", "cox2_nsaid"] and
                     self.drug_mechanisms.get(drug2, DrugMechanism("", [], [], None, None, None, "", [])).therapeutic_class in ["nsaid", "cox2_nsaid"]
                 ),
+                "vector_condition": lambda m: pairwise(m.in_class("nsaid", "cox2_nsaid"), m.in_class("nsaid", "cox2_nsaid")),
                 "interaction_type": InteractionType.PHARMACODYNAMIC,
                 "severity": InteractionSeverity.MAJOR,
                 "mechanism": "Additive COX inhibition and GI/renal toxicity",
@@ -612,6 +385,10 @@ class PharmacologicalReasoningEngine:
                     self.drug_mechanisms.get(drug1, DrugMechanism("", [], [], None, None, None, "", [])).therapeutic_class in ["opioid_analgesic", "partial_opioid_agonist"] and
                     self.drug_mechanisms.get(drug2, DrugMechanism("", [], [], None, None, None, "", [])).therapeutic_class in ["benzodiazepine", "phenothiazine", "general_anesthetic"]
                 ),
+                "vector_condition": lambda m: pairwise(
+                    m.in_class("opioid_analgesic", "partial_opioid_agonist"),
+                    m.in_class("benzodiazepine", "phenothiazine", "general_anesthetic")
+                ),
                 "interaction_type": InteractionType.PHARMACODYNAMIC,
                 "severity": InteractionSeverity.MAJOR,
                 "mechanism": "Additive CNS and respiratory depression",
@@ -626,6 +403,7 @@ class PharmacologicalReasoningEngine:
                     self.drug_mechanisms.get(drug1, DrugMechanism("", [], [], None, None, None, "", [])).therapeutic_class == "ace_inhibitor" and
                     self.drug_mechanisms.get(drug2, DrugMechanism("", [], [], None, None, None, "", [])).therapeutic_class == "loop_diuretic"
                 ),
+                "vector_condition": lambda m: pairwise(m.in_class("ace_inhibitor"), m.in_class("loop_diuretic")),
                 "interaction_type": InteractionType.PHARMACODYNAMIC,
                 "severity": InteractionSeverity.MODERATE,
                 "mechanism": "Additive hypotensive effects",
@@ -640,6 +418,7 @@ class PharmacologicalReasoningEngine:
                     self.drug_mechanisms.get(drug1, DrugMechanism("", [], [], None, None, None, "", [])).therapeutic_class == "fluoroquinolone" and
                     self.drug_mechanisms.get(drug2, DrugMechanism("", [], [], None, None, None, "", [])).therapeutic_class in ["nsaid", "cox2_nsaid"]
                 ),
+                "vector_condition": lambda m: pairwise(m.in_class("fluoroquinolone"), m.in_class("nsaid", "cox2_nsaid")),
                 "interaction_type": InteractionType.PHARMACODYNAMIC,
                 "severity": InteractionSeverity.MODERATE,
                 "mechanism": "GABA receptor antagonism increases seizure risk",
@@ -654,6 +433,7 @@ class PharmacologicalReasoningEngine:
                     self.drug_mechanisms.get(drug1, DrugMechanism("", [], [], None, None, None, "", [])).hepatic_metabolism_percent and
                     self.drug_mechanisms.get(drug1, DrugMechanism("", [], [], None, None, None, "", [])).hepatic_metabolism_percent > 70
                 ),
+                "vector_condition": lambda m: pairwise(m.hepatic_metabolism > 70, np.ones(len(m.drugs), dtype=bool)),
                 "interaction_type": InteractionType.HEPATIC_METABOLISM,
                 "severity": InteractionSeverity.MODERATE,
                 "mechanism": "High hepatic metabolism dependency",
@@ -670,6 +450,7 @@ class PharmacologicalReasoningEngine:
                     self.drug_mechanisms.get(drug1, DrugMechanism("", [], [], None, None, None, "", [])).renal_elimination_percent > 80 and
                     self.drug_mechanisms.get(drug2, DrugMechanism("", [], [], None, None, None, "", [])).renal_elimination_percent > 80
                 ),
+                "vector_condition": lambda m: pairwise(m.renal_elimination > 80, m.renal_elimination > 80),
                 "interaction_type": InteractionType.RENAL_ELIMINATION,
                 "severity": InteractionSeverity.MODERATE,
                 "mechanism": "Competition for renal elimination pathways",
@@ -686,6 +467,7 @@ class PharmacologicalReasoningEngine:
                     bool(set(self.drug_mechanisms.get(drug1, DrugMechanism("", [], [], None, None, None, "", [])).cyp450_enzymes) & 
                         set(self.drug_mechanisms.get(drug2, DrugMechanism("", [], [], None, None, None, "", [])).cyp450_enzymes))
                 ),
+                "vector_condition": lambda m: pairwise(m.in_class("antifungal"), m.has_effect("substrate")) & m.shares_enzyme(),
                 "interaction_type": InteractionType.CYP450_INHIBITION,
                 "severity": InteractionSeverity.MAJOR,
                 "mechanism": "Potent antifungal CYP450 inhibition",
@@ -700,6 +482,7 @@ class PharmacologicalReasoningEngine:
                     self.drug_mechanisms.get(drug1, DrugMechanism("", [], [], None, None, None, "", [])).therapeutic_class == "beta_lactam_antibiotic" and
                     self.drug_mechanisms.get(drug2, DrugMechanism("", [], [], None, None, None, "", [])).therapeutic_class == "beta_lactamase_inhibitor"
                 ),
+                "vector_condition": lambda m: pairwise(m.in_class("beta_lactam_antibiotic"), m.in_class("beta_lactamase_inhibitor")),
                 "interaction_type": InteractionType.PHARMACODYNAMIC,
                 "severity": InteractionSeverity.MINOR,
                 "mechanism": "Beta-lactamase inhibition enhances antibiotic efficacy",
@@ -710,6 +493,20 @@ class PharmacologicalReasoningEngine:
         
         return rules
 
+    def analyze_context_interactions(self, context: ClinicalContext) -> List[DrugInteraction]:
+        """
+        Interactions among the drugs recognised in a clinical context, given its patient conditions
+        """
+        return self.analyze_drug_interactions(context.drugs, context.conditions)
+
+    def analyze_context_hepatic_metabolism(self, context: ClinicalContext) -> Optional[Dict[str, Dict[str, any]]]:
+        """
+        Hepatic metabolism principles for each recognised drug when the query raises hepatic concerns
+        """
+        if not context.hepatic_concern:
+            return None
+        return {drug: self.get_hepatic_metabolism_principle(drug) for drug in context.drugs}
+
     def analyze_drug_interactions(self, drugs: List[str], patient_conditions: Optional[List[str]] = None) -> List[DrugInteraction]:
         """
         Comprehensive drug interaction analysis based on pharmacological mechanisms
@@ -738,7 +535,196 @@ class PharmacologicalReasoningEngine:
 
     def _analyze_drug_pair(self, drug1: str, drug2: str, conditions: List[str]) -> List[DrugInteraction]:
         """
-        Analyze interactions between two specific drugs
+        Analyze interactions between two specific drugs (a lookup in the precomputed pair table)
+        """
+        records = self.interaction_table.lookup(drug1, drug2)
+        if records is None:
+            return self._evaluate_drug_pair(drug1, drug2, conditions)
+        return [
+            DrugInteraction(drug_a, drug_b, InteractionType(interaction_type), InteractionSeverity(severity),
+                            mechanism, clinical_effect, management, confidence)
+            for drug_a, drug_b, interaction_type, severity, mechanism, clinical_effect, management, confidence in records
+        ]
+
+    @property
+    def drug_mechanisms(self) -> Dict[str, DrugMechanism]:
+        """The current mechanism database from the reference data file"""
+        return self._sync_reference_data()
+
+    def _sync_reference_data(self) -> Dict[str, DrugMechanism]:
+        """Drop everything derived from an older version of the mechanism database after a reload"""
+        mechanisms = self.reference_data.drug_mechanisms
+        if mechanisms is not self._mechanisms_source:
+            with self._interaction_table_lock:
+                if mechanisms is not self._mechanisms_source:
+                    self._interaction_table = None
+                    self._rules_fingerprint = None
+                    self._mechanisms_source = mechanisms
+        return mechanisms
+
+    @property
+    def compiled_mechanisms(self) -> CompiledMechanisms:
+        """Mechanisms as bitset/NumPy columns for vectorized all-pairs rule evaluation"""
+        return self._compiled_index()[0]
+
+    def _compiled_index(self) -> Tuple[CompiledMechanisms, Dict[str, int]]:
+        """The compiled mechanisms and each drug's row in them"""
+        mechanisms = self._sync_reference_data()
+        compiled = self._compiled
+        if compiled is None or compiled[0] is not mechanisms:
+            columns = CompiledMechanisms.compile(mechanisms)
+            compiled = self._compiled = (mechanisms, columns, {drug: row for row, drug in enumerate(columns.drugs)})
+        return compiled[1], compiled[2]
+
+    @property
+    def interaction_table(self) -> DrugInteractionTable:
+        """The ordered-pair interaction table, built on first use unless a current rebuild is on disk"""
+        self._sync_reference_data()
+        if self._interaction_table is None:
+            with self._interaction_table_lock:
+                if self._interaction_table is None:
+                    self._interaction_table = self._load_interaction_table()
+        return self._interaction_table
+
+    def _load_interaction_table(self) -> DrugInteractionTable:
+        fingerprint = self.interaction_rules_fingerprint()
+        if self.interaction_table_path and os.path.exists(self.interaction_table_path):
+            try:
+                table = DrugInteractionTable.load(self.interaction_table_path)
+                if table.fingerprint == fingerprint:
+                    return table
+                self.logger.warning(f"Interaction table {self.interaction_table_path} is stale - "
+                                    "run 'python pharmacological_reasoning_engine.py --rebuild-interaction-table'")
+            except (OSError, ValueError, KeyError, IndexError) as e:
+                self.logger.warning(f"Interaction table {self.interaction_table_path} unreadable: {e}")
+        return self.build_interaction_table()
+
+    def interaction_rules_fingerprint(self) -> str:
+        """Hash of the mechanism database and the rule code, so any edit invalidates a saved table"""
+        if self._rules_fingerprint is None:
+            self._rules_fingerprint = self._compute_rules_fingerprint()
+        return self._rules_fingerprint
+
+    def _compute_rules_fingerprint(self) -> str:
+        material = json.dumps({name: mechanism._asdict() for name, mechanism in sorted(self.drug_mechanisms.items())},
+                              sort_keys=True)
+        for method in (self._initialize_interaction_rules, self._evaluate_drug_pair, self._check_specific_interactions,
+                       self.evaluate_interaction_matrix, CompiledMechanisms.compile):
+            try:
+                material += inspect.getsource(method)
+            except (OSError, TypeError):
+                # No source files in this deployment: the compiled code identifies the rules instead
+                material += marshal.dumps(method.__code__).hex()
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()[:16]
+
+    def build_interaction_table(self) -> DrugInteractionTable:
+        """Evaluate the rules for every ordered pair of known drugs in one vectorized pass"""
+        drugs = self.compiled_mechanisms.drugs
+        pairs = {
+            index1 * len(drugs) + index2: tuple(
+                (i.drug1, i.drug2, i.interaction_type.value, i.severity.value,
+                 i.mechanism, i.clinical_effect, i.management, i.confidence)
+                for i in interactions
+            )
+            for (index1, index2), interactions in self.evaluate_interaction_matrix(drugs).items()
+        }
+        return DrugInteractionTable(drugs, pairs, self.interaction_rules_fingerprint())
+
+    def evaluate_interaction_matrix(self, drugs: List[str]) -> Dict[Tuple[int, int], List[DrugInteraction]]:
+        """
+        Rule-based analysis of every ordered pair of a medication list at once: each rule's
+        vector_condition is evaluated over the whole list, then (i, j) -> the interactions
+        _evaluate_drug_pair(drugs[i], drugs[j]) gives; pairs without interactions are omitted
+        """
+        all_compiled, rows = self._compiled_index()
+        known = [position for position, drug in enumerate(drugs) if drug in rows]
+        compiled_position = {position: index for index, position in enumerate(known)}
+        compiled = all_compiled.select(np.array([rows[drugs[position]] for position in known], dtype=np.intp))
+        
+        # matches[i, j, r]: rule r applies to drugs i and j in either order
+        matches = np.stack([rule["vector_condition"](compiled) for rule in self.interaction_rules], axis=-1)
+        matches |= matches.transpose(1, 0, 2)
+        rule_hits: Dict[Tuple[int, int], List[int]] = {}
+        for a, b, rule_index in zip(*np.nonzero(matches)):
+            rule_hits.setdefault((int(a), int(b)), []).append(int(rule_index))
+        
+        results: Dict[Tuple[int, int], List[DrugInteraction]] = {}
+        for position1, drug1 in enumerate(drugs):
+            for position2, drug2 in enumerate(drugs):
+                if drug1 not in rows or drug2 not in rows:
+                    results[(position1, position2)] = self._evaluate_drug_pair(drug1, drug2, [])
+                    continue
+                interactions = [
+                    DrugInteraction(drug1, drug2, rule["interaction_type"], rule["severity"], rule["mechanism"],
+                                    rule["clinical_effect"], rule["management"], 0.8)
+                    for rule in (self.interaction_rules[r] for r in rule_hits.get(
+                        (compiled_position[position1], compiled_position[position2]), ()))
+                ]
+                interactions.extend(self._check_specific_interactions(drug1, drug2))
+                if interactions:
+                    results[(position1, position2)] = interactions
+        return results
+
+    def rebuild_interaction_table(self, path: Optional[str] = None) -> DrugInteractionTable:
+        """Recompute the table from the rules and save it for later processes"""
+        table = self.build_interaction_table()
+        table.save(path or self.interaction_table_path)
+        with self._interaction_table_lock:
+            self._interaction_table = table
+        return table
+
+    def verify_interaction_table(self) -> List[Tuple[str, str]]:
+        """Ordered pairs whose table lookup disagrees with the rule-based evaluation (empty when consistent)"""
+        mismatches = []
+        for drug1 in self.drug_mechanisms:
+            for drug2 in self.drug_mechanisms:
+                if self._analyze_drug_pair(drug1, drug2, []) != self._evaluate_drug_pair(drug1, drug2, []):
+                    mismatches.append((drug1, drug2))
+        return mismatches
+
+    @property
+    def interaction_index(self) -> InteractionIndex:
+        """Reverse index of the current interaction table, rebuilt whenever the table is"""
+        table = self.interaction_table
+        cached = self._interaction_index
+        if cached is None or cached[0] is not table:
+            cached = self._interaction_index = (table, InteractionIndex(table, self.drug_mechanisms))
+        return cached[1]
+
+    def find_interacting_drugs(self, drug: Optional[str] = None, enzyme: Optional[str] = None,
+                               therapeutic_class: Optional[str] = None,
+                               severities: Optional[Iterable[InteractionSeverity]] = None,
+                               interaction_types: Optional[Iterable[InteractionType]] = None,
+                               formulary: Optional[Iterable[str]] = None) -> List[InteractingPartner]:
+        """
+        What interacts with a drug, or with any drug acting on a CYP450 enzyme or in a therapeutic
+        class (give exactly one), most severe first; optionally limited to some severities and
+        interaction types, and to partners on a formulary
+        """
+        if sum(value is not None for value in (drug, enzyme, therapeutic_class)) != 1:
+            raise ValueError("Give exactly one of drug, enzyme or therapeutic_class")
+        index = self.interaction_index
+        if drug is not None:
+            queried = [self._normalize_drug_name(drug)]
+        elif enzyme is not None:
+            queried = index.drugs_with_enzyme(enzyme)
+        else:
+            queried = index.drugs_in_class(therapeutic_class)
+        
+        severities = None if severities is None else set(severities)
+        interaction_types = None if interaction_types is None else set(interaction_types)
+        formulary_names = None if formulary is None else {self._normalize_drug_name(name) for name in formulary}
+        
+        results = []
+        for queried_drug in queried:
+            for partner, interactions in index.partners(queried_drug, severities, interaction_types, formulary_names).items():
+                results.append(InteractingPartner(partner, queried_drug, interactions[0].severity, interactions))
+        results.sort(key=lambda result: (-SEVERITY_RANK[result.severity], result.interacts_with, result.drug))
+        return results
+
+    def _evaluate_drug_pair(self, drug1: str, drug2: str, conditions: List[str]) -> List[DrugInteraction]:
+        """
+        Rule-based pair analysis: the source of the interaction table
         """
         interactions = []
         
@@ -969,7 +955,7 @@ class PharmacologicalReasoningEngine:
             "hepatic_metabolism_percent": hepatic_percent,
             "principle": principle,
             "clinical_significance": clinical_significance,
-            "contraindications": mechanism.contraindications
+            "contraindications": list(mechanism.contraindications)
         }
 
     def generate_interaction_report(self, interactions: List[DrugInteraction]) -> str:
@@ -1023,9 +1009,39 @@ class PharmacologicalReasoningEngine:
         return "\n".join(report)
 
 def main():
-    """Test the pharmacological reasoning engine"""
+    """
+    Test the pharmacological reasoning engine; --rebuild-interaction-table saves the ordered-pair
+    table, --verify-interaction-table checks it against the rule-based path (exit status 1 on mismatch),
+    --interacts-with DRUG lists the formulary drugs that interact with DRUG
+    """
     engine = PharmacologicalReasoningEngine()
     
+    if '--interacts-with' in sys.argv:
+        drug = sys.argv[sys.argv.index('--interacts-with') + 1]
+        partners = engine.find_interacting_drugs(drug, formulary=load_formulary())
+        print(f"\n🔁 {len(partners)} formulary drugs interact with {drug}:")
+        for partner in partners:
+            kinds = ", ".join(dict.fromkeys(i.interaction_type.value for i in partner.interactions))
+            print(f"   • {partner.drug} [{partner.severity.value}] {kinds}")
+        return
+    
+    if '--rebuild-interaction-table' in sys.argv:
+        start = time.perf_counter()
+        table = engine.rebuild_interaction_table()
+        print(f"✅ Interaction table {table.fingerprint}: {len(table)} ordered pairs of {len(table.drugs)} drugs "
+              f"in {(time.perf_counter() - start) * 1000:.1f} ms -> {engine.interaction_table_path}")
+    
+    if '--verify-interaction-table' in sys.argv:
+        table = engine.interaction_table
+        mismatches = engine.verify_interaction_table()
+        if mismatches:
+            print(f"❌ Interaction table {table.fingerprint} disagrees with the rules for {len(mismatches)} pairs:")
+            for drug1, drug2 in mismatches[:20]:
+                print(f"   • {drug1} + {drug2}")
+            sys.exit(1)
+        print(f"✅ Interaction table {table.fingerprint} matches the rules for all {len(table)} ordered pairs")
+        return
+    
     print("\n🧪 TESTING PHARMACOLOGICAL REASONING ENGINE")
     print("=" * 60)
     
@@ -1051,6 +1067,49 @@ def main():
     
     if hepatic_info['contraindications']:
         print(f"🚫 Contraindications: {', '.join(hepatic_info['contraindications'])}")
+    
+    # Test Case 3: Geriatric polypharmacy
+    print(f"\n📋 Test Case 3: Polypharmacy (12 drugs)")
+    print("-" * 50)
+    
+    medications = ["phenobarbital", "gabapentin", "meloxicam", "enalapril", "furosemide", "pimobendan",
+                   "tramadol", "metronidazole", "ketoconazole", "diazepam", "diltiazem", "atenolol"]
+    start = time.perf_counter()
+    interactions = engine.analyze_drug_interactions(medications)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    severities = {}
+    for interaction in interactions:
+        severities[interaction.severity.value] = severities.get(interaction.severity.value, 0) + 1
+    print(f"⚡ {len(interactions)} interactions across {len(medications) * (len(medications) - 1) // 2} pairs "
+          f"in {elapsed_ms:.2f} ms: {severities}")
+    
+    # Test Case 4: Reverse lookups over the whole mechanism database
+    print(f"\n📋 Test Case 4: What interacts with ketoconazole? (major or worse)")
+    print("-" * 50)
+    
+    serious = [InteractionSeverity.MAJOR, InteractionSeverity.CONTRAINDICATED]
+    start = time.perf_counter()
+    engine.interaction_index
+    print(f"🗂️ Reverse index built in {(time.perf_counter() - start) * 1000:.2f} ms")
+    start = time.perf_counter()
+    partners = engine.find_interacting_drugs("ketoconazole", severities=serious)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    print(f"⚡ {len(partners)} partners in {elapsed_ms:.3f} ms: {', '.join(partner.drug for partner in partners)}")
+    
+    start = time.perf_counter()
+    brute_force = [other for other in engine.drug_mechanisms if other != "ketoconazole" and any(
+        interaction.severity in serious for interaction in engine._analyze_drug_pair("ketoconazole", other, []))]
+    print(f"   Pair-by-pair scan: {len(brute_force)} partners in {(time.perf_counter() - start) * 1000:.3f} ms")
+    
+    cyp3a4 = engine.find_interacting_drugs(enzyme="CYP3A4", interaction_types=[InteractionType.CYP450_INHIBITION])
+    print(f"🧬 CYP3A4 inhibition: {len(cyp3a4)} drug pairs, e.g. "
+          f"{', '.join(f'{p.interacts_with} + {p.drug}' for p in cyp3a4[:3])}")
+    
+    formulary = load_formulary()
+    covered = {engine._normalize_drug_name(name) for name in formulary} & set(engine.drug_mechanisms)
+    nsaid_partners = engine.find_interacting_drugs(therapeutic_class="nsaid", severities=serious, formulary=formulary)
+    print(f"📚 Formulary: {len(covered)} of {len(formulary)} drugs have mechanism data; "
+          f"major NSAID interactions: {', '.join(sorted({p.drug for p in nsaid_partners}))}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
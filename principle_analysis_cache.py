@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Principle Analysis Cache
+Persistent cache for Claude principle analyses: a bounded in-process LRU in front of a shared
+SQLite store of parsed JSON results, keyed by a normalized form of the query so near-identical
+wordings ("What are the interactions of Clavamox in dogs?" / "clavamox interactions dog")
+share one analysis
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "limosa", "principle_analyses.sqlite3")
+
+# Words that do not change which principles a clinical question touches
+STOPWORDS = {
+    "a", "an", "the", "is", "are", "was", "were", "be", "been", "has", "have", "had", "do", "does", "did",
+    "will", "would", "could", "should", "may", "might", "can", "must", "and", "or", "but", "in", "on", "at",
+    "to", "for", "of", "with", "by", "from", "into", "about", "between", "as", "than", "that", "this",
+    "these", "those", "it", "its", "there", "what", "which", "who", "whom", "how", "when", "where", "why",
+    "i", "me", "my", "we", "our", "you", "your", "please", "tell", "explain", "any", "some",
+}
+
+# Brand and shorthand names mapped to the generic name the principle analysis reasons about
+DRUG_CANONICAL_NAMES = {
+    "clavamox": "amoxicillin-clavulanate",
+    "augmentin": "amoxicillin-clavulanate",
+    "rimadyl": "carprofen",
+    "metacam": "meloxicam",
+    "previcox": "firocoxib",
+    "onsior": "robenacoxib",
+    "vetmedin": "pimobendan",
+    "lasix": "furosemide",
+    "baytril": "enrofloxacin",
+    "convenia": "cefovecin",
+    "cerenia": "maropitant",
+    "apoquel": "oclacitinib",
+    "luminal": "phenobarbital",
+    "kbr": "potassium-bromide",
+    "dexdomitor": "dexmedetomidine",
+    "domitor": "medetomidine",
+}
+
+class PrincipleAnalysisCache:
+    def __init__(self, path: Optional[str] = None, memory_size: Optional[int] = None,
+                 max_disk_entries: Optional[int] = None):
+        """
+        path: SQLite file for the shared tier (LIMOSA_PRINCIPLE_CACHE, empty string keeps it in memory only)
+        memory_size: analyses kept in the in-process LRU (LIMOSA_PRINCIPLE_CACHE_SIZE)
+        max_disk_entries: rows kept on disk before the least recently used are evicted (LIMOSA_PRINCIPLE_CACHE_MAX_ROWS)
+        """
+        self.logger = logging.getLogger(__name__)
+
+        self.path = os.path.expanduser(
+            path if path is not None else os.getenv('LIMOSA_PRINCIPLE_CACHE', DEFAULT_CACHE_PATH)
+        )
+        self.memory_size = memory_size if memory_size is not None else int(
+            os.getenv('LIMOSA_PRINCIPLE_CACHE_SIZE', 1024)
+        )
+        self.max_disk_entries = max_disk_entries if max_disk_entries is not None else int(
+            os.getenv('LIMOSA_PRINCIPLE_CACHE_MAX_ROWS', 20000)
+        )
+
+        self._memory: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes_since_prune = 0
+        self.stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'stores': 0, 'evicted': 0}
+
+        self._db = self._open_disk_tier() if self.path else None
+
+    def _open_disk_tier(self) -> Optional[sqlite3.Connection]:
+        """Open (or create) the shared SQLite store; falls back to memory-only on failure"""
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            db = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False)
+            # WAL lets several worker processes read while one writes
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS principle_analyses ("
+                "key TEXT PRIMARY KEY, normalized_query TEXT NOT NULL, db_version TEXT NOT NULL, "
+                "analysis TEXT NOT NULL, created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            db.execute(
+                "CREATE INDEX IF NOT EXISTS principle_analyses_accessed_at ON principle_analyses (accessed_at)"
+            )
+            db.commit()
+            return db
+        except sqlite3.Error as e:
+            self.logger.warning(f"Principle analysis cache disk tier disabled ({self.path}): {e}")
+            return None
+
+    @staticmethod
+    def normalize_query(query: str) -> str:
+        """
+        Lowercased words and numbers with stopwords removed, simple plurals folded and drug
+        brand names replaced by their generic name
+        """
+        terms = []
+        for word in re.findall(r"[a-z0-9]+(?:[.\-/][a-z0-9]+)*", query.lower()):
+            if word in STOPWORDS:
+                continue
+            word = DRUG_CANONICAL_NAMES.get(word, word)
+            if len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "us", "is")):
+                word = word[:-1]
+            terms.append(word)
+        return " ".join(terms)
+
+    @classmethod
+    def cache_key(cls, query: str, principle_names: Iterable[str], db_version: str) -> str:
+        """
+        Keys cover the normalized query, the locally identified principles sent with it and the
+        principle-database version, so editing the database never serves stale analyses
+        """
+        material = "\x00".join([db_version, cls.normalize_query(query), ",".join(sorted(principle_names))])
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Cached analysis for key, or None"""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.stats['memory_hits'] += 1
+                return json.loads(self._memory[key])
+
+            payload = self._read_disk(key) if self._db is not None else None
+            if payload is None:
+                self.stats['misses'] += 1
+                return None
+            self._remember(key, payload)
+            self.stats['disk_hits'] += 1
+            return json.loads(payload)
+
+    def put(self, key: str, query: str, db_version: str, analysis: Dict):
+        """Store a parsed analysis in both tiers"""
+        payload = json.dumps(analysis)
+        now = time.time()
+
+        with self._lock:
+            self._remember(key, payload)
+            self.stats['stores'] += 1
+            if self._db is not None:
+                self._write_disk((key, self.normalize_query(query), db_version, payload, now, now))
+
+    def _remember(self, key: str, payload: str):
+        """Insert into the memory LRU, evicting the least recently used entries"""
+        self._memory[key] = payload
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def _read_disk(self, key: str) -> Optional[str]:
+        """Fetch an analysis from the shared store, marking it recently used"""
+        try:
+            row = self._db.execute("SELECT analysis FROM principle_analyses WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                self._db.execute("UPDATE principle_analyses SET accessed_at = ? WHERE key = ?", (time.time(), key))
+                self._db.commit()
+        except sqlite3.Error as e:
+            self.logger.warning(f"Principle analysis cache read failed: {e}")
+            return None
+        return row[0] if row is not None else None
+
+    def _write_disk(self, row: tuple):
+        """Persist a row and periodically evict the least recently used beyond max_disk_entries"""
+        try:
+            self._db.execute("INSERT OR REPLACE INTO principle_analyses VALUES (?, ?, ?, ?, ?, ?)", row)
+            self._writes_since_prune += 1
+            if self._writes_since_prune >= 100:
+                self._writes_since_prune = 0
+                cursor = self._db.execute(
+                    "DELETE FROM principle_analyses WHERE key IN ("
+                    "SELECT key FROM principle_analyses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_disk_entries,)
+                )
+                self.stats['evicted'] += max(cursor.rowcount, 0)
+            self._db.commit()
+        except sqlite3.Error as e:
+            self.logger.warning(f"Principle analysis cache write failed: {e}")
+
+    def get_stats(self) -> Dict[str, float]:
+        """Hit/miss counters plus the overall hit rate"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats['memory_entries'] = len(self._memory)
+        lookups = stats['memory_hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_rate'] = (stats['memory_hits'] + stats['disk_hits']) / lookups if lookups else 0.0
+        return stats
+
+    def close(self):
+        """Close the shared store"""
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+def main():
+    """Show cache statistics for the configured store"""
+    print("🧠 PRINCIPLE ANALYSIS CACHE")
+    print("=" * 50)
+
+    cache = PrincipleAnalysisCache()
+    print(f"📁 Store: {cache.path or 'memory only'}")
+    if cache._db is not None:
+        count, size = cache._db.execute(
+            "SELECT COUNT(*), COALESCE(SUM(LENGTH(analysis)), 0) FROM principle_analyses"
+        ).fetchone()
+        print(f"📊 Cached analyses: {count} ({size / 1024:.1f} KB)")
+        for db_version, version_count in cache._db.execute(
+            "SELECT db_version, COUNT(*) FROM principle_analyses GROUP BY db_version"
+        ).fetchall():
+            print(f"   principle DB {db_version}: {version_count}")
+    cache.close()
+
+if __name__ == "__main__":
+    main()
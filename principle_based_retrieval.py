@@ -9,13 +9,17 @@ import sys
 sys.path.append('.')
 sys.path.append('comprehensive_veterinary_drugs_database/production_code')
 
+import hashlib
 import json
 import re
 from typing import Dict, List, Tuple, Optional, Set
-from dataclasses import dataclass
+from dataclasses import dataclass, asdict
 import logging
-from anthropic import Anthropic
+from anthropic import Anthropic, AsyncAnthropic
 import os
+from principle_analysis_cache import PrincipleAnalysisCache
+from local_principle_classifier import LocalPrincipleClassifier
+from clinical_entity_recognizer import ClinicalContext, ClinicalEntityRecognizer
 
 @dataclass
 class VeterinaryPrinciple:
@@ -36,6 +40,8 @@ class PrincipleBasedRetrieval:
     Enhanced knowledge retrieval using veterinary principle recognition
     """
     
+    PRINCIPLE_ANALYSIS_MODEL = "claude-3-5-haiku-20241022"
+    
     def __init__(self):
         """Initialize the principle-based retrieval system"""
         self.logger = logging.getLogger(__name__)
@@ -46,12 +52,50 @@ class PrincipleBasedRetrieval:
         except Exception as e:
             self.logger.warning(f"Could not initialize Anthropic client: {e}")
             self.anthropic_client = None
+        # Async client for aanalyze_query_principles, created on first use
+        self._async_anthropic_client = None
         
         # Core veterinary principle database
         self.principle_database = self._initialize_principle_database()
+        self.principle_db_version = self.principle_database_version()
+        
+        # Parsed Claude analyses are reused across near-identical queries and processes
+        self.analysis_cache = PrincipleAnalysisCache()
+        # Confident local matches skip the Claude analysis entirely
+        self.principle_classifier = LocalPrincipleClassifier(self.principle_database)
+        # One pass over the query finds principle triggers alongside drugs, species and conditions
+        self.entity_recognizer = ClinicalEntityRecognizer(self.principle_classifier.terms)
         
         print("🧠 Principle-Based Retrieval System initialized")
         print(f"📚 Veterinary principles loaded: {len(self.principle_database)}")
+        print(f"🧭 Local principle classifier: {self.principle_classifier.mode} mode "
+              f"(escalates to Claude below {self.principle_classifier.escalation_threshold:.2f} confidence)")
+        print(f"🗄️ Principle analysis cache: {self.analysis_cache.path or 'memory only'} (DB version {self.principle_db_version})")
+
+    def close(self):
+        """Close the Anthropic client connection and the analysis cache"""
+        self.analysis_cache.close()
+        if self.anthropic_client:
+            try:
+                self.anthropic_client.close()
+            except Exception as e:
+                self.logger.warning(f"Error closing Anthropic client: {e}")
+
+    @property
+    def async_anthropic_client(self) -> AsyncAnthropic:
+        if self._async_anthropic_client is None:
+            self._async_anthropic_client = AsyncAnthropic(api_key=os.getenv('ANTHROPIC_API_KEY'))
+        return self._async_anthropic_client
+
+    async def aclose(self):
+        """Close the async client on its event loop, then the sync client"""
+        if self._async_anthropic_client is not None:
+            try:
+                await self._async_anthropic_client.close()
+            except Exception as e:
+                self.logger.warning(f"Error closing async Anthropic client: {e}")
+            self._async_anthropic_client = None
+        self.close()
 
     def _initialize_principle_database(self) -> Dict[str, List[VeterinaryPrinciple]]:
         """
@@ -130,18 +174,55 @@ class PrincipleBasedRetrieval:
         
         return principles
 
-    def analyze_query_principles(self, query: str) -> PrincipleSearchResult:
+    def principle_database_version(self) -> str:
+        """
+        Short hash of the principle database and analysis model; cached analyses from any other
+        version are never served
+        """
+        content = {
+            'model': self.PRINCIPLE_ANALYSIS_MODEL,
+            'principles': {category: [asdict(p) for p in principles] for category, principles in self.principle_database.items()}
+        }
+        return hashlib.sha256(json.dumps(content, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+
+    def analyze_query_principles(self, query: str, context: Optional[ClinicalContext] = None) -> PrincipleSearchResult:
         """
         Analyze query to identify underlying veterinary principles using Claude's reasoning
+        (context: the query's recognised clinical context, if already extracted)
         """
         self.logger.info(f"🧠 Analyzing veterinary principles in query: {query[:100]}...")
         
         # First, identify principles using local database
-        local_principles = self._identify_local_principles(query)
+        classification = self.principle_classifier.classify(context or self.entity_recognizer.recognize(query))
+        local_principles = classification.principles
         
-        # Then enhance with Claude's reasoning if available
-        if self.anthropic_client:
+        # Then enhance with Claude's reasoning if available and the local match is not confident
+        claude_analysis = None
+        if self.anthropic_client and classification.escalate:
             claude_analysis = self._get_claude_principle_analysis(query, local_principles)
+        
+        return self._build_principle_result(query, local_principles, claude_analysis)
+
+    async def aanalyze_query_principles(self, query: str, context: Optional[ClinicalContext] = None) -> PrincipleSearchResult:
+        """
+        Async analyze_query_principles: the Claude analysis runs on the async client
+        """
+        self.logger.info(f"🧠 Analyzing veterinary principles in query: {query[:100]}...")
+        
+        classification = self.principle_classifier.classify(context or self.entity_recognizer.recognize(query))
+        local_principles = classification.principles
+        claude_analysis = None
+        if self.anthropic_client and classification.escalate:
+            claude_analysis = await self._aget_claude_principle_analysis(query, local_principles)
+        
+        return self._build_principle_result(query, local_principles, claude_analysis)
+
+    def _build_principle_result(self, query: str, local_principles: List[VeterinaryPrinciple],
+                                claude_analysis: Optional[Dict]) -> PrincipleSearchResult:
+        """
+        Merge the optional Claude analysis into the local principles and expand search terms
+        """
+        if claude_analysis is not None:
             enhanced_principles = self._merge_principle_analyses(local_principles, claude_analysis)
         else:
             enhanced_principles = local_principles
@@ -159,29 +240,68 @@ class PrincipleBasedRetrieval:
             reasoning_chain=reasoning_chain
         )
 
-    def _identify_local_principles(self, query: str) -> List[VeterinaryPrinciple]:
+    def get_stats(self) -> Dict[str, Dict]:
+        """Classifier escalation rate and analysis cache hit rate"""
+        return {
+            'classifier': self.principle_classifier.get_stats(),
+            'analysis_cache': self.analysis_cache.get_stats()
+        }
+
+    def _get_claude_principle_analysis(self, query: str, local_principles: List[VeterinaryPrinciple]) -> Dict:
         """
-        Identify veterinary principles using local pattern matching
+        Get Claude's analysis of veterinary principles in the query (cached)
         """
-        identified = []
-        query_lower = query.lower()
+        cache_key = self._analysis_cache_key(query, local_principles)
+        cached_analysis = self.analysis_cache.get(cache_key)
+        if cached_analysis is not None:
+            return cached_analysis
         
-        for category, principles in self.principle_database.items():
-            for principle in principles:
-                # Check if any related terms appear in query
-                if any(term in query_lower for term in principle.related_terms):
-                    identified.append(principle)
+        try:
+            response = self.anthropic_client.messages.create(**self._principle_analysis_request(query, local_principles))
+            
+            analysis = json.loads(response.content[0].text)
+            
+        except Exception as e:
+            self.logger.warning(f"Claude principle analysis failed: {e}")
+            return {"additional_principles": [], "clinical_reasoning": ""}
         
-        return identified
+        self.analysis_cache.put(cache_key, query, self.principle_db_version, analysis)
+        return analysis
 
-    def _get_claude_principle_analysis(self, query: str, local_principles: List[VeterinaryPrinciple]) -> Dict:
+    async def _aget_claude_principle_analysis(self, query: str, local_principles: List[VeterinaryPrinciple]) -> Dict:
         """
-        Get Claude's analysis of veterinary principles in the query
+        Async _get_claude_principle_analysis
         """
+        cache_key = self._analysis_cache_key(query, local_principles)
+        cached_analysis = self.analysis_cache.get(cache_key)
+        if cached_analysis is not None:
+            return cached_analysis
+        
         try:
-            local_principle_names = [p.principle for p in local_principles]
+            response = await self.async_anthropic_client.messages.create(
+                **self._principle_analysis_request(query, local_principles)
+            )
+            
+            analysis = json.loads(response.content[0].text)
             
-            prompt = f"""You are a veterinary medical expert analyzing a clinical query to identify underlying veterinary principles that should guide knowledge retrieval from a veterinary textbook database.
+        except Exception as e:
+            self.logger.warning(f"Claude principle analysis failed: {e}")
+            return {"additional_principles": [], "clinical_reasoning": ""}
+        
+        self.analysis_cache.put(cache_key, query, self.principle_db_version, analysis)
+        return analysis
+
+    def _analysis_cache_key(self, query: str, local_principles: List[VeterinaryPrinciple]) -> str:
+        """Normalized query + local principle names + principle-DB version"""
+        return self.analysis_cache.cache_key(query, [p.principle for p in local_principles], self.principle_db_version)
+
+    def _principle_analysis_request(self, query: str, local_principles: List[VeterinaryPrinciple]) -> Dict:
+        """
+        Claude Messages API arguments for the principle analysis
+        """
+        local_principle_names = [p.principle for p in local_principles]
+        
+        prompt = f"""You are a veterinary medical expert analyzing a clinical query to identify underlying veterinary principles that should guide knowledge retrieval from a veterinary textbook database.
 
 Query: "{query}"
 
@@ -209,18 +329,12 @@ Respond in JSON format:
 
 Focus on principles that would help retrieve relevant information from veterinary textbooks. Do not add external medical knowledge - only suggest what concepts to search for."""
 
-            response = self.anthropic_client.messages.create(
-                model="claude-3-5-haiku-20241022",
-                max_tokens=1000,
-                temperature=0.1,
-                messages=[{"role": "user", "content": prompt}]
-            )
-            
-            return json.loads(response.content[0].text)
-            
-        except Exception as e:
-            self.logger.warning(f"Claude principle analysis failed: {e}")
-            return {"additional_principles": [], "clinical_reasoning": ""}
+        return {
+            'model': self.PRINCIPLE_ANALYSIS_MODEL,
+            'max_tokens': 1000,
+            'temperature': 0.1,
+            'messages': [{"role": "user", "content": prompt}]
+        }
 
     def _merge_principle_analyses(self, local_principles: List[VeterinaryPrinciple], claude_analysis: Dict) -> List[VeterinaryPrinciple]:
         """
@@ -375,6 +489,10 @@ def main():
         print(f"\n📚 Enhanced Search Queries:")
         for j, enhanced_query in enumerate(enhanced_queries, 1):
             print(f"   {j}. {enhanced_query}")
+    
+    classifier_stats = retrieval_system.get_stats()['classifier']
+    print(f"\n🧭 Claude escalation rate: {classifier_stats['escalation_rate']:.0%} "
+          f"({classifier_stats['escalated']}/{classifier_stats['classified']} queries)")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Semantic Answer Cache
+Reuses complete v4 responses for reworded repeat questions: a cached answer is served when the
+new query's embedding is within a cosine threshold of a cached query and the clinical context
+extracted from both (species, weight, drugs, conditions, numbers) is identical
+"""
+
+import copy
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+
+@dataclass
+class CachedAnswer:
+    """One cached response and the query it answered"""
+    query: str
+    embedding: np.ndarray
+    context_key: Tuple
+    response: Dict[str, Any]
+    kb_version: str
+    created_at: float
+
+class SemanticAnswerCache:
+    def __init__(
+        self,
+        similarity_threshold: Optional[float] = None,
+        ttl_seconds: Optional[float] = None,
+        max_entries: Optional[int] = None,
+        kb_version: str = ""
+    ):
+        """
+        similarity_threshold: minimum cosine similarity between query embeddings (LIMOSA_ANSWER_CACHE_THRESHOLD)
+        ttl_seconds: age after which an answer is no longer served (LIMOSA_ANSWER_CACHE_TTL)
+        max_entries: answers kept before the least recently used is evicted (LIMOSA_ANSWER_CACHE_SIZE, 0 disables)
+        kb_version: knowledge-base version the cached answers were generated against
+        """
+        self.similarity_threshold = similarity_threshold if similarity_threshold is not None else float(
+            os.getenv('LIMOSA_ANSWER_CACHE_THRESHOLD', 0.95)
+        )
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else float(
+            os.getenv('LIMOSA_ANSWER_CACHE_TTL', 86400)
+        )
+        self.max_entries = max_entries if max_entries is not None else int(
+            os.getenv('LIMOSA_ANSWER_CACHE_SIZE', 512)
+        )
+        self.kb_version = kb_version
+
+        self._entries: "OrderedDict[int, CachedAnswer]" = OrderedDict()
+        self._next_id = 0
+        self._lock = threading.Lock()
+        # Stacked embeddings of the current entries, rebuilt lazily after a change
+        self._matrix: Optional[np.ndarray] = None
+        self._matrix_ids: List[int] = []
+        self.stats = {'hits': 0, 'misses': 0, 'stores': 0, 'expired': 0, 'evicted': 0, 'invalidated': 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    @staticmethod
+    def context_key(query: str, context: Dict[str, Any]) -> Tuple:
+        """
+        Clinical facts that must match exactly for an answer to be reused. Every number in the
+        query is included too, so '5 mg/kg' and '10 mg/kg' never share an answer.
+        """
+        return (
+            context.get('species'),
+            context.get('weight'),
+            tuple(sorted(context.get('drugs_mentioned', []))),
+            tuple(sorted(context.get('patient_conditions', []))),
+            tuple(float(number) for number in re.findall(r'\d+(?:\.\d+)?', query)),
+        )
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm else vector
+
+    def set_kb_version(self, kb_version: str):
+        """Switch to a new knowledge-base version, dropping answers generated against any other"""
+        with self._lock:
+            if kb_version == self.kb_version:
+                return
+            self.kb_version = kb_version
+            self.stats['invalidated'] += len(self._entries)
+            self._entries.clear()
+            self._matrix = None
+
+    def clear(self):
+        with self._lock:
+            self.stats['invalidated'] += len(self._entries)
+            self._entries.clear()
+            self._matrix = None
+
+    def get(self, query: str, embedding: List[float], context: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Cached response for a semantically equivalent query with the same clinical context, or None"""
+        if not self.enabled:
+            return None
+
+        query_vector = self._normalize(embedding)
+        key = self.context_key(query, context)
+        now = time.time()
+
+        with self._lock:
+            self._drop_expired(now)
+            if not self._entries:
+                self.stats['misses'] += 1
+                return None
+
+            if self._matrix is None:
+                self._matrix_ids = list(self._entries)
+                self._matrix = np.stack([self._entries[entry_id].embedding for entry_id in self._matrix_ids])
+
+            similarities = self._matrix @ query_vector
+            # Best match first among entries above the threshold whose context also matches
+            for position in np.argsort(-similarities):
+                if similarities[position] < self.similarity_threshold:
+                    break
+                entry_id = self._matrix_ids[position]
+                entry = self._entries[entry_id]
+                if entry.context_key == key and entry.kb_version == self.kb_version:
+                    self._entries.move_to_end(entry_id)
+                    self.stats['hits'] += 1
+                    response = copy.deepcopy(entry.response)
+                    response['answer_cache'] = {
+                        'hit': True,
+                        'cached_query': entry.query,
+                        'similarity': float(similarities[position]),
+                        'age_seconds': now - entry.created_at
+                    }
+                    return response
+
+            self.stats['misses'] += 1
+            return None
+
+    def put(self, query: str, embedding: List[float], context: Dict[str, Any], response: Dict[str, Any]):
+        """Store a response, evicting the least recently used answers beyond max_entries"""
+        if not self.enabled:
+            return
+
+        entry = CachedAnswer(
+            query=query,
+            embedding=self._normalize(embedding),
+            context_key=self.context_key(query, context),
+            response=copy.deepcopy(response),
+            kb_version=self.kb_version,
+            created_at=time.time()
+        )
+        with self._lock:
+            self._entries[self._next_id] = entry
+            self._next_id += 1
+            self.stats['stores'] += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats['evicted'] += 1
+            self._matrix = None
+
+    def _drop_expired(self, now: float):
+        """Remove answers older than the TTL (caller holds the lock)"""
+        expired = [entry_id for entry_id, entry in self._entries.items() if now - entry.created_at > self.ttl_seconds]
+        for entry_id in expired:
+            del self._entries[entry_id]
+        if expired:
+            self.stats['expired'] += len(expired)
+            self._matrix = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters plus the overall hit rate"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats['entries'] = len(self._entries)
+            stats['kb_version'] = self.kb_version
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
@@ -0,0 +1,67 @@
+"""The vectorized CRI chart must match calculate_cri row for row"""
+
+import io
+import random
+import numpy as np
+import pytest
+from cri_calculation_engine import CRICalculationEngine, CRIDrug
+
+DRUG_SETS = {
+    "mlk": [
+        CRIDrug("Morphine", 0.1, "mg/kg/hour", 15.0, "mg/mL"),
+        CRIDrug("Lidocaine", 50.0, "μg/kg/minute", 20.0, "mg/mL"),
+        CRIDrug("Ketamine", 0.6, "mg/kg/hour", 100.0, "mg/mL"),
+    ],
+    "micrograms": [
+        CRIDrug("Dopamine", 5.0, "μg/kg/minute", 40.0, "mg/mL"),
+        CRIDrug("Fentanyl", 3.0, "μg/kg/hour", 50.0, "μg/mL"),
+        CRIDrug("Dexmedetomidine", 1.0, "μg/kg/hour", 100.0, "μg/mL"),
+        CRIDrug("Propofol", 0.1, "mg/kg/minute", 10.0, "mg/mL"),
+    ],
+}
+
+@pytest.fixture(scope="module")
+def engine():
+    return CRICalculationEngine()
+
+@pytest.mark.parametrize("drug_set", sorted(DRUG_SETS))
+def test_batch_matches_single_calculation(engine, drug_set):
+    drugs = DRUG_SETS[drug_set]
+    chart = engine.calculate_cri_batch(np.arange(1.5, 61, 2.5), [100, 250, 500, 1000], [2.5, 5, 10, 20, 60], drugs)
+    assert len(chart) == 24 * 4 * 5
+
+    for row in random.Random(20).sample(range(len(chart)), 40) + [0, len(chart) - 1]:
+        result = engine.calculate_cri(chart.parameters(row))
+        assert result.is_valid
+        assert chart.total_run_time_hours[row] == pytest.approx(result.total_run_time_hours)
+        for i, calculation in enumerate(result.drug_calculations):
+            assert chart.hourly_mg_needed[row, i] == pytest.approx(calculation["hourly_mg_needed"])
+            assert chart.total_mg_needed[row, i] == pytest.approx(calculation["total_mg_needed"])
+            assert chart.volume_to_add_ml[row, i] == pytest.approx(calculation["volume_to_add_ml"])
+        assert chart.total_drug_volume_ml[row] == pytest.approx(result.total_drug_volume_ml)
+        assert chart.final_bag_volume_ml[row] == pytest.approx(result.final_bag_volume_ml)
+        assert (chart.volume_displacement_percent[row] > 20) == bool(result.warnings)
+
+def test_rows_are_weight_major(engine):
+    chart = engine.calculate_cri_batch([5, 10], [250, 500], [10], DRUG_SETS["mlk"])
+    assert chart.weights_kg.tolist() == [5, 5, 10, 10]
+    assert chart.bag_volumes_ml.tolist() == [250, 500, 250, 500]
+
+def test_csv_columns(engine):
+    chart = engine.calculate_cri_batch([10], [500], [10, 20], DRUG_SETS["micrograms"])
+    buffer = io.StringIO()
+    chart.to_csv(buffer)
+    lines = buffer.getvalue().splitlines()
+    assert len(lines) == 3
+    assert lines[0].split(",")[4:6] == ["dopamine_mg", "dopamine_ml"]
+    assert float(lines[1].split(",")[5]) == pytest.approx(round(chart.volume_to_add_ml[0, 0], 2))
+
+@pytest.mark.parametrize("weights, bags, rates, drugs", [
+    ([], [500], [10], DRUG_SETS["mlk"]),
+    ([10], [0], [10], DRUG_SETS["mlk"]),
+    ([10], [500], [-5], DRUG_SETS["mlk"]),
+    ([10], [500], [10], []),
+])
+def test_invalid_batch(engine, weights, bags, rates, drugs):
+    with pytest.raises(ValueError):
+        engine.calculate_cri_batch(weights, bags, rates, drugs)
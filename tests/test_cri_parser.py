@@ -0,0 +1,81 @@
+"""The single-pass CRI query parser must read each phrasing into the expected parameters"""
+
+import pytest
+from clinical_entity_recognizer import ClinicalContext
+from cri_calculation_engine import CRICalculationEngine, CRIDrug, CRIParameters
+
+@pytest.fixture(scope="module")
+def engine():
+    return CRICalculationEngine()
+
+PHRASINGS = [
+    (
+        "I have a 10 kg dog who needs a Dopamine CRI at a dose of 5 μg/kg/minute. I want to use a 500 mL bag "
+        "of saline and run it at 10 mL/hour. Our Dopamine concentration is 40 mg/mL.",
+        CRIParameters(10.0, 500.0, 10.0, [CRIDrug("Dopamine", 5.0, "μg/kg/minute", 40.0, "mg/mL")])
+    ),
+    (
+        "20 kg dog, morphine 0.1 mg/kg/hr, 1000 mL LRS bag at 20 mL/hr",
+        CRIParameters(20.0, 1000.0, 20.0, [CRIDrug("Morphine", 0.1, "mg/kg/hour", 15.0, "mg/mL")])
+    ),
+    (
+        "Lidocaine CRI at 50 mcg per kg per minute for a 30 kg dog, 250 ml bag, flow rate 15 ml",
+        CRIParameters(30.0, 250.0, 15.0, [CRIDrug("Lidocaine", 50.0, "μg/kg/minute", 20.0, "mg/mL")])
+    ),
+    (
+        "Ketamine 0.6 mg/kg/h in a 500 mL bag over 24 hours for a 12 kg dog; ketamine is 200 mg in 2 mL",
+        CRIParameters(12.0, 500.0, 500.0 / 24, [CRIDrug("Ketamine", 0.6, "mg/kg/hour", 100.0, "mg/mL")])
+    ),
+    (
+        "MLK for a 25 kg dog: morphine 0.12 mg/kg/hr (15 mg/mL), lidocaine 30 μg/kg/min (2%), "
+        "ketamine 0.6 mg/kg/hr (100 mg/mL) in a 1000 mL bag of fluids at 50 mL/hr",
+        CRIParameters(25.0, 1000.0, 50.0, [
+            CRIDrug("Morphine", 0.12, "mg/kg/hour", 15.0, "mg/mL"),
+            CRIDrug("Lidocaine", 30.0, "μg/kg/minute", 20.0, "mg/mL"),
+            CRIDrug("Ketamine", 0.6, "mg/kg/hour", 100.0, "mg/mL"),
+        ])
+    ),
+    (
+        "Standard bag at 12 mL/hr with dex 1 mcg/kg/hr for a 15 kg dog",
+        CRIParameters(15.0, 500.0, 12.0, [CRIDrug("Dexmedetomidine", 1.0, "μg/kg/hour", 100.0, "μg/mL")])
+    ),
+    (
+        "8 kg dog, fentanyl 4 mcg/kg/hr, 1 liter bag, fluid rate 30 ml/hr",
+        CRIParameters(8.0, 1000.0, 30.0, [CRIDrug("Fentanyl", 4.0, "μg/kg/hour", 50.0, "μg/mL")])
+    ),
+    (
+        "Butorphanol CRI 0.2 mg/kg/hr, 10 kg dog, 0.5 L bag at maintenance rate",
+        CRIParameters(10.0, 500.0, 30.0, [CRIDrug("Butorphanol", 0.2, "mg/kg/hour", 10.0, "mg/mL")])
+    ),
+]
+
+@pytest.mark.parametrize("query, expected", PHRASINGS, ids=[f"phrasing-{i}" for i in range(len(PHRASINGS))])
+def test_parse_cri_query(engine, query, expected):
+    parameters = engine.parse_cri_query(query)
+    assert parameters is not None
+    assert parameters.patient_weight_kg == pytest.approx(expected.patient_weight_kg)
+    assert parameters.bag_volume_ml == pytest.approx(expected.bag_volume_ml)
+    assert parameters.flow_rate_ml_per_hour == pytest.approx(expected.flow_rate_ml_per_hour)
+    assert parameters.drugs == expected.drugs
+
+def test_dex_is_a_whole_word(engine):
+    parameters = engine.parse_cri_query("10 kg dog, dexamethasone 0.1 mg/kg/hr, 500 mL bag at 10 mL/hr")
+    assert parameters is None or not parameters.drugs
+
+def test_context_weight_wins(engine):
+    parameters = engine.parse_cri_query("morphine 0.1 mg/kg/hr, 500 mL bag at 10 mL/hr",
+                                        ClinicalContext(weight_kg=7.5))
+    assert parameters.patient_weight_kg == 7.5
+
+def test_explicit_rate_kept_without_bag(engine):
+    weight, bag, rate, drugs = engine._scan_query("10 kg dog, fentanyl 3 mcg/kg/hr at 30 mL/hr")
+    assert (weight, bag, rate) == (10.0, None, 30.0)
+    assert engine.parse_cri_query("10 kg dog, fentanyl 3 mcg/kg/hr at 30 mL/hr").flow_rate_ml_per_hour == 30.0
+
+def test_fentanyl_microgram_per_hour_dose(engine):
+    # μg/kg/hour was once treated as mg/kg/hour, giving 36000 mL instead of 36 mL
+    parameters = engine.parse_cri_query("12 kg dog, fentanyl CRI at 3 mcg/kg/hr, 500 mL bag at 10 mL/hr")
+    result = engine.calculate_cri(parameters)
+    assert result.is_valid
+    assert result.drug_calculations[0]["total_mg_needed"] == pytest.approx(1.8)
+    assert result.drug_calculations[0]["volume_to_add_ml"] == pytest.approx(36.0)
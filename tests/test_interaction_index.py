@@ -0,0 +1,65 @@
+"""The reverse interaction index must agree with a brute-force scan of every pair"""
+
+import pytest
+from pharmacological_reasoning_engine import InteractionSeverity, InteractionType, PharmacologicalReasoningEngine
+
+@pytest.fixture(scope="module")
+def engine(tmp_path_factory):
+    engine = PharmacologicalReasoningEngine()
+    engine.interaction_table_path = str(tmp_path_factory.mktemp("table") / "interaction_table.json")
+    return engine
+
+def brute_force(engine, drug):
+    """partner -> interactions from _analyze_drug_pair over the whole mechanism database"""
+    pairs = {other: engine._analyze_drug_pair(drug, other, []) for other in engine.drug_mechanisms if other != drug}
+    return {other: interactions for other, interactions in pairs.items() if interactions}
+
+FILTERS = [(None, None)] + [([severity], None) for severity in InteractionSeverity] + \
+          [(None, [kind]) for kind in InteractionType] + \
+          [([severity], [kind]) for severity in InteractionSeverity for kind in InteractionType]
+
+def test_index_matches_brute_force(engine):
+    for drug in engine.drug_mechanisms:
+        expected_all = brute_force(engine, drug)
+        for severities, interaction_types in FILTERS:
+            expected = {}
+            for partner, interactions in expected_all.items():
+                kept = [i for i in interactions
+                        if (severities is None or i.severity in severities)
+                        and (interaction_types is None or i.interaction_type in interaction_types)]
+                if kept:
+                    expected[partner] = kept
+            found = engine.find_interacting_drugs(drug, severities=severities, interaction_types=interaction_types)
+
+            assert {partner.drug for partner in found} == set(expected), (drug, severities, interaction_types)
+            for partner in found:
+                assert partner.interacts_with == drug
+                assert sorted(map(repr, partner.interactions)) == sorted(map(repr, expected[partner.drug]))
+                assert partner.severity == max((i.severity for i in partner.interactions),
+                                               key=list(InteractionSeverity).index)
+
+def test_results_are_most_severe_first(engine):
+    ranks = [list(InteractionSeverity).index(partner.severity) for partner in engine.find_interacting_drugs("ketoconazole")]
+    assert ranks == sorted(ranks, reverse=True)
+
+def test_enzyme_and_class_queries(engine):
+    cyp3a4 = engine.find_interacting_drugs(enzyme="CYP3A4")
+    members = {drug for drug, mechanism in engine.drug_mechanisms.items() if "3A4" in mechanism.cyp450_enzymes}
+    assert {partner.interacts_with for partner in cyp3a4} <= members
+    assert engine.find_interacting_drugs(enzyme="3A4") == cyp3a4
+
+    nsaids = engine.find_interacting_drugs(therapeutic_class="nsaid")
+    assert {partner.interacts_with for partner in nsaids} == \
+        {drug for drug, mechanism in engine.drug_mechanisms.items() if mechanism.therapeutic_class == "nsaid"}
+
+def test_formulary_filter_and_aliases(engine):
+    partners = engine.find_interacting_drugs("Clavamox", formulary=["Phenobarbital", "Diazepam"])
+    assert {partner.drug for partner in partners} <= {"phenobarbital", "diazepam"}
+    assert all(partner.interacts_with == "amoxicillin" for partner in partners)
+    assert engine.find_interacting_drugs("not_a_drug") == []
+
+def test_exactly_one_query(engine):
+    with pytest.raises(ValueError):
+        engine.find_interacting_drugs()
+    with pytest.raises(ValueError):
+        engine.find_interacting_drugs("morphine", enzyme="3A4")
@@ -0,0 +1,69 @@
+"""Vectorized all-pairs rule evaluation must give the same interactions as the per-pair rules"""
+
+import json
+import random
+import pytest
+from clinical_reference_data import DEFAULT_REFERENCE_DATA_PATH, ClinicalReferenceData
+from pharmacological_reasoning_engine import PharmacologicalReasoningEngine
+
+# Mechanisms with unknown (NaN once compiled) percentages, alongside the shipped database
+PARTIAL_MECHANISMS = {
+    "partial_nsaid": {
+        "cyp450_effects": ["substrate"], "cyp450_enzymes": ["2C9"],
+        "hepatic_metabolism_percent": None, "renal_elimination_percent": 85.0, "protein_binding_percent": None,
+        "therapeutic_class": "nsaid", "contraindications": []
+    },
+    "partial_inhibitor": {
+        "cyp450_effects": ["inhibitor", "substrate"], "cyp450_enzymes": ["3A4", "2C9"],
+        "hepatic_metabolism_percent": 90.0, "renal_elimination_percent": None, "protein_binding_percent": 97.0,
+        "therapeutic_class": "antifungal", "contraindications": []
+    },
+    "unknown_everything": {
+        "cyp450_effects": [], "cyp450_enzymes": [],
+        "hepatic_metabolism_percent": None, "renal_elimination_percent": None, "protein_binding_percent": None,
+        "therapeutic_class": "unclassified", "contraindications": []
+    },
+}
+
+@pytest.fixture(scope="module")
+def engine(tmp_path_factory):
+    with open(DEFAULT_REFERENCE_DATA_PATH, 'r', encoding='utf-8') as f:
+        payload = json.load(f)
+    payload["drug_mechanisms"].update(PARTIAL_MECHANISMS)
+    path = tmp_path_factory.mktemp("reference") / "reference_data.json"
+    path.write_text(json.dumps(payload), encoding='utf-8')
+
+    engine = PharmacologicalReasoningEngine(ClinicalReferenceData(str(path), reload_interval=0))
+    engine.interaction_table_path = str(tmp_path_factory.mktemp("table") / "interaction_table.json")
+    return engine
+
+def medication_lists(engine, count=40, seed=23):
+    rng = random.Random(seed)
+    known = sorted(engine.drug_mechanisms)
+    unknown = ["not_a_drug", "clavamox", "mystery_compound"]
+    for _ in range(count):
+        drugs = rng.sample(known, rng.randint(1, 12))
+        drugs += rng.sample(unknown, rng.randint(0, 2))
+        drugs += rng.choices(drugs, k=rng.randint(0, 3))    # duplicates
+        rng.shuffle(drugs)
+        yield drugs
+
+def test_matrix_matches_pair_rules(engine):
+    for drugs in medication_lists(engine):
+        matrix = engine.evaluate_interaction_matrix(drugs)
+        for i, drug1 in enumerate(drugs):
+            for j, drug2 in enumerate(drugs):
+                assert matrix.get((i, j), []) == engine._evaluate_drug_pair(drug1, drug2, []), (drug1, drug2)
+
+def test_whole_database(engine):
+    drugs = sorted(engine.drug_mechanisms)
+    matrix = engine.evaluate_interaction_matrix(drugs)
+    for i, drug1 in enumerate(drugs):
+        for j, drug2 in enumerate(drugs):
+            assert matrix.get((i, j), []) == engine._evaluate_drug_pair(drug1, drug2, []), (drug1, drug2)
+
+def test_partial_mechanisms_are_compiled_as_nan(engine):
+    compiled = engine.compiled_mechanisms
+    row = compiled.drugs.index("unknown_everything")
+    assert all(column[row] != column[row] for column in
+               (compiled.hepatic_metabolism, compiled.renal_elimination, compiled.protein_binding))
@@ -0,0 +1,47 @@
+"""The precomputed interaction table must agree with the rule-based pair analysis"""
+
+import pytest
+from pharmacological_reasoning_engine import DrugInteractionTable, PharmacologicalReasoningEngine
+
+@pytest.fixture(scope="module")
+def engine(tmp_path_factory):
+    engine = PharmacologicalReasoningEngine()
+    # Never pick up a table saved by a local rebuild
+    engine.interaction_table_path = str(tmp_path_factory.mktemp("table") / "interaction_table.json")
+    return engine
+
+def test_table_matches_rule_based_path(engine):
+    assert engine.verify_interaction_table() == []
+
+def test_save_load_round_trip(engine, tmp_path):
+    table = engine.build_interaction_table()
+    path = str(tmp_path / "interaction_table.json")
+    table.save(path)
+    loaded = DrugInteractionTable.load(path)
+
+    assert loaded.drugs == table.drugs
+    assert loaded.fingerprint == table.fingerprint
+    for drug1 in table.drugs:
+        for drug2 in table.drugs:
+            assert loaded.lookup(drug1, drug2) == table.lookup(drug1, drug2)
+    assert loaded.lookup("not_a_drug", table.drugs[0]) is None
+
+def test_saved_table_is_reused(engine, tmp_path, monkeypatch):
+    path = str(tmp_path / "interaction_table.json")
+    engine.rebuild_interaction_table(path)
+    fresh = PharmacologicalReasoningEngine()
+    fresh.interaction_table_path = path
+    monkeypatch.setattr(fresh, "build_interaction_table", lambda: pytest.fail("current table was rebuilt"))
+    assert fresh.interaction_table.fingerprint == engine.interaction_rules_fingerprint()
+    assert fresh.interaction_table.lookup("phenobarbital", "diazepam") == \
+        engine.interaction_table.lookup("phenobarbital", "diazepam")
+
+def test_fingerprint_without_source_files(engine, monkeypatch):
+    import inspect
+    def no_source(method):
+        raise OSError("could not get source code")
+    monkeypatch.setattr(inspect, "getsource", no_source)
+    fresh = PharmacologicalReasoningEngine()
+    fresh.interaction_table_path = engine.interaction_table_path
+    assert fresh.analyze_drug_interactions(["phenobarbital", "diazepam"])
+    assert fresh.interaction_rules_fingerprint() != engine.interaction_rules_fingerprint()
@@ -6,10 +6,12 @@ Critical safety layer for all veterinary drug dosing calculations
 
 import re
 import math
-from typing import Dict, List, Tuple, Optional, Any
+from typing import Dict, List, Tuple, Optional, Any, Union
 from dataclasses import dataclass
 from enum import Enum
 import logging
+from clinical_entity_recognizer import ClinicalContext
+from clinical_reference_data import ClinicalReferenceData, SafetyRange, get_reference_data
 
 class CalculationType(Enum):
     SIMPLE_DOSING = "simple_dosing"
@@ -50,9 +52,13 @@ class VeterinaryCalculationValidator:
     Critical safety system for validating all veterinary drug calculations
     """
     
-    def __init__(self):
-        """Initialize the validation system with safety thresholds"""
+    def __init__(self, reference_data: Optional[ClinicalReferenceData] = None):
+        """
+        Initialize the validation system with safety thresholds
+        reference_data: source of the dosing safety ranges (defaults to the process-wide copy)
+        """
         self.logger = logging.getLogger(__name__)
+        self.reference_data = reference_data or get_reference_data()
         
         # Safety thresholds
         self.MAX_DOSING_ERROR_PERCENT = 10.0  # Flag if calculations differ by >10%
@@ -69,21 +75,18 @@ class VeterinaryCalculationValidator:
             "ml_to_l": 0.001,
             "hours_to_minutes": 60
         }
-        
-        # Dosing range safety limits (mg/kg unless specified)
-        self.SAFETY_RANGES = {
-            "morphine": {"min": 0.1, "max": 2.0, "units": "mg/kg"},
-            "lidocaine": {"min": 1.0, "max": 4.0, "units": "mg/kg/hour"},
-            "ketamine": {"min": 0.5, "max": 2.0, "units": "mg/kg/hour"},
-            "phenobarbital": {"min": 2.0, "max": 8.0, "units": "mg/kg/day"},
-            "acepromazine": {"min": 0.01, "max": 0.1, "units": "mg/kg"}
-        }
 
-    def validate_calculation(self, calculation_text: str, context: Dict[str, Any]) -> ValidationResult:
+    @property
+    def SAFETY_RANGES(self) -> Dict[str, SafetyRange]:
+        """Dosing range safety limits from the reference data file (mg/kg unless specified)"""
+        return self.reference_data.safety_ranges
+
+    def validate_calculation(self, calculation_text: str, context: Union[ClinicalContext, Dict[str, Any]]) -> ValidationResult:
         """
         Main validation entry point for any veterinary calculation
         """
         self.logger.info(f"🧮 Validating calculation: {calculation_text[:100]}...")
+        context = ClinicalContext.coerce(context)
         
         try:
             # Extract calculation components
@@ -113,7 +116,7 @@ class VeterinaryCalculationValidator:
                 requires_manual_review=True
             )
 
-    def _validate_cri_calculation(self, data: Dict[str, Any], context: Dict[str, Any]) -> ValidationResult:
+    def _validate_cri_calculation(self, data: Dict[str, Any], context: ClinicalContext) -> ValidationResult:
         """
         Validate Constant Rate Infusion calculations (high risk)
         """
@@ -125,7 +128,7 @@ class VeterinaryCalculationValidator:
         
         try:
             # Extract essential parameters
-            weight_kg = data.get("weight", context.get("weight", 0))
+            weight_kg = data.get("weight", context.weight_kg or 0)
             bag_volume_ml = data.get("bag_volume", 250)
             flow_rate_ml_hr = data.get("flow_rate", 0)
             drugs = data.get("drugs", [])
@@ -183,8 +186,8 @@ class VeterinaryCalculationValidator:
                 # Check dosing range safety
                 if drug_name.lower() in self.SAFETY_RANGES:
                     safety_range = self.SAFETY_RANGES[drug_name.lower()]
-                    if dose_per_kg_hr < safety_range["min"] or dose_per_kg_hr > safety_range["max"]:
-                        warnings.append(f"{drug_name}: Dose {dose_per_kg_hr} {safety_range['units']} outside safe range ({safety_range['min']}-{safety_range['max']})")
+                    if dose_per_kg_hr < safety_range.min or dose_per_kg_hr > safety_range.max:
+                        warnings.append(f"{drug_name}: Dose {dose_per_kg_hr} {safety_range.units} outside safe range ({safety_range.min}-{safety_range.max})")
                 
                 steps.append(CalculationStep(
                     step_number=len(steps) + 1,
@@ -224,7 +227,7 @@ class VeterinaryCalculationValidator:
         except Exception as e:
             return self._create_error_result([f"CRI validation error: {e}"])
 
-    def _validate_simple_dosing(self, data: Dict[str, Any], context: Dict[str, Any]) -> ValidationResult:
+    def _validate_simple_dosing(self, data: Dict[str, Any], context: ClinicalContext) -> ValidationResult:
         """
         Validate simple drug dosing calculations
         """
@@ -235,12 +238,12 @@ class VeterinaryCalculationValidator:
         steps = []
         
         try:
-            weight_kg = data.get("weight", context.get("weight", 0))
+            weight_kg = data.get("weight", context.weight_kg or 0)
             # Try multiple ways to get dose per kg
             dose_per_kg = data.get("dose_per_kg", 0)
             if not dose_per_kg and "doses" in data and data["doses"]:
                 dose_per_kg = data["doses"][0]  # Take first dose found
-            drug_name = data.get("drug_name", context.get("drugs_mentioned", ["unknown"])[0] if context.get("drugs_mentioned") else "unknown")
+            drug_name = data.get("drug_name", context.drugs[0] if context.drugs else "unknown")
             
             if not weight_kg or not dose_per_kg:
                 errors.append("Missing weight or dose per kg")
@@ -257,8 +260,8 @@ class VeterinaryCalculationValidator:
             # Check safety ranges
             if drug_name.lower() in self.SAFETY_RANGES:
                 safety_range = self.SAFETY_RANGES[drug_name.lower()]
-                if dose_per_kg < safety_range["min"] or dose_per_kg > safety_range["max"]:
-                    warnings.append(f"Dose {dose_per_kg} outside safe range ({safety_range['min']}-{safety_range['max']}) {safety_range['units']}")
+                if dose_per_kg < safety_range.min or dose_per_kg > safety_range.max:
+                    warnings.append(f"Dose {dose_per_kg} outside safe range ({safety_range.min}-{safety_range.max}) {safety_range.units}")
             
             steps.append(CalculationStep(
                 step_number=1,
@@ -286,7 +289,7 @@ class VeterinaryCalculationValidator:
         except Exception as e:
             return self._create_error_result([f"Simple dosing validation error: {e}"])
 
-    def _identify_calculation_type(self, text: str, context: Dict[str, Any]) -> CalculationType:
+    def _identify_calculation_type(self, text: str, context: ClinicalContext) -> CalculationType:
         """
         Identify the type of calculation being performed
         """
@@ -340,7 +343,7 @@ class VeterinaryCalculationValidator:
         
         return data
 
-    def _validate_multi_drug_calculation(self, data: Dict[str, Any], context: Dict[str, Any]) -> ValidationResult:
+    def _validate_multi_drug_calculation(self, data: Dict[str, Any], context: ClinicalContext) -> ValidationResult:
         """
         Validate calculations involving multiple drugs
         """
@@ -355,7 +358,7 @@ class VeterinaryCalculationValidator:
             requires_manual_review=True
         )
 
-    def _validate_generic_calculation(self, data: Dict[str, Any], context: Dict[str, Any]) -> ValidationResult:
+    def _validate_generic_calculation(self, data: Dict[str, Any], context: ClinicalContext) -> ValidationResult:
         """
         Generic validation for unidentified calculation types
         """